@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the CJDropshipping addon.
+
+Measures throughput, SQL queries, memory peaks and p50/p99 latencies of
+product import, product sync, order submission and webhook ingest, for
+catalogs of several sizes served by fake_cj_server.py (started per size).
+
+Requires an Odoo installation with the cjdropship module installed in a
+throwaway database: the benchmark commits its data and removes it again
+afterwards (unless --keep-data is given).
+
+Usage:
+    python3 benchmark.py -c /etc/odoo/odoo.conf -d cj_bench
+    python3 benchmark.py -c odoo.conf -d cj_bench --sizes 1000 \\
+        --output run.json --baseline previous.json
+
+Webhooks are ingested in-process through the same model method the
+/cjdropship/webhook route uses. With --odoo-url they are POSTed to a running
+Odoo server instead, measuring the whole HTTP round trip (latencies only).
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import odoo
+from odoo import SUPERUSER_ID, Command, api, sql_db
+from odoo.exceptions import UserError
+
+logger = logging.getLogger(__name__)
+
+FAKE_SERVER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'fake_cj_server.py'
+)
+IMPORT_PAGE_SIZE = 100
+BULK_SYNC_CHUNK = 500
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def query_count():
+    """Return the number of SQL queries run by this process so far."""
+    return sql_db.sql_counter
+
+
+class Measurement:
+    """Collect timings, SQL queries and memory of one scenario."""
+
+    def __init__(self, scenario, size, unit, trace_memory=True):
+        self.scenario = scenario
+        self.size = size
+        self.unit = unit
+        self.trace_memory = trace_memory
+        self.latencies = []
+        self.units = 0
+        self.errors = 0
+        self.result = None
+        self._started = None
+        self._queries = None
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self._queries = query_count()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self._started
+        queries = query_count() - self._queries
+        peak = None
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+        if exc_type is not None:
+            return
+        p50 = percentile(self.latencies, 0.5)
+        p99 = percentile(self.latencies, 0.99)
+        self.result = {
+            'scenario': self.scenario,
+            'catalog_size': self.size,
+            'unit': self.unit,
+            'units': self.units,
+            'errors': self.errors,
+            'seconds': round(elapsed, 3),
+            'per_second': round(self.units / elapsed, 2) if elapsed else None,
+            'queries': queries,
+            'queries_per_unit': (
+                round(queries / self.units, 2) if self.units else None
+            ),
+            'p50_ms': round(p50 * 1000, 2) if p50 is not None else None,
+            'p99_ms': round(p99 * 1000, 2) if p99 is not None else None,
+            'peak_memory_mb': round(peak, 1) if peak is not None else None,
+            'max_rss_mb': round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+            ),
+        }
+
+    @contextmanager
+    def sample(self, units=1):
+        """Time one call handling ``units`` units."""
+        started = time.perf_counter()
+        yield
+        self.latencies.append(time.perf_counter() - started)
+        self.units += units
+
+
+@contextmanager
+def fake_server(options, size):
+    """Run fake_cj_server.py with a catalog of ``size`` products."""
+    command = [
+        sys.executable, FAKE_SERVER,
+        '--port', str(options.fake_port),
+        '--products', str(size),
+        '--latency', str(options.latency),
+        '--jitter', str(options.jitter),
+        '--fail-429', str(options.fail_429),
+        '--fail-5xx', str(options.fail_5xx),
+    ]
+    process = subprocess.Popen(command)  # pylint: disable=consider-using-with
+    stats_url = f'http://127.0.0.1:{options.fake_port}/_fake/stats'
+    try:
+        for _attempt in range(50):
+            try:
+                with urllib.request.urlopen(stats_url, timeout=1):
+                    break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("fake_cj_server.py did not start")
+        yield f'http://127.0.0.1:{options.fake_port}/api2.0/v1'
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def create_config(env, base_url, size):
+    """Create a configuration pointing at the fake server."""
+    return env['cjdropship.config'].create({
+        'name': f'Benchmark {size}',
+        'api_email': 'benchmark@example.com',
+        'api_password': 'benchmark',
+        'api_base_url': base_url,
+        # Measure the addon, not the production rate limits
+        'rate_limit_product': 1000,
+        'rate_limit_order': 1000,
+        'rate_limit_logistics': 1000,
+        'cache_enabled': False,
+        'webhook_enabled': True,
+    })
+
+
+def bench_import(env, config, size, options):
+    """Import the whole catalog page by page through the import wizard."""
+    wizard_model = env['cjdropship.product.import.wizard']
+    pages = math.ceil(size / IMPORT_PAGE_SIZE)
+    with Measurement('import', size, 'product', options.trace_memory) as run:
+        for page in range(1, pages + 1):
+            wizard = wizard_model.create({
+                'config_id': config.id,
+                'page_number': page,
+                'page_size': IMPORT_PAGE_SIZE,
+            })
+            with run.sample(min(IMPORT_PAGE_SIZE, size - run.units)):
+                wizard.action_import_products()
+            env.cr.commit()
+    return run.result
+
+
+def bench_sync(env, config, size, options):
+    """Sync a sample of products one at a time."""
+    products = env['cjdropship.product'].search(
+        [('config_id', '=', config.id)], limit=options.sync_sample
+    )
+    with Measurement('sync', size, 'product', options.trace_memory) as run:
+        for product in products:
+            with run.sample():
+                try:
+                    product.action_sync_from_cj()
+                except UserError:
+                    run.errors += 1
+        env.cr.commit()
+    return run.result
+
+
+def bench_bulk_sync(env, config, size, options):
+    """Sync every product in chunks, as the bulk sync action does."""
+    products = env['cjdropship.product'].search(
+        [('config_id', '=', config.id)]
+    )
+    with Measurement('bulk_sync', size, 'product',
+                     options.trace_memory) as run:
+        for start in range(0, len(products), BULK_SYNC_CHUNK):
+            chunk = products[start:start + BULK_SYNC_CHUNK]
+            with run.sample(len(chunk)):
+                failed = chunk._sync_from_cj_batch()
+            run.errors += len(failed)
+            env.cr.commit()
+            env.invalidate_all()
+    return run.result
+
+
+def prepare_orders(env, config, count):
+    """Create draft CJ orders, each for a sale order of one CJ product."""
+    cj_products = env['cjdropship.product'].search(
+        [('config_id', '=', config.id)], limit=min(count, 50)
+    )
+    for cj_product in cj_products:
+        if not cj_product.product_tmpl_id:
+            cj_product.action_create_odoo_product()
+    partner = env['res.partner'].create({
+        'name': 'CJ Benchmark Customer',
+        'street': 'Benchmarkstr. 1',
+        'city': 'Berlin',
+        'zip': '10115',
+        'country_id': env.ref('base.de').id,
+        'email': 'customer@example.com',
+    })
+    orders = env['cjdropship.order']
+    for index in range(count):
+        template = cj_products[index % len(cj_products)].product_tmpl_id
+        sale_order = env['sale.order'].create({
+            'partner_id': partner.id,
+            'order_line': [Command.create({
+                'product_id': template.product_variant_id.id,
+                'product_uom_qty': 1,
+            })],
+        })
+        orders |= orders.create({
+            'sale_order_id': sale_order.id,
+            'config_id': config.id,
+        })
+    env.cr.commit()
+    return orders
+
+
+def bench_orders(env, config, size, options):
+    """Submit draft orders to CJ one at a time."""
+    orders = prepare_orders(env, config, options.orders)
+    with Measurement('submit_order', size, 'order',
+                     options.trace_memory) as run:
+        for order in orders:
+            with run.sample():
+                try:
+                    order.action_submit_to_cj()
+                except UserError:
+                    run.errors += 1
+            env.cr.commit()
+    return run.result
+
+
+def webhook_payloads(env, config, count):
+    """Build a mix of inventory and order status webhook payloads."""
+    product_ids = env['cjdropship.product'].search(
+        [('config_id', '=', config.id)], limit=1000
+    ).mapped('cj_product_id')
+    order_ids = env['cjdropship.order'].search([
+        ('config_id', '=', config.id), ('cj_order_id', '!=', False)
+    ], limit=1000).mapped('cj_order_id')
+    payloads = []
+    for index in range(count):
+        if order_ids and index % 2:
+            payloads.append({
+                'event': 'ORDER_STATUS_CHANGED',
+                'orderId': order_ids[index % len(order_ids)],
+                'status': 'PROCESSING',
+            })
+        else:
+            payloads.append({
+                'event': 'INVENTORY_UPDATE',
+                'productId': product_ids[index % len(product_ids)],
+                'quantity': index % 500,
+            })
+    return payloads
+
+
+def post_webhook(url, payload):
+    """POST one webhook to Odoo and return its latency."""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def bench_webhooks(env, config, size, options):
+    """Ingest webhooks in-process, or over HTTP with --odoo-url."""
+    payloads = webhook_payloads(env, config, options.webhooks)
+    if options.odoo_url:
+        url = f"{options.odoo_url.rstrip('/')}/cjdropship/webhook/{config.id}"
+        run = Measurement('webhook_http', size, 'webhook', False)
+        with run, ThreadPoolExecutor(options.webhook_concurrency) as pool:
+            run.latencies = list(pool.map(
+                lambda payload: post_webhook(url, payload), payloads
+            ))
+            run.units = len(payloads)
+        # Queries and memory are spent by the server, not by this process
+        run.result.update(queries=None, queries_per_unit=None)
+        return run.result
+
+    webhook_model = env['cjdropship.webhook'].sudo()
+    with Measurement('webhook', size, 'webhook',
+                     options.trace_memory) as run:
+        for payload in payloads:
+            with run.sample():
+                webhook_model._ingest(payload, {})
+        env.cr.commit()
+    return run.result
+
+
+SCENARIOS = {
+    'import': bench_import,
+    'sync': bench_sync,
+    'bulk_sync': bench_bulk_sync,
+    'orders': bench_orders,
+    'webhooks': bench_webhooks,
+}
+
+
+def cleanup(env, config, last_webhook_id):
+    """Remove everything the benchmark created for a configuration."""
+    env['cjdropship.webhook'].search([('id', '>', last_webhook_id)]).unlink()
+    orders = env['cjdropship.order'].search([('config_id', '=', config.id)])
+    sale_orders = orders.mapped('sale_order_id')
+    partners = sale_orders.mapped('partner_id')
+    orders.unlink()
+    sale_orders.write({'state': 'cancel'})
+    sale_orders.unlink()
+    partners.unlink()
+    products = env['cjdropship.product'].with_context(
+        active_test=False
+    ).search([('config_id', '=', config.id)])
+    templates = products.mapped('product_tmpl_id')
+    products.unlink()
+    templates.unlink()
+    config.unlink()
+    env.cr.commit()
+
+
+def run_size(registry, options, size):
+    """Run the selected scenarios for one catalog size."""
+    results = []
+    with fake_server(options, size) as base_url, registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        last_webhook_id = env['cjdropship.webhook'].search(
+            [], order='id desc', limit=1
+        ).id or 0
+        config = create_config(env, base_url, size)
+        env.cr.commit()
+        try:
+            for name in options.scenarios:
+                logger.info("Running %s with %d products", name, size)
+                result = SCENARIOS[name](env, config, size, options)
+                logger.info("%s", result)
+                results.append(result)
+        finally:
+            if not options.keep_data:
+                env.cr.rollback()
+                cleanup(env, config, last_webhook_id)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of ``results`` against a baseline run."""
+    previous = {
+        (item['scenario'], item['catalog_size']): item for item in baseline
+    }
+    regressions = []
+    for result in results:
+        before = previous.get((result['scenario'], result['catalog_size']))
+        if not before:
+            continue
+        checks = (
+            ('per_second', -1),
+            ('queries_per_unit', 1),
+            ('p99_ms', 1),
+            ('peak_memory_mb', 1),
+        )
+        for key, direction in checks:
+            old, new = before.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * direction > tolerance:
+                regressions.append(
+                    f"{result['scenario']} ({result['catalog_size']}): "
+                    f"{key} {old} -> {new} ({change:+.0%})"
+                )
+    return regressions
+
+
+def print_table(results):
+    """Print results as a plain text table."""
+    columns = (
+        'scenario', 'catalog_size', 'units', 'errors', 'per_second',
+        'queries_per_unit', 'p50_ms', 'p99_ms', 'peak_memory_mb',
+        'max_rss_mb',
+    )
+    rows = [columns] + [
+        tuple('-' if item[col] is None else str(item[col]) for col in columns)
+        for item in results
+    ]
+    widths = [max(len(value) for value in column) for column in zip(*rows)]
+    for row in rows:
+        print('  '.join(
+            value.rjust(width) for value, width in zip(row, widths)
+        ))
+
+
+def parse_args(argv=None):
+    """Parse the command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-c', '--config', help="Odoo configuration file")
+    parser.add_argument('-d', '--database', required=True,
+                        help="Throwaway database with cjdropship installed")
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help="Catalog sizes (default: %(default)s)")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help="Scenarios to run (default: %(default)s)")
+    parser.add_argument('--sync-sample', type=int, default=1000,
+                        help="Products synced one at a time")
+    parser.add_argument('--orders', type=int, default=200,
+                        help="Orders submitted")
+    parser.add_argument('--webhooks', type=int, default=2000,
+                        help="Webhooks ingested")
+    parser.add_argument('--odoo-url',
+                        help="POST webhooks to this running Odoo server")
+    parser.add_argument('--webhook-concurrency', type=int, default=8)
+    parser.add_argument('--fake-port', type=int, default=8070)
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Fake server latency per request in ms")
+    parser.add_argument('--jitter', type=float, default=0)
+    parser.add_argument('--fail-429', type=float, default=0)
+    parser.add_argument('--fail-5xx', type=float, default=0)
+    parser.add_argument('--no-trace-memory', dest='trace_memory',
+                        action='store_false',
+                        help="Skip tracemalloc, which slows Python down")
+    parser.add_argument('--keep-data', action='store_true',
+                        help="Keep the benchmark records")
+    parser.add_argument('--output', help="Write results to a JSON file")
+    parser.add_argument('--baseline',
+                        help="Compare with the JSON results of a previous run")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Relative change reported as regression")
+    options = parser.parse_args(argv)
+    options.sizes = [int(size) for size in options.sizes.split(',')]
+    options.scenarios = [name for name in options.scenarios.split(',') if name]
+    unknown = set(options.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return options
+
+
+def main(argv=None):
+    """Run the benchmark and report the results."""
+    options = parse_args(argv)
+
+    odoo_args = ['-d', options.database, '--log-level', 'warn']
+    if options.config:
+        odoo_args = ['-c', options.config] + odoo_args
+    odoo.tools.config.parse_config(odoo_args)
+    logger.setLevel(logging.INFO)
+    registry = odoo.modules.registry.Registry(options.database)
+
+    results = []
+    for size in options.sizes:
+        results += run_size(registry, options, size)
+
+    print_table(results)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+
+    if options.baseline:
+        with open(options.baseline, encoding='utf-8') as baseline:
+            regressions = compare(results, json.load(baseline),
+                                  options.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
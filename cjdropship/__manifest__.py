@@ -30,10 +30,13 @@ This module provides integration with CJDropshipping API for:
         'security/cjdropship_security.xml',
         'security/ir.model.access.csv',
         'data/cjdropship_data.xml',
+        'views/cjdropship_category_views.xml',
         'views/cjdropship_product_views.xml',
+        'views/cjdropship_import_job_views.xml',
         'views/cjdropship_order_views.xml',
         'views/cjdropship_webhook_views.xml',
         'views/cjdropship_config_views.xml',
+        'views/cjdropship_metrics_views.xml',
         'views/cjdropship_menus.xml',
         'wizards/product_import_wizard_views.xml',
     ],
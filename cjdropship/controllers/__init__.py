@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
 """CJDropshipping Controllers."""
 
+from . import metrics_controller
 from . import webhook_controller
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Prometheus metrics controller for CJDropshipping integration."""
+
+from odoo import http
+from odoo.http import request
+
+from ..models.cjdropship_metrics import PROMETHEUS_CONTENT_TYPE
+
+
+class CJDropshippingMetricsController(http.Controller):
+    """Controller exposing integration metrics to Prometheus."""
+
+    @http.route(
+        '/cjdropship/metrics',
+        type='http',
+        auth='public',
+        methods=['GET'],
+        csrf=False,
+        save_session=False
+    )
+    def metrics(self):
+        """Serve integration metrics to a scraper holding a metrics token."""
+        scheme, _sep, token = request.httprequest.headers.get(
+            'Authorization', ''
+        ).partition(' ')
+        if scheme.lower() != 'bearer' or not token or not (
+            request.env['cjdropship.config'].sudo()._check_metrics_token(
+                token.strip()
+            )
+        ):
+            return request.make_response(
+                'Unauthorized',
+                headers=[('WWW-Authenticate', 'Bearer')],
+                status=401
+            )
+
+        body = request.env['cjdropship.metrics'].sudo()._render_prometheus()
+        return request.make_response(
+            body, headers=[('Content-Type', PROMETHEUS_CONTENT_TYPE)]
+        )
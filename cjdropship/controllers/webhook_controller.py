@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 """Webhook controller for CJDropshipping integration."""
 
-import json
 import logging
 
 from odoo import http
@@ -37,30 +36,12 @@ class CJDropshippingWebhookController(http.Controller):
             payload = request.httprequest.get_json(force=True)
             headers = dict(request.httprequest.headers)
 
-            # Determine webhook type
-            webhook_type = 'other'
-            event = payload.get('event', '')
-
-            if 'order' in event.lower() and 'status' in event.lower():
-                webhook_type = 'order_status'
-            elif 'tracking' in event.lower():
-                webhook_type = 'tracking'
-            elif 'inventory' in event.lower() or 'stock' in event.lower():
-                webhook_type = 'inventory'
-
-            # Create webhook record
-            webhook = request.env['cjdropship.webhook'].sudo().create({
-                'webhook_type': webhook_type,
-                'cj_order_id': payload.get('orderId', ''),
-                'event': event,
-                'payload': json.dumps(payload, indent=2),
-                'headers': json.dumps(headers, indent=2),
-            })
-
-            # Process webhook immediately
-            webhook.action_process_webhook()
+            # Log and process the webhook
+            webhook = request.env['cjdropship.webhook'].sudo()._ingest(
+                payload, headers
+            )
 
-            _logger.info("Received CJDropshipping webhook: %s", event)
+            _logger.info("Received CJDropshipping webhook: %s", webhook.event)
 
             return {'status': 'success', 'message': 'Webhook received'}
 
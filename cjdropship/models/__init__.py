@@ -2,8 +2,17 @@
 """CJDropshipping Models."""
 
 from . import cjdropship_api
+from . import cjdropship_api_async
+from . import cjdropship_api_cache
+from . import cjdropship_api_token
+from . import cjdropship_images
+from . import cjdropship_category
 from . import cjdropship_config
+from . import cjdropship_metrics
+from . import cjdropship_pricing_rule
+from . import cjdropship_rate_limit
 from . import cjdropship_product
+from . import cjdropship_import_job
 from . import cjdropship_order
 from . import cjdropship_webhook
 from . import sale_order
@@ -1,173 +1,973 @@
 # -*- coding: utf-8 -*-
 """CJDropshipping API Client."""
 
+import bisect
+import copy
+import email.utils
+import functools
+import json
 import logging
+import os
+import random
+import re
+import threading
 import time
-from datetime import datetime
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
 
 import requests
+from requests.adapters import HTTPAdapter
 
 _logger = logging.getLogger(__name__)
 
+DEFAULT_BASE_URL = "https://developers.cjdropshipping.com/api2.0/v1"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_FETCH_WORKERS = 8
 
-class CJDropshippingAPI:
-    """CJDropshipping API Client for handling API requests."""
+# Seconds to wait for a connection to CJ, and for its answer once connected
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+# Longest time a call may spend on attempts and backoff before giving up
+DEFAULT_RETRY_DEADLINE = 60
 
-    def __init__(self, email, password):
-        self.base_url = "https://developers.cjdropshipping.com/api2.0/v1"
-        self.email = email
-        self.password = password
-        self.access_token = None
-        self.token_expiry = 0
+# Refresh tokens this many seconds before CJ considers them expired
+TOKEN_REFRESH_BUFFER = 300
 
-    def _get_headers(self):
-        """Get headers with authentication token"""
-        # Add buffer time to prevent token expiry during request
-        buffer_time = 300  # 5 minutes buffer
-        if not self.access_token or time.time() >= (self.token_expiry - buffer_time):
-            _logger.info("Token expired or missing, re-authenticating...")
-            self._authenticate()
+# Requests per second allowed for each endpoint group
+DEFAULT_RATE_LIMITS = {
+    'auth': 1.0 / 300,  # CJ allows one token request every 5 minutes
+    'product': 1.0,
+    'order': 1.0,
+    'logistics': 1.0,
+}
+# Longest time a caller queues for a rate limit token before giving up
+DEFAULT_RATE_LIMIT_MAX_WAIT = 60
 
-        return {
-            'Content-Type': 'application/json',
-            'CJ-Access-Token': self.access_token
-        }
+# Seconds responses of read-only endpoints stay cached, 0 disables caching
+DEFAULT_CACHE_TTLS = {
+    '/product/categoryList': 3600,
+    '/product/query': 300,
+    '/product/variant/query': 300,
+    '/logistic/freightCalculate': 600,
+}
+DEFAULT_CACHE_MAX_ENTRIES = 1000
+# Lifetime of in-process copies of entries kept in a shared cache, bounding
+# how long a worker may miss an invalidation made by another worker
+SHARED_CACHE_LOCAL_TTL = 30
 
-    def _authenticate(self):
-        """Authenticate with CJDropshipping API"""
-        url = f"{self.base_url}/authentication/getAccessToken"
+# Diagnostics capture of the last API exchanges
+DEFAULT_CAPTURE_SIZE = 50
+CAPTURE_BODY_LIMIT = 2000
+REDACTED_KEYS = frozenset({
+    'password', 'accesstoken', 'refreshtoken', 'cj-access-token',
+})
+REDACTED_JSON_RE = re.compile(
+    r'("(?:password|accessToken|refreshToken)"\s*:\s*")[^"]*(")'
+)
+
+# Upper bounds (seconds) of the API latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_METRICS_FLUSH_INTERVAL = 60
+# Observations after which a period is flushed before its interval is over
+DEFAULT_METRICS_FLUSH_SIZE = 1000
+
+ENDPOINT_GROUPS = (
+    ('/authentication/', 'auth'),
+    ('/product/', 'product'),
+    ('/shopping/', 'order'),
+    ('/logistic/', 'logistics'),
+)
+
+
+# HTTP statuses (also used by CJ as response codes) worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Statuses and errors that guarantee a request was not processed, the only
+# ones retried for non-idempotent calls such as order creation
+SAFE_RETRY_STATUSES = (429, 503)
+RETRY_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+SAFE_RETRY_EXCEPTIONS = (requests.exceptions.ConnectTimeout,)
+# CJ response codes meaning the access token was rejected
+AUTH_ERROR_CODES = (1600001,)
+TOKEN_HEADER = 'CJ-Access-Token'
+
+
+class CJApiError(ValueError):
+    """Raised when CJ answers a request with a non-success code."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class CJRateLimitError(ValueError):
+    """Raised when a call would have to wait too long for its rate slot."""
+
+
+class CJCircuitOpenError(ValueError):
+    """Raised instead of calling CJ while its circuit breaker is open."""
+
+
+def parse_retry_after(response):
+    """Return the ``Retry-After`` delay of a response in seconds, if any."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter.
+
+    The delay before attempt ``n + 1`` is drawn uniformly from
+    ``[0, min(backoff_cap, backoff_base * 2 ** (n - 1))]``. A ``Retry-After``
+    header sent with a 429 or 503 is honored as a lower bound, unless it asks
+    for more than ``max_retry_after`` seconds, in which case the call fails.
+    No retry is started once it would end after ``deadline`` seconds counted
+    from the first attempt.
+    """
+
+    def __init__(self, max_attempts=3, backoff_base=0.5, backoff_cap=30.0,
+                 retry_statuses=RETRY_STATUSES,
+                 retry_exceptions=RETRY_EXCEPTIONS,
+                 max_retry_after=120.0,
+                 deadline=DEFAULT_RETRY_DEADLINE):
+        self.max_attempts = max(int(max_attempts), 1)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_exceptions = tuple(retry_exceptions)
+        self.max_retry_after = max_retry_after
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        """Return a jittered backoff delay for the given attempt."""
+        ceiling = min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def retry_delay(self, attempt, exc, elapsed=0.0):
+        """Return seconds to wait before retrying, or None to give up.
+
+        ``elapsed`` is the time spent on the call since its first attempt.
+        """
+        if attempt >= self.max_attempts:
+            return None
+
+        response = None
+        if isinstance(exc, requests.exceptions.HTTPError):
+            response = exc.response
+            status = response.status_code if response is not None else None
+            if status not in self.retry_statuses:
+                return None
+        elif isinstance(exc, CJApiError):
+            if exc.code not in self.retry_statuses:
+                return None
+        elif not isinstance(exc, self.retry_exceptions):
+            return None
+
+        delay = self.backoff(attempt)
+        if response is not None and response.status_code in (429, 503):
+            retry_after = parse_retry_after(response)
+            if retry_after is not None:
+                if retry_after > self.max_retry_after:
+                    return None
+                delay = max(delay, retry_after)
+        # A retry that cannot even connect before the deadline is pointless
+        if (
+            self.deadline
+            and elapsed + delay + CONNECT_TIMEOUT > self.deadline
+        ):
+            return None
+        return delay
+
+
+def default_retry_policies(max_attempts=3, backoff_base=0.5, backoff_cap=30.0):
+    """Build retry policies per HTTP method.
+
+    GET requests are idempotent and retried on any transient failure. POST
+    and PUT requests are only retried when CJ certainly did not process
+    them, so an order is never created twice.
+    """
+    safe = {
+        'retry_statuses': SAFE_RETRY_STATUSES,
+        'retry_exceptions': SAFE_RETRY_EXCEPTIONS,
+    }
+    return {
+        'GET': RetryPolicy(max_attempts, backoff_base, backoff_cap),
+        'POST': RetryPolicy(max_attempts, backoff_base, backoff_cap, **safe),
+        'PUT': RetryPolicy(max_attempts, backoff_base, backoff_cap, **safe),
+    }
+
+
+def endpoint_group(endpoint):
+    """Return the rate limit group an API endpoint belongs to."""
+    for prefix, group in ENDPOINT_GROUPS:
+        if endpoint.startswith(prefix):
+            return group
+    return 'product'
+
+# Pooled sessions shared by every client instance of this process, keyed by
+# (pid, session key, pool size, keep-alive). The pid guards against reusing
+# sockets inherited from a parent process after a prefork.
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def get_session(session_key=None, pool_size=DEFAULT_POOL_SIZE, keep_alive=True):
+    """Return the pooled HTTP session for the given key, creating it once."""
+    pool_size = max(int(pool_size or DEFAULT_POOL_SIZE), 1)
+    key = (os.getpid(), session_key, pool_size, bool(keep_alive))
+    session = _SESSIONS.get(key)
+    if session is not None:
+        return session
+
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                pool_block=True,
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['Connection'] = (
+                'keep-alive' if keep_alive else 'close'
+            )
+            _SESSIONS[key] = session
+            _logger.debug(
+                "Created CJ API session %s (pool size %d)",
+                session_key, pool_size
+            )
+    return session
+
+
+def close_sessions(session_key=None):
+    """Close pooled sessions, either all of them or those of one key."""
+    with _SESSIONS_LOCK:
+        for key in list(_SESSIONS):
+            if session_key is None or key[1] == session_key:
+                _SESSIONS.pop(key).close()
+
+
+# Access tokens shared by every client instance of this process
+_TOKENS = {}
+_TOKENS_LOCK = threading.Lock()
+_TOKEN_REFRESH_LOCKS = {}
+
+
+class MemoryTokenStore:
+    """Access token store shared by all client instances of this process.
+
+    Subclasses may persist tokens elsewhere (see ``DatabaseTokenStore``) to
+    share them across worker processes as well.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        with _TOKENS_LOCK:
+            self._refresh_lock = _TOKEN_REFRESH_LOCKS.setdefault(
+                key, threading.Lock()
+            )
+
+    def get(self):
+        """Return the cached ``(access_token, expiry_timestamp)``."""
+        return _TOKENS.get(self.key, (None, 0))
+
+    def set(self, access_token, token_expiry):
+        """Cache a freshly obtained token."""
+        _TOKENS[self.key] = (access_token, token_expiry)
+
+    def clear(self):
+        """Forget the cached token, e.g. after a credential change."""
+        _TOKENS.pop(self.key, None)
+
+    def discard(self, access_token):
+        """Forget the cached token if it still is ``access_token``."""
+        with _TOKENS_LOCK:
+            if _TOKENS.get(self.key, (None, 0))[0] == access_token:
+                del _TOKENS[self.key]
+
+    @contextmanager
+    def refresh_lock(self):
+        """Serialize token refreshes so only one caller authenticates."""
+        with self._refresh_lock:
+            yield
+
+
+# Token buckets shared by every client instance of this process
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+class MemoryRateLimiter:
+    """Token bucket rate limiter shared by all threads of this process.
+
+    Every call reserves a token, even when the bucket is empty, and then
+    sleeps until its reservation is due. Concurrent callers therefore queue
+    up in arrival order instead of failing with a 429 from CJ. Subclasses
+    may keep the buckets elsewhere (see ``DatabaseRateLimiter``) to share
+    them across worker processes as well.
+    """
+
+    def __init__(self, key, rates=None,
+                 max_wait=DEFAULT_RATE_LIMIT_MAX_WAIT):
+        self.key = key
+        self.rates = dict(DEFAULT_RATE_LIMITS, **(rates or {}))
+        self.max_wait = max_wait
+
+    def _reserve(self, group, rate, capacity):
+        """Take one token and return the seconds to wait until it is due."""
+        now = time.monotonic()
+        with _BUCKETS_LOCK:
+            tokens, updated = _BUCKETS.get((self.key, group), (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate) - 1
+            wait = -tokens / rate if tokens < 0 else 0.0
+            self._check_wait(group, wait)
+            _BUCKETS[(self.key, group)] = (tokens, now)
+        return wait
+
+    def _check_wait(self, group, wait):
+        """Refuse reservations that would queue longer than allowed."""
+        if wait > self.max_wait:
+            raise CJRateLimitError(
+                f"Rate limit for CJ {group} requests exceeded. "
+                f"Please wait {int(wait)} seconds before trying again."
+            )
+
+    def reserve(self, group):
+        """Reserve a slot for a request of the given group.
+
+        Returns the number of seconds the caller must wait before sending.
+        """
+        rate = self.rates.get(group, DEFAULT_RATE_LIMITS['product'])
+        if not rate or rate <= 0:
+            return 0.0
+        return self._reserve(group, rate, max(1.0, rate))
+
+    def acquire(self, group):
+        """Block until a request of the given group may be sent.
+
+        Returns the number of seconds spent waiting.
+        """
+        wait = self.reserve(group)
+        if wait > 0:
+            _logger.debug(
+                "CJ API rate limit: waiting %.2fs for %s slot", wait, group
+            )
+            time.sleep(wait)
+        return wait
+
+
+# Circuit breakers shared by every client instance of this process
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
 
-        payload = {
-            'email': self.email,
-            'password': self.password
-        }
 
+class CircuitBreaker:
+    """Fail fast while CJ is unreachable.
+
+    The circuit opens after ``failure_threshold`` consecutive failed calls.
+    While open, calls are refused immediately with ``CJCircuitOpenError``.
+    Once ``reset_timeout`` seconds have passed the circuit is half-open and
+    lets a single probe call through: its success closes the circuit, its
+    failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = self.CLOSED
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """Current state, turning open into half-open once it is due."""
+        if (
+            self._state == self.OPEN
+            and time.monotonic() >= self.opened_at + self.reset_timeout
+        ):
+            return self.HALF_OPEN
+        return self._state
+
+    def before_call(self):
+        """Refuse the call while open, or let one probe through."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            retry_in = max(
+                self.opened_at + self.reset_timeout - time.monotonic(), 0
+            )
+        raise CJCircuitOpenError(
+            "CJDropshipping API is unavailable after repeated failures. "
+            f"Next attempt in {int(retry_in)} seconds."
+        )
+
+    def record_success(self):
+        """Close the circuit after a successful call."""
+        with self._lock:
+            if self._state != self.CLOSED:
+                _logger.info("CJ API circuit closed")
+            self._state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    @contextmanager
+    def call(self):
+        """Guard an API call and record its outcome."""
+        self.before_call()
         try:
-            # Debug logging for troubleshooting
-            _logger.info(f"CJ API Debug - Request URL: {url}")
-            _logger.info(f"CJ API Debug - Request Payload: {payload}")
-            _logger.info(f"CJ API Debug - Base URL: {self.base_url}")
-            
-            response = requests.post(url, json=payload, timeout=30)
-            
-            # Log detailed response information
-            _logger.info(f"CJ API Debug - Response Status Code: {response.status_code}")
-            _logger.info(f"CJ API Debug - Response Headers: {dict(response.headers)}")
-            _logger.info(f"CJ API Debug - Response Content-Type: {response.headers.get('content-type', 'N/A')}")
-            _logger.info(f"CJ API Debug - Response Text: {response.text}")
-            _logger.info(f"CJ API Debug - Response URL: {response.url}")
-            
-            # Handle rate limiting gracefully
-            if response.status_code == 429:
-                try:
-                    data = response.json()
-                    error_msg = data.get('message', 'Rate limit exceeded')
-                    _logger.warning(f"CJ API Rate Limit: {error_msg}")
-                    raise ValueError(f"Rate limit exceeded: {error_msg}. Please wait 5 minutes before trying again.")
-                except ValueError:
-                    raise
-                except Exception:
-                    raise ValueError("Rate limit exceeded. Please wait 5 minutes before trying again.")
-            
-            # Try to parse JSON response
-            try:
-                response_json = response.json()
-                _logger.info(f"CJ API Debug - Response JSON: {response_json}")
-            except Exception as json_error:
-                _logger.error(f"CJ API Debug - Failed to parse JSON: {json_error}")
-            
-            response.raise_for_status()
+            yield
+        except (requests.exceptions.RequestException, CJApiError) as e:
+            if is_outage(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            # Includes the CancelledError of an async call cut short
+            self.release_probe()
+            raise
+        self.record_success()
 
-            data = response.json()
-            if data.get('code') == 200 and data.get('result'):
-                self.access_token = data['data']['accessToken']
-                
-                # Use the actual expiry date from CJDropshipping
-                expiry_str = data['data'].get('accessTokenExpiryDate')
-                if expiry_str:
-                    try:
-                        # Parse the ISO date string: "2025-10-25T10:53:23+08:00"
-                        # Remove timezone and parse as Beijing time
-                        if '+08:00' in expiry_str:
-                            expiry_dt = datetime.fromisoformat(expiry_str.replace('+08:00', ''))
-                            # Convert Beijing time to UTC timestamp (subtract 8 hours)
-                            self.token_expiry = expiry_dt.timestamp() - (8 * 3600)
-                        else:
-                            # Fallback parsing
-                            expiry_dt = datetime.fromisoformat(expiry_str.replace('Z', ''))
-                            self.token_expiry = expiry_dt.timestamp()
-                            
-                        _logger.info(f"Token will expire at UTC timestamp: {self.token_expiry} ({datetime.fromtimestamp(self.token_expiry)})")
-                    except Exception as e:
-                        _logger.warning(f"Could not parse expiry date '{expiry_str}': {e}")
-                        # Fallback to 2 hours from now
-                        self.token_expiry = time.time() + 7200
-                        _logger.info("Using fallback expiry time: 2 hours from now")
-                else:
-                    # Fallback to 2 hours from now
-                    self.token_expiry = time.time() + 7200
-                    _logger.info("No expiry date provided, using fallback: 2 hours from now")
-                    
-                _logger.info("Successfully authenticated with CJDropshipping API")
-                
+    def release_probe(self):
+        """End a call that neither proved nor disproved CJ availability."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        """Count a failed call and open the circuit when needed."""
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self._state != self.OPEN or self._probing:
+                    _logger.warning(
+                        "CJ API circuit opened after %d failures",
+                        self.failures
+                    )
+                self._state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+def get_circuit_breaker(key, failure_threshold=5, reset_timeout=60.0):
+    """Return the circuit breaker of the given key, creating it once."""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(key)
+        if breaker is None:
+            breaker = _BREAKERS[key] = CircuitBreaker(
+                failure_threshold, reset_timeout
+            )
+        breaker.failure_threshold = max(int(failure_threshold), 1)
+        breaker.reset_timeout = reset_timeout
+    return breaker
+
+
+def is_outage(exc):
+    """Tell whether an API error indicates CJ being unavailable."""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        response = exc.response
+        return response is None or response.status_code in RETRY_STATUSES
+    if isinstance(exc, CJApiError):
+        return exc.code in RETRY_STATUSES
+    return isinstance(exc, requests.exceptions.RequestException)
+
+
+def is_auth_rejection(exc):
+    """Tell whether an API error means CJ rejected the access token."""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return exc.response is not None and exc.response.status_code == 401
+    return isinstance(exc, CJApiError) and exc.code in AUTH_ERROR_CODES
+
+
+def cache_key(endpoint, params=None, data=None):
+    """Build the cache key of a request."""
+    return endpoint + '?' + json.dumps(
+        [params or {}, data or {}], sort_keys=True, default=str
+    )
+
+
+# Response caches shared by every client instance of this process
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+class ResponseCache:
+    """Bounded LRU cache of read-only API responses with a TTL per endpoint.
+
+    Only endpoints with a TTL are cached. Subclasses may back the cache with
+    shared storage (see ``DatabaseResponseCache``) by implementing
+    ``_load``, ``_store`` and ``_delete``; entries are then also kept in
+    process for at most ``SHARED_CACHE_LOCAL_TTL`` seconds.
+
+    Entries are kept as JSON and decoded on every hit, so callers get their
+    own copy and cannot alter what later callers receive.
+    """
+
+    shared = False
+
+    def __init__(self, max_entries=DEFAULT_CACHE_MAX_ENTRIES, ttls=None):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_CACHE_TTLS, **(ttls or {}))
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_entries=DEFAULT_CACHE_MAX_ENTRIES, ttls=None):
+        """Apply new settings to an existing cache."""
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_CACHE_TTLS, **(ttls or {}))
+
+    def ttl(self, endpoint):
+        """Return the TTL of an endpoint, 0 when it is not cached."""
+        return self.ttls.get(endpoint, 0)
+
+    def get(self, endpoint, params=None, data=None):
+        """Return ``(hit, value)`` for a request."""
+        key = cache_key(endpoint, params, data)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, json.loads(entry[1])
+            self._entries.pop(key, None)
+
+        entry = self._load(key) if self.shared else None
+        with self._lock:
+            if entry and entry[0] > now:
+                self._remember(key, entry[0], entry[1])
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+        return False, None
+
+    def set(self, endpoint, value, params=None, data=None):
+        """Cache the response of a request."""
+        ttl = self.ttl(endpoint)
+        if not ttl:
+            return
+        key = cache_key(endpoint, params, data)
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self.shared:
+            self._store(key, endpoint, expires_at, value)
+
+    def invalidate(self, endpoint=None, params=None, data=None):
+        """Drop one cached request, or everything when no endpoint is given."""
+        key = cache_key(endpoint, params, data) if endpoint else None
+        with self._lock:
+            if key:
+                self._entries.pop(key, None)
             else:
-                error_msg = data.get('message', 'Unknown error')
-                _logger.error(f"CJ API Debug - Authentication failed - Response Code: {data.get('code')}, Message: {error_msg}, Full Response: {data}")
-                raise ValueError(f"Authentication failed: {error_msg}")
+                self._entries.clear()
+        if self.shared:
+            self._delete(key)
 
-        except requests.exceptions.RequestException as e:
-            _logger.error("CJDropshipping API authentication error: %s", str(e))
-            _logger.error(f"CJ API Debug - Exception type: {type(e).__name__}")
-            _logger.error(f"CJ API Debug - Exception details: {str(e)}")
+    def invalidate_product(self, product_id):
+        """Drop cached detail and variants of a product."""
+        for endpoint in ('/product/query', '/product/variant/query'):
+            self.invalidate(endpoint, params={'pid': product_id})
+
+    def stats(self):
+        """Return hit/miss counters of this process."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
+
+    def _remember(self, key, expires_at, value):
+        """Store an entry in process, evicting the least recently used."""
+        if self.shared:
+            expires_at = min(expires_at, time.time() + SHARED_CACHE_LOCAL_TTL)
+        self._entries[key] = (expires_at, json.dumps(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > max(self.max_entries, 0):
+            self._entries.popitem(last=False)
+
+    def _load(self, key):
+        """Return ``(expires_at, value)`` from shared storage, if any."""
+        return None
+
+    def _store(self, key, endpoint, expires_at, value):
+        """Write an entry to shared storage."""
+
+    def _delete(self, key=None):
+        """Delete one entry, or all of them, from shared storage."""
+
+
+def get_response_cache(key, factory=ResponseCache):
+    """Return the response cache of the given key, creating it once."""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = factory()
+    return cache
+
+
+class _Flight:
+    """A call in progress, awaited by every identical concurrent call."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Let concurrent identical calls share a single execution.
+
+    The first caller of a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same exception, or a copy of
+    the result of their own (decoded from JSON, like cached responses).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Run ``func`` once for all concurrent callers of ``key``."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return json.loads(flight.result)
+
+        try:
+            result = func()
+            flight.result = json.dumps(result)
+        except BaseException as e:
+            flight.error = e
             raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return result
+
+
+# Single-flight groups shared by every client instance of this process
+_FLIGHTS = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+
+def get_single_flight(key):
+    """Return the single-flight group of the given key, creating it once."""
+    with _FLIGHTS_LOCK:
+        return _FLIGHTS.setdefault(key, SingleFlight())
 
-    def _make_request(self, method, endpoint, data=None, params=None):
-        """Make API request with error handling"""
-        url = f"{self.base_url}{endpoint}"
-        headers = self._get_headers()
 
-        # Add debug logging for all requests
-        _logger.info(f"CJ API Request - {method} {url}")
-        if params:
-            _logger.info(f"CJ API Request - Params: {params}")
+def redact(value):
+    """Mask credentials in request data before it is captured."""
+    if isinstance(value, dict):
+        return {
+            key: '***' if str(key).lower() in REDACTED_KEYS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+class ExchangeRecorder:
+    """Ring buffer of the last API exchanges, truncated and redacted.
+
+    Recording is off unless diagnostics are enabled, so normal operation
+    does not pay for formatting request and response bodies.
+    """
+
+    def __init__(self, size=DEFAULT_CAPTURE_SIZE):
+        self.enabled = False
+        self._exchanges = deque(maxlen=size)
+
+    def configure(self, enabled, size=DEFAULT_CAPTURE_SIZE):
+        """Turn capture on or off and resize the buffer."""
+        self.enabled = enabled
+        size = max(int(size or DEFAULT_CAPTURE_SIZE), 1)
+        if size != self._exchanges.maxlen:
+            self._exchanges = deque(self._exchanges, maxlen=size)
+
+    def record(self, method, endpoint, params, data, response, elapsed):
+        """Capture one exchange if capture is enabled."""
+        if not self.enabled:
+            return
+        content = response.content or b''
+        body = content[:CAPTURE_BODY_LIMIT].decode('utf-8', 'replace')
+        if len(content) > CAPTURE_BODY_LIMIT:
+            body += f"... [{len(content) - CAPTURE_BODY_LIMIT} more bytes]"
         if data:
-            _logger.info(f"CJ API Request - Data: {data}")
+            data = json.dumps(redact(data), default=str)[:CAPTURE_BODY_LIMIT]
+        self._exchanges.append({
+            'time': datetime.now().isoformat(sep=' ', timespec='seconds'),
+            'method': method,
+            'endpoint': endpoint,
+            'params': redact(params),
+            'data': data or None,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000),
+            'response': REDACTED_JSON_RE.sub(r'\1***\2', body),
+        })
 
-        try:
-            if method == 'GET':
-                response = requests.get(
-                    url, headers=headers, params=params, timeout=30
-                )
-            elif method == 'POST':
-                response = requests.post(
-                    url, headers=headers, json=data, timeout=30
-                )
-            elif method == 'PUT':
-                response = requests.put(
-                    url, headers=headers, json=data, timeout=30
-                )
+    def exchanges(self):
+        """Return the captured exchanges, oldest first."""
+        return list(self._exchanges)
+
+    def clear(self):
+        """Drop all captured exchanges."""
+        self._exchanges.clear()
+
+
+# Exchange recorders shared by every client instance of this process
+_RECORDERS = {}
+_RECORDERS_LOCK = threading.Lock()
+
+
+def get_exchange_recorder(key):
+    """Return the exchange recorder of the given key, creating it once."""
+    with _RECORDERS_LOCK:
+        return _RECORDERS.setdefault(key, ExchangeRecorder())
+
+
+def histogram_quantile(buckets, quantile):
+    """Estimate a latency quantile (seconds) from histogram bucket counts."""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    rank = quantile * total
+    seen = 0
+    for index, count in enumerate(buckets):
+        seen += count
+        if seen >= rank:
+            if index < len(LATENCY_BUCKETS):
+                return LATENCY_BUCKETS[index]
+            break
+    return LATENCY_BUCKETS[-1]
+
+
+class EndpointMetrics:
+    """Aggregated call statistics of one endpoint."""
+
+    __slots__ = (
+        'requests', 'errors', 'retries', 'duration', 'max_duration',
+        'bytes_sent', 'bytes_received', 'rate_limit_wait', 'cache_hits',
+        'cache_misses', 'statuses', 'buckets',
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.duration = 0.0
+        self.max_duration = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rate_limit_wait = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.statuses = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+
+class MetricsCollector:
+    """In-memory per-endpoint API metrics of this process.
+
+    Statistics are aggregated per flush period. When a ``sink`` is set,
+    the period is handed over to it (and a new one started) by the first
+    observation after ``flush_interval`` seconds or after ``flush_size``
+    observations, e.g. to store it in ``cjdropship.metrics``. Every worker
+    process thus flushes its own statistics while serving API calls.
+    """
+
+    def __init__(self, flush_interval=DEFAULT_METRICS_FLUSH_INTERVAL,
+                 sink=None, flush_size=DEFAULT_METRICS_FLUSH_SIZE):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.sink = sink
+        self.period_start = time.time()
+        self._observations = 0
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _get(self, endpoint):
+        self._observations += 1
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = EndpointMetrics()
+        return metrics
+
+    def observe_response(self, endpoint, status, elapsed, size, sent=0):
+        """Record a request of ``sent`` bytes that got an HTTP response."""
+        with self._lock:
+            metrics = self._get(endpoint)
+            metrics.requests += 1
+            if status >= 400:
+                metrics.errors += 1
+            metrics.duration += elapsed
+            metrics.max_duration = max(metrics.max_duration, elapsed)
+            metrics.bytes_sent += sent
+            metrics.bytes_received += size
+            metrics.statuses[str(status)] = (
+                metrics.statuses.get(str(status), 0) + 1
+            )
+            metrics.buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self._maybe_flush()
+
+    def observe_failure(self, endpoint, label, sent=False):
+        """Record a failed call, ``sent`` if no response was recorded."""
+        with self._lock:
+            metrics = self._get(endpoint)
+            if sent:
+                metrics.requests += 1
+            metrics.errors += 1
+            metrics.statuses[label] = metrics.statuses.get(label, 0) + 1
+        self._maybe_flush()
+
+    def observe_retry(self, endpoint):
+        """Record a retried call."""
+        with self._lock:
+            self._get(endpoint).retries += 1
+
+    def observe_rate_limit_wait(self, endpoint, wait):
+        """Record time spent queueing for a rate limit slot."""
+        if wait > 0:
+            with self._lock:
+                self._get(endpoint).rate_limit_wait += wait
+
+    def observe_cache(self, endpoint, hit):
+        """Record a response cache lookup."""
+        with self._lock:
+            metrics = self._get(endpoint)
+            if hit:
+                metrics.cache_hits += 1
             else:
-                raise ValueError(
-                    f"Unsupported HTTP method: {method}"
-                )
+                metrics.cache_misses += 1
+        self._maybe_flush()
 
-            # Log response details for debugging
-            _logger.info(f"CJ API Response - Status: {response.status_code}")
-            _logger.info(f"CJ API Response - Text: {response.text}")
+    def snapshot(self):
+        """Return the statistics of the current period without resetting."""
+        with self._lock:
+            return {
+                endpoint: {
+                    slot: copy.copy(getattr(metrics, slot))
+                    for slot in EndpointMetrics.__slots__
+                }
+                for endpoint, metrics in self._endpoints.items()
+            }
 
-            response.raise_for_status()
-            result = response.json()
+    def drain(self):
+        """Return ``(period_start, period_end, metrics)`` and start anew."""
+        with self._lock:
+            endpoints, self._endpoints = self._endpoints, {}
+            period_start, self.period_start = self.period_start, time.time()
+            self._observations = 0
+        return period_start, self.period_start, endpoints
 
-            if result.get('code') != 200:
-                error_msg = result.get('message', 'Unknown error')
-                _logger.error(f"CJ API Error - Code: {result.get('code')}, Message: {error_msg}")
-                raise ValueError(f"API Error: {error_msg}")
+    def _maybe_flush(self):
+        if self.sink and (
+            time.time() - self.period_start >= self.flush_interval
+            or self._observations >= self.flush_size
+        ):
+            self.flush()
 
-            return result.get('data', {})
+    def flush(self):
+        """Hand the current period over to the sink."""
+        period_start, period_end, endpoints = self.drain()
+        if not endpoints or not self.sink:
+            return
+        try:
+            self.sink(period_start, period_end, endpoints)
+        except Exception:  # pylint: disable=broad-except
+            # Metrics must never break API calls
+            _logger.exception("Failed to flush CJ API metrics")
 
-        except requests.exceptions.RequestException as e:
-            _logger.error("CJDropshipping API request error: %s", str(e))
-            raise
+
+# Metrics collectors shared by every client instance of this process
+_METRICS = {}
+_METRICS_LOCK = threading.Lock()
+
+
+def get_metrics_collector(key):
+    """Return the metrics collector of the given key, creating it once."""
+    with _METRICS_LOCK:
+        return _METRICS.setdefault(key, MetricsCollector())
+
+
+def flush_metrics():
+    """Flush the metrics of every collector of this process."""
+    with _METRICS_LOCK:
+        collectors = list(_METRICS.values())
+    for collector in collectors:
+        collector.flush()
+
+
+def timestamp_to_datetime(timestamp):
+    """Convert a UTC timestamp to the naive UTC datetime Odoo stores."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def request_body_size(response, data):
+    """Return the size in bytes of the body a response was requested with."""
+    request = response.request
+    body = request.body if request is not None else None
+    if body is None and data is not None:
+        body = json.dumps(data)
+    if isinstance(body, str):
+        body = body.encode()
+    return len(body or b'')
+
+
+def token_is_valid(access_token, token_expiry):
+    """Check whether a token is present and not about to expire."""
+    return bool(access_token) and (
+        time.time() < token_expiry - TOKEN_REFRESH_BUFFER
+    )
+
+
+class CJDropshippingEndpointsMixin:
+    """CJDropshipping API endpoints, shared by the blocking and async clients.
+
+    Every method returns what the client's ``_make_request`` returns: the
+    response data for ``CJDropshippingAPI``, an awaitable resolving to it for
+    ``AsyncCJDropshippingAPI``.
+    """
 
     # Product Methods
     def get_product_list(self, page=1, page_size=20, category_id=None):
@@ -181,6 +981,16 @@ class CJDropshippingAPI:
 
         return self._make_request('GET', '/product/list', params=params)
 
+    def iter_product_pages(self, category_id=None, page_size=20,
+                           start_page=1, prefetch=True):
+        """Yield ``(page_number, products)`` for every product list page"""
+        return self._iter_pages(
+            lambda page: self.get_product_list(
+                page=page, page_size=page_size, category_id=category_id
+            ),
+            page_size, start_page, prefetch
+        )
+
     def get_product_detail(self, product_id):
         """Get detailed product information"""
         params = {'pid': product_id}
@@ -199,6 +1009,48 @@ class CJDropshippingAPI:
 
         return self._make_request('GET', '/product/inventory/query', params=params)
 
+    def _product_fetch_tasks(self, product_ids, detail, variants, inventory,
+                             variant_ids):
+        """Return the empty ``fetch_products`` results and the calls to run.
+
+        Every task is ``(pid, part, vid, call)``; ``vid`` is set for the
+        per-variant ``variant_inventory`` part, whose data and errors are
+        keyed by variant id.
+        """
+        fetchers = {}
+        if detail:
+            fetchers['detail'] = self.get_product_detail
+        if variants:
+            fetchers['variants'] = self.get_product_variant
+        if inventory:
+            fetchers['inventory'] = self.get_product_inventory
+
+        results = {
+            pid: {'errors': {}} for pid in dict.fromkeys(product_ids) if pid
+        }
+        tasks = [
+            (pid, part, None, functools.partial(fetcher, pid))
+            for pid in results
+            for part, fetcher in fetchers.items()
+        ]
+        for vid, pid in (variant_ids or {}).items():
+            if vid and pid:
+                results.setdefault(pid, {'errors': {}})
+                tasks.append((
+                    pid, 'variant_inventory', vid,
+                    functools.partial(self.get_product_inventory, pid, vid),
+                ))
+        return results, tasks
+
+    @staticmethod
+    def _store_fetched(results, pid, part, vid, value, error=False):
+        """Store one fetched part (or its error message) in ``results``"""
+        target = results[pid]['errors'] if error else results[pid]
+        if vid is None:
+            target[part] = value
+        else:
+            target.setdefault(part, {})[vid] = value
+
     # Order Methods
     def create_order(self, order_data):
         """Create order in CJDropshipping"""
@@ -209,14 +1061,23 @@ class CJDropshippingAPI:
         params = {'orderId': order_id}
         return self._make_request('GET', '/shopping/order/query', params=params)
 
-    def get_order_list(self, page=1, page_size=20):
-        """Get list of orders"""
+    def get_order_list(self, page=1, page_size=20, order_number=None):
+        """Get list of orders, optionally those of one order number"""
         params = {
             'pageNum': page,
             'pageSize': page_size
         }
+        if order_number:
+            params['orderNumber'] = order_number
         return self._make_request('GET', '/shopping/order/list', params=params)
 
+    def iter_order_pages(self, page_size=20, start_page=1, prefetch=True):
+        """Yield ``(page_number, orders)`` for every order list page"""
+        return self._iter_pages(
+            lambda page: self.get_order_list(page=page, page_size=page_size),
+            page_size, start_page, prefetch
+        )
+
     # Logistics Methods
     def get_shipping_methods(self, product_list, country_code):
         """Get available shipping methods"""
@@ -235,3 +1096,397 @@ class CJDropshippingAPI:
     def get_categories(self):
         """Get product categories"""
         return self._make_request('GET', '/product/categoryList')
+
+    # Cache Methods
+    def invalidate_product_cache(self, product_id):
+        """Drop cached responses about a product, e.g. after a webhook"""
+        if self.cache is not None:
+            self.cache.invalidate_product(product_id)
+
+
+class CJDropshippingAPI(CJDropshippingEndpointsMixin):
+    """CJDropshipping API Client for handling API requests."""
+
+    def __init__(self, email, password, session_key=None,
+                 pool_size=DEFAULT_POOL_SIZE, keep_alive=True,
+                 token_store=None, rate_limiter=None, retry_policies=None,
+                 circuit_breaker=None, cache=None, single_flight=None,
+                 recorder=None, metrics=None, base_url=None):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip('/')
+        self.email = email
+        self.password = password
+        self.access_token = None
+        self.token_expiry = 0
+        self.session = get_session(session_key, pool_size, keep_alive)
+        self.token_store = token_store or MemoryTokenStore(
+            session_key or email
+        )
+        self.rate_limiter = rate_limiter or MemoryRateLimiter(
+            session_key or email
+        )
+        self.retry_policies = retry_policies or default_retry_policies()
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker(
+            session_key or email
+        )
+        self.cache = cache
+        self.single_flight = single_flight or get_single_flight(
+            session_key or email
+        )
+        self.recorder = recorder or get_exchange_recorder(
+            session_key or email
+        )
+        self.metrics = metrics or get_metrics_collector(session_key or email)
+
+    def _get_headers(self):
+        """Get headers with authentication token"""
+        if not token_is_valid(self.access_token, self.token_expiry):
+            self.access_token, self.token_expiry = self.token_store.get()
+
+        if not token_is_valid(self.access_token, self.token_expiry):
+            with self.token_store.refresh_lock():
+                # Another thread or worker may have refreshed it meanwhile
+                self.access_token, self.token_expiry = self.token_store.get()
+                if not token_is_valid(self.access_token, self.token_expiry):
+                    _logger.info(
+                        "Token expired or missing, re-authenticating..."
+                    )
+                    self._authenticate()
+                    self.token_store.set(self.access_token, self.token_expiry)
+
+        return {
+            'Content-Type': 'application/json',
+            TOKEN_HEADER: self.access_token
+        }
+
+    def _reject_token(self, response):
+        """Evict the token CJ rejected for ``response`` and get a new one.
+
+        The shared token is only cleared while it still is the rejected one,
+        so a token another worker refreshed meanwhile is kept.
+        """
+        rejected = response.request.headers.get(TOKEN_HEADER)
+        with self.token_store.refresh_lock():
+            self.token_store.discard(rejected)
+            self.access_token, self.token_expiry = self.token_store.get()
+            if not token_is_valid(self.access_token, self.token_expiry):
+                _logger.info("Access token rejected, re-authenticating...")
+                self._authenticate()
+                self.token_store.set(self.access_token, self.token_expiry)
+
+    def _authenticate(self):
+        """Authenticate with CJDropshipping API"""
+        endpoint = '/authentication/getAccessToken'
+        url = f"{self.base_url}{endpoint}"
+
+        payload = {
+            'email': self.email,
+            'password': self.password
+        }
+
+        try:
+            self.metrics.observe_rate_limit_wait(
+                endpoint, self.rate_limiter.acquire('auth')
+            )
+            started = time.monotonic()
+            response = self.session.post(
+                url, json=payload, timeout=REQUEST_TIMEOUT
+            )
+            self._log_exchange(
+                'POST', endpoint, None, payload, response,
+                time.monotonic() - started
+            )
+
+            # Handle rate limiting gracefully
+            if response.status_code == 429:
+                try:
+                    error_msg = response.json().get('message')
+                except ValueError:
+                    error_msg = None
+                _logger.warning(
+                    "CJ API Rate Limit: %s", error_msg or 'Rate limit exceeded'
+                )
+                if error_msg:
+                    raise CJRateLimitError(
+                        f"Rate limit exceeded: {error_msg}. "
+                        "Please wait 5 minutes before trying again."
+                    )
+                raise CJRateLimitError(
+                    "Rate limit exceeded. "
+                    "Please wait 5 minutes before trying again."
+                )
+
+            response.raise_for_status()
+
+            data = response.json()
+            if data.get('code') == 200 and data.get('result'):
+                self.access_token = data['data']['accessToken']
+                self.token_expiry = self._parse_token_expiry(
+                    data['data'].get('accessTokenExpiryDate')
+                )
+                _logger.info(
+                    "Successfully authenticated with CJDropshipping API, "
+                    "token valid until %s",
+                    datetime.fromtimestamp(self.token_expiry)
+                )
+            else:
+                error_msg = data.get('message', 'Unknown error')
+                _logger.error(
+                    "CJ API authentication failed - Code: %s, Message: %s",
+                    data.get('code'), error_msg
+                )
+                raise ValueError(f"Authentication failed: {error_msg}")
+
+        except requests.exceptions.RequestException as e:
+            if not isinstance(e, requests.exceptions.HTTPError):
+                self.metrics.observe_failure(
+                    endpoint, type(e).__name__, sent=True
+                )
+            _logger.error(
+                "CJDropshipping API authentication error (%s): %s",
+                type(e).__name__, str(e)
+            )
+            raise
+
+    @staticmethod
+    def _parse_token_expiry(expiry_str):
+        """Return the UTC timestamp of a CJ token expiry date"""
+        if not expiry_str:
+            _logger.info(
+                "No expiry date provided, using fallback: 2 hours from now"
+            )
+            return time.time() + 7200
+
+        try:
+            # Parse the ISO date string: "2025-10-25T10:53:23+08:00"
+            # Remove timezone and parse as Beijing time
+            if '+08:00' in expiry_str:
+                expiry_dt = datetime.fromisoformat(
+                    expiry_str.replace('+08:00', '')
+                )
+                # Convert Beijing time to UTC timestamp (subtract 8 hours)
+                return expiry_dt.timestamp() - (8 * 3600)
+            # Fallback parsing
+            expiry_dt = datetime.fromisoformat(expiry_str.replace('Z', ''))
+            return expiry_dt.timestamp()
+        except ValueError as e:
+            _logger.warning(
+                "Could not parse expiry date '%s': %s - using fallback "
+                "expiry time: 2 hours from now", expiry_str, e
+            )
+            return time.time() + 7200
+
+    def _log_exchange(self, method, endpoint, params, data, response,
+                      elapsed):
+        """Log one compact line per API call and capture it if enabled"""
+        _logger.info(
+            "CJ API %s %s -> %s in %.0f ms (%d bytes)",
+            method, endpoint, response.status_code, elapsed * 1000,
+            len(response.content)
+        )
+        self.recorder.record(
+            method, endpoint, params, data, response, elapsed
+        )
+        self.metrics.observe_response(
+            endpoint, response.status_code, elapsed, len(response.content),
+            request_body_size(response, data)
+        )
+
+    def _observe_failure(self, endpoint, error):
+        """Count a failed attempt in the endpoint metrics"""
+        if isinstance(error, CJApiError):
+            self.metrics.observe_failure(endpoint, f"cj_{error.code}")
+        elif not isinstance(error, requests.exceptions.HTTPError):
+            # No response was logged for transport errors
+            self.metrics.observe_failure(
+                endpoint, type(error).__name__, sent=True
+            )
+
+    def _make_request(self, method, endpoint, data=None, params=None):
+        """Make API request with error handling and bounded retries"""
+        if method not in self.retry_policies:
+            raise ValueError(
+                f"Unsupported HTTP method: {method}"
+            )
+
+        cached = self.cache is not None and self.cache.ttl(endpoint)
+        if cached:
+            hit, result = self.cache.get(endpoint, params, data)
+            self.metrics.observe_cache(endpoint, hit)
+            if hit:
+                return result
+
+        def fetch():
+            with self.circuit_breaker.call():
+                result = self._request_with_retries(
+                    method, endpoint, data, params
+                )
+            if cached:
+                self.cache.set(endpoint, result, params, data)
+            return result
+
+        # Identical concurrent GETs share one network call
+        if method == 'GET':
+            return self.single_flight.do(
+                cache_key(endpoint, params, data), fetch
+            )
+        return fetch()
+
+    def _request_with_retries(self, method, endpoint, data=None, params=None):
+        """Send a request, retrying transient failures per retry policy"""
+        policy = self.retry_policies[method]
+
+        started = time.monotonic()
+        attempt = 0
+        token_renewed = False
+        while True:
+            attempt += 1
+            response = None
+            try:
+                response = self._send_request(method, endpoint, data, params)
+                return self._parse_response(response)
+            except (requests.exceptions.RequestException, CJApiError) as e:
+                self._observe_failure(endpoint, e)
+                # A rejected token is renewed once, not retried as is
+                if (response is not None and not token_renewed
+                        and is_auth_rejection(e)):
+                    token_renewed = True
+                    attempt -= 1
+                    self._reject_token(response)
+                    continue
+                delay = policy.retry_delay(
+                    attempt, e, time.monotonic() - started
+                )
+                if delay is None:
+                    if isinstance(e, requests.exceptions.RequestException):
+                        _logger.error(
+                            "CJDropshipping API request error: %s", str(e)
+                        )
+                    raise
+                self.metrics.observe_retry(endpoint)
+                _logger.warning(
+                    "CJ API %s %s failed (attempt %d/%d): %s - retrying "
+                    "in %.1fs",
+                    method, endpoint, attempt, policy.max_attempts, e, delay
+                )
+                time.sleep(delay)
+
+    def _send_request(self, method, endpoint, data=None, params=None):
+        """Send a single API request and return the raw response"""
+        url = f"{self.base_url}{endpoint}"
+        headers = self._get_headers()
+        self.metrics.observe_rate_limit_wait(
+            endpoint, self.rate_limiter.acquire(endpoint_group(endpoint))
+        )
+
+        started = time.monotonic()
+        if method == 'GET':
+            response = self.session.get(
+                url, headers=headers, params=params, timeout=REQUEST_TIMEOUT
+            )
+        else:
+            response = self.session.request(
+                method, url, headers=headers, json=data,
+                timeout=REQUEST_TIMEOUT
+            )
+        self._log_exchange(
+            method, endpoint, params, data, response,
+            time.monotonic() - started
+        )
+        return response
+
+    def _parse_response(self, response):
+        """Check an API response and return its data"""
+        response.raise_for_status()
+        result = response.json()
+
+        if result.get('code') != 200:
+            error_msg = result.get('message', 'Unknown error')
+            _logger.error(
+                "CJ API Error - Code: %s, Message: %s",
+                result.get('code'), error_msg
+            )
+            raise CJApiError(f"API Error: {error_msg}", result.get('code'))
+
+        return result.get('data', {})
+
+    def iter_products(self, category_id=None, page_size=20, start_page=1,
+                      prefetch=True):
+        """Yield every product of the catalog, one page in memory at a time"""
+        for _page, products in self.iter_product_pages(
+                category_id, page_size, start_page, prefetch):
+            yield from products
+
+    def _iter_pages(self, fetch_page, page_size, start_page=1, prefetch=True):
+        """Walk a paginated list endpoint lazily.
+
+        While the caller handles one page, the next one is fetched by a
+        background thread, so at most two pages are held in memory.
+        """
+        executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='cjdropship_prefetch'
+        ) if prefetch else None
+        try:
+            page = start_page
+            pending = executor.submit(fetch_page, page) if executor else None
+            while True:
+                result = pending.result() if pending else fetch_page(page)
+                items = (result or {}).get('list') or []
+                total = (result or {}).get('total')
+                has_more = len(items) >= page_size and (
+                    total is None or page * page_size < int(total)
+                )
+                pending = None
+                if has_more and executor:
+                    pending = executor.submit(fetch_page, page + 1)
+
+                if items:
+                    yield page, items
+                if not has_more:
+                    return
+                page += 1
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def fetch_products(self, product_ids, detail=True, variants=False,
+                       inventory=False, variant_ids=None,
+                       max_workers=DEFAULT_FETCH_WORKERS):
+        """Fetch detail, variants and/or inventory of many products at once.
+
+        Requests run on a bounded thread pool and go through the shared rate
+        limiter. Returns a dict keyed by product id holding the fetched
+        ``detail``, ``variants`` and ``inventory`` data, plus an ``errors``
+        dict with the message of every part that could not be fetched.
+        ``variant_ids`` maps variant ids to their product id; the stock of
+        each is returned in a ``variant_inventory`` dict keyed by variant id
+        (failures in ``errors['variant_inventory']``, also keyed by vid).
+        """
+        results, tasks = self._product_fetch_tasks(
+            product_ids, detail, variants, inventory, variant_ids
+        )
+        if not tasks:
+            return results
+
+        max_workers = max(1, min(max_workers, len(tasks)))
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='cjdropship_fetch'
+        ) as executor:
+            futures = {
+                executor.submit(call): (pid, part, vid)
+                for pid, part, vid, call in tasks
+            }
+            for future in as_completed(futures):
+                pid, part, vid = futures[future]
+                try:
+                    self._store_fetched(results, pid, part, vid, future.result())
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    self._store_fetched(
+                        results, pid, part, vid, str(e), error=True
+                    )
+        return results
+
+    def iter_orders(self, page_size=20, start_page=1, prefetch=True):
+        """Yield every order, one page in memory at a time"""
+        for _page, orders in self.iter_order_pages(
+                page_size, start_page, prefetch):
+            yield from orders
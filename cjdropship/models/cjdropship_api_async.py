@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""CJDropshipping asyncio API Client."""
+
+import asyncio
+import json
+import logging
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .cjdropship_api import (
+    CONNECT_TIMEOUT,
+    DEFAULT_RATE_LIMITS,
+    READ_TIMEOUT,
+    CJApiError,
+    CJDropshippingEndpointsMixin,
+    cache_key,
+    endpoint_group,
+    is_auth_rejection,
+    token_is_valid,
+)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 100
+
+
+def _to_requests_response(resp, body):
+    """Wrap an aiohttp response so the blocking client can parse it."""
+    response = requests.Response()
+    response.status_code = resp.status
+    response.reason = resp.reason
+    response.headers = CaseInsensitiveDict(resp.headers)
+    response.url = str(resp.url)
+    response.encoding = resp.charset
+    response._content = body
+    response.request = requests.PreparedRequest()
+    response.request.prepare(
+        method=resp.method, url=str(resp.url),
+        headers=dict(resp.request_info.headers),
+    )
+    return response
+
+
+class AsyncSingleFlight:
+    """Let concurrent identical coroutine calls share a single execution.
+
+    Every caller gets the same exception, or a copy of the result of its own.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    async def do(self, key, func):
+        """Await ``func()`` once for all concurrent callers of ``key``."""
+        task = self._flights.get(key)
+        if task is None:
+            task = self._flights[key] = asyncio.ensure_future(
+                self._encoded(func)
+            )
+            task.add_done_callback(lambda _task: self._flights.pop(key, None))
+        # A cancelled caller must not cancel the call for the others
+        return json.loads(await asyncio.shield(task))
+
+    @staticmethod
+    async def _encoded(func):
+        """Await ``func()`` and return its result encoded as JSON."""
+        return json.dumps(await func())
+
+
+class AsyncCJDropshippingAPI(CJDropshippingEndpointsMixin):
+    """asyncio client for the CJDropshipping API.
+
+    Offers the endpoint methods of ``CJDropshippingAPI`` as coroutines, so a
+    single worker can keep hundreds of requests in flight. Authentication,
+    rate limiting, retry policies and the circuit breaker are those of the
+    blocking client it wraps, so tokens and rate budgets stay shared with
+    every other client of the same configuration. Blocking steps (token
+    refresh, shared rate limit buckets) run in the default executor.
+
+    Errors are raised as the same ``requests`` exceptions and ``ValueError``
+    subclasses as the blocking client. Requires the ``aiohttp`` package.
+    """
+
+    def __init__(self, client, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 timeout=READ_TIMEOUT):
+        if aiohttp is None:
+            raise ImportError(
+                "The asyncio CJDropshipping client requires the aiohttp "
+                "Python package"
+            )
+        self.client = client
+        self.base_url = client.base_url
+        self.cache = client.cache
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.single_flight = AsyncSingleFlight()
+        self._session = None
+        self._rate_slots = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        """Return the aiohttp session, created in the running event loop."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(
+                    total=self.timeout, sock_connect=CONNECT_TIMEOUT
+                ),
+            )
+        return self._session
+
+    def _get_rate_slots(self, group):
+        """Return the semaphore bounding the queued rate limit reservations.
+
+        The rate limiter refuses reservations due in more than ``max_wait``
+        seconds, so only about ``rate * max_wait`` coroutines may hold one
+        at a time; the others wait here for their turn to reserve.
+        """
+        semaphore = self._rate_slots.get(group)
+        if semaphore is None:
+            limiter = self.client.rate_limiter
+            rate = limiter.rates.get(group, DEFAULT_RATE_LIMITS['product'])
+            slots = self.max_connections
+            if rate and rate > 0:
+                slots = max(1, int(rate * limiter.max_wait))
+            semaphore = self._rate_slots[group] = asyncio.Semaphore(slots)
+        return semaphore
+
+    async def _get_headers(self):
+        """Get headers, refreshing the shared token in a thread if needed."""
+        client = self.client
+        if token_is_valid(client.access_token, client.token_expiry):
+            return client._get_headers()
+        return await asyncio.to_thread(client._get_headers)
+
+    async def _make_request(self, method, endpoint, data=None, params=None):
+        """Make API request with error handling and bounded retries"""
+        if method not in self.client.retry_policies:
+            raise ValueError(
+                f"Unsupported HTTP method: {method}"
+            )
+
+        cached = self.cache is not None and self.cache.ttl(endpoint)
+        if cached:
+            hit, result = await asyncio.to_thread(
+                self.cache.get, endpoint, params, data
+            )
+            self.client.metrics.observe_cache(endpoint, hit)
+            if hit:
+                return result
+
+        async def fetch():
+            with self.client.circuit_breaker.call():
+                result = await self._request_with_retries(
+                    method, endpoint, data, params
+                )
+            if cached:
+                await asyncio.to_thread(
+                    self.cache.set, endpoint, result, params, data
+                )
+            return result
+
+        # Identical concurrent GETs share one network call
+        if method == 'GET':
+            return await self.single_flight.do(
+                cache_key(endpoint, params, data), fetch
+            )
+        return await fetch()
+
+    async def _request_with_retries(self, method, endpoint, data=None,
+                                    params=None):
+        """Send a request, retrying transient failures per retry policy"""
+        policy = self.client.retry_policies[method]
+
+        started = time.monotonic()
+        attempt = 0
+        token_renewed = False
+        while True:
+            attempt += 1
+            response = None
+            try:
+                response = await self._send_request(
+                    method, endpoint, data, params
+                )
+                return self.client._parse_response(response)
+            except (requests.exceptions.RequestException, CJApiError) as e:
+                self.client._observe_failure(endpoint, e)
+                # A rejected token is renewed once, not retried as is
+                if (response is not None and not token_renewed
+                        and is_auth_rejection(e)):
+                    token_renewed = True
+                    attempt -= 1
+                    await asyncio.to_thread(
+                        self.client._reject_token, response
+                    )
+                    continue
+                delay = policy.retry_delay(
+                    attempt, e, time.monotonic() - started
+                )
+                if delay is None:
+                    if isinstance(e, requests.exceptions.RequestException):
+                        _logger.error(
+                            "CJDropshipping API request error: %s", str(e)
+                        )
+                    raise
+                self.client.metrics.observe_retry(endpoint)
+                _logger.warning(
+                    "CJ API %s %s failed (attempt %d/%d): %s - retrying "
+                    "in %.1fs",
+                    method, endpoint, attempt, policy.max_attempts, e, delay
+                )
+                await asyncio.sleep(delay)
+
+    async def _send_request(self, method, endpoint, data=None, params=None):
+        """Send a single API request and return it as a requests response"""
+        url = f"{self.base_url}{endpoint}"
+        headers = await self._get_headers()
+        group = endpoint_group(endpoint)
+        async with self._get_rate_slots(group):
+            wait = await asyncio.to_thread(
+                self.client.rate_limiter.reserve, group
+            )
+            if wait > 0:
+                self.client.metrics.observe_rate_limit_wait(endpoint, wait)
+                await asyncio.sleep(wait)
+
+        started = time.monotonic()
+        try:
+            async with self._get_session().request(
+                method, url, headers=headers, params=params, json=data
+            ) as resp:
+                body = await resp.read()
+        except asyncio.TimeoutError as e:
+            if isinstance(e, getattr(aiohttp, 'ConnectionTimeoutError', ())):
+                raise requests.exceptions.ConnectTimeout(str(e)) from e
+            raise requests.exceptions.Timeout(str(e)) from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+        response = _to_requests_response(resp, body)
+        self.client._log_exchange(
+            method, endpoint, params, data, response,
+            time.monotonic() - started
+        )
+        return response
+
+    async def _iter_pages(self, fetch_page, page_size, start_page=1,
+                          prefetch=True):
+        """Walk a paginated list endpoint lazily, prefetching the next page"""
+        page = start_page
+        pending = asyncio.ensure_future(fetch_page(page)) if prefetch else None
+        try:
+            while True:
+                result = await pending if pending else await fetch_page(page)
+                items = (result or {}).get('list') or []
+                total = (result or {}).get('total')
+                has_more = len(items) >= page_size and (
+                    total is None or page * page_size < int(total)
+                )
+                pending = None
+                if has_more and prefetch:
+                    pending = asyncio.ensure_future(fetch_page(page + 1))
+
+                if items:
+                    yield page, items
+                if not has_more:
+                    return
+                page += 1
+        finally:
+            if pending:
+                pending.cancel()
+
+    async def iter_products(self, category_id=None, page_size=20,
+                            start_page=1, prefetch=True):
+        """Yield every product of the catalog, one page in memory at a time"""
+        async for _page, products in self.iter_product_pages(
+                category_id, page_size, start_page, prefetch):
+            for product in products:
+                yield product
+
+    async def iter_orders(self, page_size=20, start_page=1, prefetch=True):
+        """Yield every order, one page in memory at a time"""
+        async for _page, orders in self.iter_order_pages(
+                page_size, start_page, prefetch):
+            for order in orders:
+                yield order
+
+    async def fetch_products(self, product_ids, detail=True, variants=False,
+                             inventory=False, variant_ids=None,
+                             max_concurrency=DEFAULT_MAX_CONNECTIONS):
+        """Fetch detail, variants and/or inventory of many products at once.
+
+        Same result layout as ``CJDropshippingAPI.fetch_products``, with at
+        most ``max_concurrency`` requests in flight.
+        """
+        results, tasks = self._product_fetch_tasks(
+            product_ids, detail, variants, inventory, variant_ids
+        )
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def fetch(pid, part, vid, call):
+            async with semaphore:
+                try:
+                    self._store_fetched(results, pid, part, vid, await call())
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    self._store_fetched(
+                        results, pid, part, vid, str(e), error=True
+                    )
+
+        await asyncio.gather(*(fetch(*task) for task in tasks))
+        return results
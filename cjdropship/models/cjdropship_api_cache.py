@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""CJDropshipping API Response Cache."""
+
+import hashlib
+import json
+from datetime import timezone
+
+from odoo import models, fields, api
+from odoo.tools import sql
+
+from .cjdropship_api import ResponseCache, timestamp_to_datetime
+
+
+class CJDropshippingApiCache(models.Model):
+    """Cached response of a read-only API request, shared by all workers."""
+
+    _name = 'cjdropship.api.cache'
+    _description = 'CJDropshipping API Response Cache'
+    _rec_name = 'endpoint'
+
+    config_id = fields.Many2one(
+        'cjdropship.config',
+        'Configuration',
+        required=True,
+        ondelete='cascade'
+    )
+    cache_key = fields.Char(required=True)
+    endpoint = fields.Char(required=True)
+    value = fields.Text()
+    expires_at = fields.Datetime(required=True, index=True)
+
+    def init(self):
+        """Create the unique index the cache upsert relies on."""
+        sql.create_unique_index(
+            self.env.cr,
+            'cjdropship_api_cache_key_uniq',
+            self._table,
+            ['config_id', 'cache_key'],
+        )
+
+    @api.autovacuum
+    def _gc_expired_entries(self):
+        """Delete expired cache entries."""
+        self.env.cr.execute(
+            "DELETE FROM cjdropship_api_cache "
+            "WHERE expires_at < now() at time zone 'UTC'"
+        )
+
+
+class DatabaseResponseCache(ResponseCache):
+    """Response cache stored in ``cjdropship.api.cache``.
+
+    Entries are read and written through short-lived cursors of their own,
+    so every worker benefits from responses fetched by any other.
+    """
+
+    shared = True
+
+    def __init__(self, registry, config_id, **kwargs):
+        super().__init__(**kwargs)
+        self.registry = registry
+        self.config_id = config_id
+
+    @staticmethod
+    def _hash(key):
+        """Keep the stored key short whatever the request size."""
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _load(self, key):
+        with self.registry.cursor() as cr:
+            cr.execute(
+                "SELECT expires_at, value FROM cjdropship_api_cache "
+                "WHERE config_id = %s AND cache_key = %s "
+                "AND expires_at > now() at time zone 'UTC'",
+                (self.config_id, self._hash(key))
+            )
+            row = cr.fetchone()
+        if not row:
+            return None
+        expires_at = row[0].replace(tzinfo=timezone.utc).timestamp()
+        return expires_at, json.loads(row[1])
+
+    def _store(self, key, endpoint, expires_at, value):
+        with self.registry.cursor() as cr:
+            cr.execute(
+                """
+                INSERT INTO cjdropship_api_cache
+                    (config_id, cache_key, endpoint, value, expires_at,
+                     create_date, write_date)
+                VALUES (%s, %s, %s, %s, %s,
+                        now() at time zone 'UTC', now() at time zone 'UTC')
+                ON CONFLICT (config_id, cache_key) DO UPDATE SET
+                    value = EXCLUDED.value,
+                    expires_at = EXCLUDED.expires_at,
+                    write_date = EXCLUDED.write_date
+                """,
+                (
+                    self.config_id, self._hash(key), endpoint,
+                    json.dumps(value), timestamp_to_datetime(expires_at),
+                )
+            )
+
+    def _delete(self, key=None):
+        with self.registry.cursor() as cr:
+            if key:
+                cr.execute(
+                    "DELETE FROM cjdropship_api_cache "
+                    "WHERE config_id = %s AND cache_key = %s",
+                    (self.config_id, self._hash(key))
+                )
+            else:
+                cr.execute(
+                    "DELETE FROM cjdropship_api_cache WHERE config_id = %s",
+                    (self.config_id,)
+                )
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""CJDropshipping API Token Store."""
+
+import logging
+import zlib
+from contextlib import contextmanager
+from datetime import timezone
+
+from odoo import models, fields
+
+from .cjdropship_api import (
+    MemoryTokenStore,
+    timestamp_to_datetime,
+    token_is_valid,
+)
+
+_logger = logging.getLogger(__name__)
+
+# Advisory lock namespace used to serialize token refreshes across workers
+TOKEN_LOCK_NAMESPACE = zlib.crc32(b'cjdropship.api.token') & 0x7FFFFFFF
+
+
+class CJDropshippingApiToken(models.Model):
+    """Access token obtained from CJDropshipping, shared by all workers."""
+
+    _name = 'cjdropship.api.token'
+    _description = 'CJDropshipping API Access Token'
+    _rec_name = 'config_id'
+
+    config_id = fields.Many2one(
+        'cjdropship.config',
+        'Configuration',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+    access_token = fields.Char(required=True)
+    expiry_date = fields.Datetime(required=True)
+    credentials_hash = fields.Char(
+        help="Fingerprint of the credentials the token was obtained with"
+    )
+
+    _sql_constraints = [
+        (
+            'config_unique',
+            'unique(config_id)',
+            'Only one access token per configuration is allowed!'
+        )
+    ]
+
+
+class DatabaseTokenStore(MemoryTokenStore):
+    """Token store persisted in ``cjdropship.api.token``.
+
+    Tokens are read and written through short-lived cursors of their own so
+    they survive the caller's transaction, and refreshes are serialized with
+    a PostgreSQL advisory lock so only one worker re-authenticates.
+
+    Tokens are tied to a fingerprint of the credentials: after a credential
+    change every worker computes a new fingerprint, so neither its process
+    cache nor a row written for the old account can hand out a stale token.
+    """
+
+    def __init__(self, registry, config_id, credentials_hash=None):
+        super().__init__(('db', registry.db_name, config_id, credentials_hash))
+        self.registry = registry
+        self.config_id = config_id
+        self.credentials_hash = credentials_hash
+
+    def get(self):
+        """Return the token from the process cache or the database."""
+        access_token, token_expiry = super().get()
+        if token_is_valid(access_token, token_expiry):
+            return access_token, token_expiry
+
+        with self.registry.cursor() as cr:
+            cr.execute(
+                "SELECT access_token, expiry_date FROM cjdropship_api_token "
+                "WHERE config_id = %s "
+                "AND credentials_hash IS NOT DISTINCT FROM %s",
+                (self.config_id, self.credentials_hash)
+            )
+            row = cr.fetchone()
+        if not row:
+            return None, 0
+
+        access_token = row[0]
+        token_expiry = row[1].replace(tzinfo=timezone.utc).timestamp()
+        super().set(access_token, token_expiry)
+        return access_token, token_expiry
+
+    def set(self, access_token, token_expiry):
+        """Store the token for every worker."""
+        super().set(access_token, token_expiry)
+        expiry_date = timestamp_to_datetime(token_expiry)
+        with self.registry.cursor() as cr:
+            cr.execute(
+                "UPDATE cjdropship_api_token "
+                "SET access_token = %s, expiry_date = %s, "
+                "credentials_hash = %s, "
+                "write_date = now() at time zone 'UTC' "
+                "WHERE config_id = %s",
+                (access_token, expiry_date, self.credentials_hash,
+                 self.config_id)
+            )
+            if not cr.rowcount:
+                cr.execute(
+                    "INSERT INTO cjdropship_api_token "
+                    "(config_id, access_token, expiry_date, "
+                    "credentials_hash, create_date, write_date) "
+                    "VALUES (%s, %s, %s, %s, now() at time zone 'UTC', "
+                    "now() at time zone 'UTC')",
+                    (self.config_id, access_token, expiry_date,
+                     self.credentials_hash)
+                )
+
+    def discard(self, access_token):
+        """Forget the token for every worker if it still is ``access_token``."""
+        super().discard(access_token)
+        with self.registry.cursor() as cr:
+            cr.execute(
+                "DELETE FROM cjdropship_api_token "
+                "WHERE config_id = %s AND access_token = %s",
+                (self.config_id, access_token)
+            )
+
+    @contextmanager
+    def refresh_lock(self):
+        """Hold the process lock and a cross-worker advisory lock."""
+        with super().refresh_lock(), self.registry.cursor() as cr:
+            cr.execute(
+                "SELECT pg_advisory_xact_lock(%s, %s)",
+                (TOKEN_LOCK_NAMESPACE, self.config_id)
+            )
+            _logger.debug(
+                "Acquired CJ token refresh lock for config %s",
+                self.config_id
+            )
+            yield
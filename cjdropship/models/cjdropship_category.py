@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""CJDropshipping Category Tree."""
+
+import logging
+
+import requests
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Keys of the three levels of CJ's category tree
+CATEGORY_LEVELS = (
+    ('categoryFirstId', 'categoryFirstName', 'categoryFirstList'),
+    ('categorySecondId', 'categorySecondName', 'categorySecondList'),
+    ('categoryId', 'categoryName', None),
+)
+
+
+def flatten_category_tree(tree):
+    """Return ``(cj id, name, parent cj id, level)`` tuples, parents first."""
+    nodes = []
+    level_nodes = [(node, None) for node in tree or []]
+    for level, (id_key, name_key, children_key) in enumerate(
+        CATEGORY_LEVELS, start=1
+    ):
+        next_nodes = []
+        for node, parent_id in level_nodes:
+            category_id = node.get(id_key)
+            if not category_id:
+                continue
+            nodes.append((
+                category_id, node.get(name_key) or category_id,
+                parent_id, level
+            ))
+            if children_key:
+                next_nodes.extend(
+                    (child, category_id)
+                    for child in node.get(children_key) or []
+                )
+        level_nodes = next_nodes
+    return nodes
+
+
+class CJDropshippingCategory(models.Model):
+    """Local copy of the CJDropshipping category tree."""
+
+    _name = 'cjdropship.category'
+    _description = 'CJDropshipping Category'
+    _parent_store = True
+    _rec_name = 'complete_name'
+    _order = 'complete_name'
+
+    name = fields.Char(required=True)
+    complete_name = fields.Char(
+        compute='_compute_complete_name',
+        recursive=True,
+        store=True
+    )
+    cj_category_id = fields.Char('CJ Category ID', required=True, index=True)
+    parent_id = fields.Many2one(
+        'cjdropship.category',
+        'Parent Category',
+        ondelete='cascade',
+        index=True
+    )
+    parent_path = fields.Char(index=True)
+    child_ids = fields.One2many(
+        'cjdropship.category',
+        'parent_id',
+        'Child Categories'
+    )
+    level = fields.Integer()
+    config_id = fields.Many2one(
+        'cjdropship.config',
+        'Configuration',
+        required=True,
+        ondelete='cascade'
+    )
+    active = fields.Boolean(default=True)
+
+    _sql_constraints = [
+        (
+            'cj_category_unique',
+            'unique(config_id, cj_category_id)',
+            'CJ Category must be unique per configuration!'
+        )
+    ]
+
+    @api.depends('name', 'parent_id.complete_name')
+    def _compute_complete_name(self):
+        """Compute the full path of the category."""
+        for record in self:
+            if record.parent_id:
+                record.complete_name = (
+                    f'{record.parent_id.complete_name} / {record.name}'
+                )
+            else:
+                record.complete_name = record.name
+
+    def _get_leaf_categories(self):
+        """Return the leaf categories of the subtrees of these categories.
+
+        Served from ``parent_path``, without asking CJ.
+        """
+        if not self:
+            return self
+        return self.search([
+            ('id', 'child_of', self.ids),
+            ('child_ids', '=', False),
+        ])
+
+    @api.model
+    def _refresh_from_cj(self, config):
+        """Bring the category tree of ``config`` in line with CJ.
+
+        Only differences are written: new categories are created one level
+        at a time in batches, renamed or moved ones are updated, vanished
+        ones archived and reappearing ones restored. Returns the number of
+        categories created or changed.
+        """
+        nodes = flatten_category_tree(
+            config.get_api_client().get_categories()
+        )
+        existing = {
+            category.cj_category_id: category
+            for category in self.with_context(active_test=False).search([
+                ('config_id', '=', config.id),
+            ])
+        }
+
+        changes = 0
+        seen = set()
+        for level in range(1, len(CATEGORY_LEVELS) + 1):
+            to_create = []
+            for cj_id, name, parent_cj_id, node_level in nodes:
+                if node_level != level or cj_id in seen:
+                    continue
+                seen.add(cj_id)
+                parent = existing.get(parent_cj_id) if parent_cj_id else None
+                vals = {
+                    'name': name,
+                    'parent_id': parent.id if parent else False,
+                    'level': level,
+                    'active': True,
+                }
+                category = existing.get(cj_id)
+                if not category:
+                    to_create.append(dict(
+                        vals, cj_category_id=cj_id, config_id=config.id
+                    ))
+                    continue
+                changed = {
+                    key: value for key, value in vals.items()
+                    if (
+                        category[key].id if key == 'parent_id'
+                        else category[key]
+                    ) != value
+                }
+                if changed:
+                    category.write(changed)
+                    changes += 1
+            created = self.create(to_create)
+            existing.update(zip(created.mapped('cj_category_id'), created))
+            changes += len(created)
+
+        vanished = self.browse([
+            category.id for cj_id, category in existing.items()
+            if cj_id not in seen and category.active
+        ])
+        vanished.active = False
+        return changes + len(vanished)
+
+    @api.model
+    def _cron_refresh_categories(self):
+        """Refresh the category trees of all configurations."""
+        for config in self.env['cjdropship.config'].search([]):
+            if not config._is_api_available():
+                continue
+            try:
+                changes = self._refresh_from_cj(config)
+            except (
+                UserError,
+                ValueError,
+                requests.exceptions.RequestException
+            ) as exc:
+                self.env.cr.rollback()
+                _logger.warning(
+                    "Failed to refresh CJ categories of %s: %s",
+                    config.name, str(exc)
+                )
+                continue
+            _logger.info(
+                "Refreshed CJ categories of %s, %d changes",
+                config.name, changes
+            )
+            self.env.cr.commit()  # pylint: disable=invalid-commit
@@ -1,17 +1,44 @@
 # -*- coding: utf-8 -*-
 """CJDropshipping Configuration Model."""
 
+import hashlib
+import hmac
+import json
 import logging
+import secrets
+import time
+from datetime import timedelta
 
 import requests
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import float_compare, float_round
 
-from .cjdropship_api import CJDropshippingAPI
+from .cjdropship_api import (
+    CircuitBreaker,
+    CJDropshippingAPI,
+    DEFAULT_BASE_URL,
+    ResponseCache,
+    default_retry_policies,
+    get_circuit_breaker,
+    get_exchange_recorder,
+    get_metrics_collector,
+    get_response_cache,
+    get_single_flight,
+)
+from .cjdropship_api_async import AsyncCJDropshippingAPI
+from .cjdropship_api_cache import DatabaseResponseCache
+from .cjdropship_api_token import DatabaseTokenStore
+from .cjdropship_metrics import DatabaseMetricsSink
+from .cjdropship_pricing_rule import PricingTable
+from .cjdropship_rate_limit import DatabaseRateLimiter
 
 _logger = logging.getLogger(__name__)
 
+# Seconds a product sync cron run may work when no cron time limit is set
+SYNC_TIME_BUDGET = 600
+
 
 class CJDropshippingConfig(models.Model):
     """Configuration settings for CJDropshipping integration."""
@@ -37,6 +64,175 @@ class CJDropshippingConfig(models.Model):
         help="Your CJDropshipping account password"
     )
 
+    # Connection Settings
+    api_base_url = fields.Char(
+        'API Base URL',
+        required=True,
+        default=DEFAULT_BASE_URL,
+        help="Root URL of the CJDropshipping API. Point it at a local "
+             "fake_cj_server.py for offline development and load tests."
+    )
+    api_pool_size = fields.Integer(
+        'Connection Pool Size',
+        default=10,
+        help="Maximum number of pooled HTTP connections kept open to "
+             "CJDropshipping per worker process"
+    )
+    api_keep_alive = fields.Boolean(
+        'Keep-Alive Connections',
+        default=True,
+        help="Reuse HTTP connections across API calls instead of opening "
+             "a new TCP/TLS connection for every request"
+    )
+
+    api_fetch_workers = fields.Integer(
+        'Parallel Requests',
+        default=8,
+        help="Maximum number of concurrent API requests when fetching data "
+             "of many products at once"
+    )
+
+    # Rate Limits
+    rate_limit_product = fields.Float(
+        'Product Requests per Second',
+        default=1.0,
+        help="Maximum rate of product and category API calls, shared by "
+             "all workers. Set to 0 to disable throttling."
+    )
+    rate_limit_order = fields.Float(
+        'Order Requests per Second',
+        default=1.0,
+        help="Maximum rate of order API calls, shared by all workers. "
+             "Set to 0 to disable throttling."
+    )
+    rate_limit_logistics = fields.Float(
+        'Logistics Requests per Second',
+        default=1.0,
+        help="Maximum rate of logistics API calls, shared by all workers. "
+             "Set to 0 to disable throttling."
+    )
+    rate_limit_max_wait = fields.Integer(
+        'Max Rate Limit Wait (seconds)',
+        default=60,
+        help="Longest time an API call queues for a free slot before it "
+             "fails with a rate limit error"
+    )
+
+    # Retries
+    retry_max_attempts = fields.Integer(
+        'Max Attempts',
+        default=3,
+        help="Maximum number of attempts for an API call failing with a "
+             "transient error. Order creation is only retried when CJ "
+             "certainly did not process the request."
+    )
+    retry_backoff_base = fields.Float(
+        'Backoff Base (seconds)',
+        default=0.5,
+        help="Initial retry delay, doubled after every failed attempt"
+    )
+    retry_backoff_cap = fields.Float(
+        'Backoff Cap (seconds)',
+        default=30.0,
+        help="Upper bound of the retry delay"
+    )
+
+    # Circuit Breaker
+    circuit_failure_threshold = fields.Integer(
+        'Failures Before Opening',
+        default=5,
+        help="Number of consecutive failed API calls after which calls to "
+             "CJDropshipping are refused immediately"
+    )
+    circuit_reset_timeout = fields.Integer(
+        'Reopen Probe Delay (seconds)',
+        default=60,
+        help="Time after which a single probe call is let through to check "
+             "whether CJDropshipping is reachable again"
+    )
+    circuit_state = fields.Selection(
+        [
+            (CircuitBreaker.CLOSED, 'Available'),
+            (CircuitBreaker.OPEN, 'Unavailable'),
+            (CircuitBreaker.HALF_OPEN, 'Probing'),
+        ],
+        'API Availability',
+        compute='_compute_circuit_state',
+        help="State of the circuit breaker in this worker process"
+    )
+
+    # Response Cache
+    cache_enabled = fields.Boolean(
+        'Cache API Responses',
+        default=True,
+        help="Reuse responses of read-only API calls (categories, product "
+             "details, variants, shipping rates) for a limited time"
+    )
+    cache_shared = fields.Boolean(
+        'Share Cache Between Workers',
+        default=True,
+        help="Store cached responses in the database so every worker "
+             "benefits from them"
+    )
+    cache_max_entries = fields.Integer(
+        'Max Cached Responses per Worker',
+        default=1000
+    )
+    cache_ttl_categories = fields.Integer(
+        'Category Cache Lifetime (seconds)',
+        default=3600
+    )
+    cache_ttl_products = fields.Integer(
+        'Product Cache Lifetime (seconds)',
+        default=300,
+        help="Lifetime of cached product details and variants. Inventory "
+             "webhooks drop the cached data of the product concerned."
+    )
+    cache_ttl_shipping = fields.Integer(
+        'Shipping Rate Cache Lifetime (seconds)',
+        default=600
+    )
+    cache_hits = fields.Integer(
+        compute='_compute_cache_stats',
+        help="Cache hits of this worker process"
+    )
+    cache_misses = fields.Integer(
+        compute='_compute_cache_stats',
+        help="Cache misses of this worker process"
+    )
+
+    # Diagnostics
+    debug_capture = fields.Boolean(
+        'Capture API Exchanges',
+        default=False,
+        help="Keep the last API requests and responses of each worker in "
+             "memory, truncated and with credentials masked, for "
+             "troubleshooting"
+    )
+    debug_capture_size = fields.Integer(
+        'Captured Exchanges',
+        default=50,
+        help="Number of API exchanges kept per worker process"
+    )
+    debug_exchanges = fields.Text(
+        'Last API Exchanges',
+        compute='_compute_debug_exchanges',
+        help="API exchanges captured by this worker process, newest first"
+    )
+    metrics_flush_interval = fields.Integer(
+        'Metrics Period (seconds)',
+        default=60,
+        help="API latency and error statistics are aggregated per worker "
+             "over this period before being stored"
+    )
+    metrics_token = fields.Char(
+        'Metrics Token',
+        copy=False,
+        groups='base.group_system',
+        help="Bearer token Prometheus must send to scrape "
+             "/cjdropship/metrics. Scraping is disabled while empty."
+    )
+
     # Sync Settings
     auto_sync_products = fields.Boolean(
         default=False,
@@ -47,6 +243,36 @@ class CJDropshippingConfig(models.Model):
         default=24,
         help="Interval in hours for automatic product sync"
     )
+    sync_category_ids = fields.Many2many(
+        'cjdropship.category',
+        string='Sync Categories',
+        domain="[('config_id', '=', id)]",
+        help="Only sync products of these CJ categories and their "
+             "subcategories; empty to sync all products"
+    )
+    sync_batch_size = fields.Integer(
+        'Sync Batch Size',
+        default=200,
+        help="Products fetched concurrently and committed together by the "
+             "scheduled sync"
+    )
+    image_max_size = fields.Integer(
+        'Max Image Size (MB)',
+        default=10,
+        help="Product images larger than this are not downloaded"
+    )
+    sync_started_at = fields.Datetime(
+        'Sync Running Since',
+        readonly=True,
+        copy=False,
+        help="Start of the scheduled product sync in progress"
+    )
+    sync_cursor = fields.Integer(
+        readonly=True,
+        copy=False,
+        help="Last product processed by the sync in progress, where an "
+             "interrupted sync resumes"
+    )
 
     auto_fulfill_orders = fields.Boolean(
         default=False,
@@ -82,6 +308,20 @@ class CJDropshippingConfig(models.Model):
         default=30.0,
         help="Markup to add to CJDropshipping prices"
     )
+    pricing_rule_ids = fields.One2many(
+        'cjdropship.pricing.rule',
+        'config_id',
+        'Pricing Rules',
+        help="Rules taking precedence over the default markup for the "
+             "products they match"
+    )
+    pricing_version = fields.Integer(
+        default=0,
+        readonly=True,
+        copy=False,
+        help="Bumped whenever the pricing rules change, so every worker "
+             "compiles them anew"
+    )
 
     # Webhook Settings
     webhook_url = fields.Char(
@@ -121,6 +361,39 @@ class CJDropshippingConfig(models.Model):
                     f"{base_url}/cjdropship/webhook/[ID]"
                 )
 
+    def _compute_circuit_state(self):
+        """Compute circuit breaker state."""
+        for record in self:
+            if record.id:
+                record.circuit_state = record._get_circuit_breaker().state
+            else:
+                record.circuit_state = CircuitBreaker.CLOSED
+
+    def _compute_cache_stats(self):
+        """Compute response cache counters."""
+        for record in self:
+            stats = (
+                record._get_response_cache().stats()
+                if record.id and record.cache_enabled else {}
+            )
+            record.cache_hits = stats.get('hits', 0)
+            record.cache_misses = stats.get('misses', 0)
+
+    def _compute_debug_exchanges(self):
+        """Format the captured API exchanges."""
+        for record in self:
+            exchanges = (
+                record._get_exchange_recorder().exchanges()
+                if record.id else []
+            )
+            record.debug_exchanges = '\n\n'.join(
+                "{time} {method} {endpoint} -> {status} "
+                "({duration_ms} ms)\n"
+                "Params: {params}\nData: {data}\n"
+                "Response: {response}".format(**exchange)
+                for exchange in reversed(exchanges)
+            )
+
     @api.constrains('sync_interval')
     def _check_sync_interval(self):
         """Validate sync interval."""
@@ -130,6 +403,112 @@ class CJDropshippingConfig(models.Model):
                     self.env._('Sync interval must be at least 1 hour')
                 )
 
+    @api.constrains('sync_batch_size')
+    def _check_sync_batch_size(self):
+        """Validate sync batch size."""
+        for record in self:
+            if record.sync_batch_size < 1:
+                raise ValidationError(
+                    self.env._('Sync batch size must be at least 1')
+                )
+
+    @api.constrains('image_max_size')
+    def _check_image_max_size(self):
+        """Validate image size limit."""
+        for record in self:
+            if record.image_max_size < 1:
+                raise ValidationError(
+                    self.env._('Max image size must be at least 1 MB')
+                )
+
+    @api.constrains('api_pool_size', 'api_fetch_workers')
+    def _check_api_pool_size(self):
+        """Validate connection pool size and parallelism."""
+        for record in self:
+            if record.api_pool_size < 1:
+                raise ValidationError(
+                    self.env._('Connection pool size must be at least 1')
+                )
+            if record.api_fetch_workers < 1:
+                raise ValidationError(
+                    self.env._('Parallel requests must be at least 1')
+                )
+
+    @api.constrains(
+        'rate_limit_product',
+        'rate_limit_order',
+        'rate_limit_logistics',
+        'rate_limit_max_wait'
+    )
+    def _check_rate_limits(self):
+        """Validate rate limits."""
+        for record in self:
+            if min(
+                record.rate_limit_product,
+                record.rate_limit_order,
+                record.rate_limit_logistics,
+                record.rate_limit_max_wait,
+            ) < 0:
+                raise ValidationError(
+                    self.env._('Rate limits cannot be negative')
+                )
+
+    @api.constrains(
+        'retry_max_attempts', 'retry_backoff_base', 'retry_backoff_cap'
+    )
+    def _check_retry_settings(self):
+        """Validate retry settings."""
+        for record in self:
+            if record.retry_max_attempts < 1:
+                raise ValidationError(
+                    self.env._('Max attempts must be at least 1')
+                )
+            if record.retry_backoff_base < 0 or record.retry_backoff_cap < 0:
+                raise ValidationError(
+                    self.env._('Retry backoff cannot be negative')
+                )
+
+    @api.constrains('circuit_failure_threshold', 'circuit_reset_timeout')
+    def _check_circuit_settings(self):
+        """Validate circuit breaker settings."""
+        for record in self:
+            if record.circuit_failure_threshold < 1:
+                raise ValidationError(
+                    self.env._('Failures before opening must be at least 1')
+                )
+            if record.circuit_reset_timeout < 0:
+                raise ValidationError(
+                    self.env._('Reopen probe delay cannot be negative')
+                )
+
+    @api.constrains(
+        'cache_max_entries',
+        'cache_ttl_categories',
+        'cache_ttl_products',
+        'cache_ttl_shipping'
+    )
+    def _check_cache_settings(self):
+        """Validate response cache settings."""
+        for record in self:
+            if min(
+                record.cache_max_entries,
+                record.cache_ttl_categories,
+                record.cache_ttl_products,
+                record.cache_ttl_shipping,
+            ) < 0:
+                raise ValidationError(
+                    self.env._('Cache settings cannot be negative')
+                )
+
+    @api.constrains('metrics_flush_interval')
+    def _check_metrics_flush_interval(self):
+        """Validate metrics period."""
+        for record in self:
+            if record.metrics_flush_interval < 1:
+                raise ValidationError(
+                    self.env._('Metrics period must be at least 1 second')
+                )
+
     @api.constrains('price_markup')
     def _check_price_markup(self):
         """Validate price markup."""
@@ -139,6 +518,153 @@ class CJDropshippingConfig(models.Model):
                     self.env._('Price markup cannot be negative')
                 )
 
+    def write(self, vals):
+        """Drop cached tokens and responses when the CJ account changes.
+
+        Products are repriced when the markup settings change.
+        """
+        res = super().write(vals)
+        if {'api_email', 'api_password', 'api_base_url'} & set(vals):
+            self._clear_access_tokens()
+        if 'api_base_url' in vals:
+            # Responses of another server must not be served from cache
+            for record in self:
+                record._get_response_cache().invalidate()
+        if {'price_markup', 'price_markup_type'} & set(vals):
+            self._schedule_reprice()
+        return res
+
+    def _get_token_store(self):
+        """Get the access token store shared by all workers."""
+        self.ensure_one()
+        credentials = '\0'.join([
+            self.api_base_url or '',
+            self.api_email or '',
+            self.api_password or '',
+        ])
+        return DatabaseTokenStore(
+            self.env.registry,
+            self.id,
+            credentials_hash=hashlib.sha256(credentials.encode()).hexdigest(),
+        )
+
+    def _get_rate_limiter(self):
+        """Get the rate limiter shared by all workers."""
+        self.ensure_one()
+        return DatabaseRateLimiter(
+            self.env.registry,
+            self.id,
+            rates={
+                'product': self.rate_limit_product,
+                'order': self.rate_limit_order,
+                'logistics': self.rate_limit_logistics,
+            },
+            max_wait=self.rate_limit_max_wait,
+        )
+
+    def _get_circuit_breaker(self):
+        """Get the circuit breaker of this configuration."""
+        self.ensure_one()
+        return get_circuit_breaker(
+            ('db', self.env.cr.dbname, self.id),
+            self.circuit_failure_threshold,
+            self.circuit_reset_timeout,
+        )
+
+    def _get_response_cache(self):
+        """Get the response cache of this configuration."""
+        self.ensure_one()
+        registry = self.env.registry
+        if self.cache_shared:
+            cache = get_response_cache(
+                ('db', self.env.cr.dbname, self.id, 'shared'),
+                lambda: DatabaseResponseCache(registry, self.id)
+            )
+            cache.registry = registry
+        else:
+            cache = get_response_cache(
+                ('db', self.env.cr.dbname, self.id), ResponseCache
+            )
+        cache.configure(
+            max_entries=self.cache_max_entries,
+            ttls={
+                '/product/categoryList': self.cache_ttl_categories,
+                '/product/query': self.cache_ttl_products,
+                '/product/variant/query': self.cache_ttl_products,
+                '/logistic/freightCalculate': self.cache_ttl_shipping,
+            },
+        )
+        return cache
+
+    def _invalidate_product_cache(self, product_id):
+        """Drop cached responses about a CJ product."""
+        for record in self.filtered('cache_enabled'):
+            record._get_response_cache().invalidate_product(product_id)
+
+    def action_clear_api_cache(self):
+        """Drop all cached API responses."""
+        for record in self:
+            record._get_response_cache().invalidate()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': self.env._('Success'),
+                'message': self.env._('API response cache cleared'),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def _get_exchange_recorder(self):
+        """Get the diagnostics capture buffer of this configuration."""
+        self.ensure_one()
+        recorder = get_exchange_recorder(('db', self.env.cr.dbname, self.id))
+        recorder.configure(self.debug_capture, self.debug_capture_size)
+        return recorder
+
+    def action_clear_debug_capture(self):
+        """Drop all captured API exchanges."""
+        for record in self:
+            record._get_exchange_recorder().clear()
+
+    def _get_metrics_collector(self):
+        """Get the API metrics collector of this configuration."""
+        self.ensure_one()
+        collector = get_metrics_collector(('db', self.env.cr.dbname, self.id))
+        collector.flush_interval = self.metrics_flush_interval
+        collector.sink = DatabaseMetricsSink(self.env.registry, self.id)
+        return collector
+
+    def action_generate_metrics_token(self):
+        """Generate a new token for scraping the metrics endpoint."""
+        for record in self:
+            record.metrics_token = secrets.token_urlsafe(32)
+
+    @api.model
+    def _check_metrics_token(self, token):
+        """Check a token presented to the metrics endpoint."""
+        configs = self.sudo().search([('metrics_token', '!=', False)])
+        return any(
+            hmac.compare_digest(
+                config.metrics_token.encode(), token.encode()
+            )
+            for config in configs
+        )
+
+    def _is_api_available(self):
+        """Check whether calls to CJDropshipping are currently allowed."""
+        self.ensure_one()
+        return self._get_circuit_breaker().state != CircuitBreaker.OPEN
+
+    def _clear_access_tokens(self):
+        """Forget stored access tokens of these configurations."""
+        for record in self:
+            record._get_token_store().clear()
+        self.env['cjdropship.api.token'].sudo().search([
+            ('config_id', 'in', self.ids)
+        ]).unlink()
+
     def get_api_client(self):
         """Get authenticated API client."""
         self.ensure_one()
@@ -147,7 +673,39 @@ class CJDropshippingConfig(models.Model):
                 self.env._('Please configure API credentials first')
             )
 
-        return CJDropshippingAPI(self.api_email, self.api_password)
+        return CJDropshippingAPI(
+            self.api_email,
+            self.api_password,
+            session_key=self.id,
+            pool_size=self.api_pool_size,
+            keep_alive=self.api_keep_alive,
+            token_store=self._get_token_store(),
+            rate_limiter=self._get_rate_limiter(),
+            retry_policies=default_retry_policies(
+                self.retry_max_attempts,
+                self.retry_backoff_base,
+                self.retry_backoff_cap,
+            ),
+            circuit_breaker=self._get_circuit_breaker(),
+            cache=self._get_response_cache() if self.cache_enabled else None,
+            single_flight=get_single_flight(
+                ('db', self.env.cr.dbname, self.id)
+            ),
+            recorder=self._get_exchange_recorder(),
+            metrics=self._get_metrics_collector(),
+            base_url=self.api_base_url,
+        )
+
+    def get_async_api_client(self, max_connections=100):
+        """Get an asyncio API client sharing this config's auth and limits.
+
+        Use it as an async context manager inside an event loop, e.g. from
+        a cron job running ``asyncio.run()``.
+        """
+        self.ensure_one()
+        return AsyncCJDropshippingAPI(
+            self.get_api_client(), max_connections=max_connections
+        )
 
     def action_test_connection(self):
         """Test API connection."""
@@ -211,12 +769,298 @@ class CJDropshippingConfig(models.Model):
         action['context'] = {'default_config_id': self.id}
         return action
 
-    def calculate_sale_price(self, cost_price):
-        """Calculate sale price based on markup settings."""
+    def action_refresh_categories(self):
+        """Fetch the CJ category tree into the local category model."""
+        self.ensure_one()
+        try:
+            changes = self.env['cjdropship.category']._refresh_from_cj(self)
+        except (ValueError, requests.exceptions.RequestException) as exc:
+            raise UserError(
+                self.env._('Failed to refresh categories: %s', str(exc))
+            ) from exc
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': self.env._('Categories Refreshed'),
+                'message': self.env._(
+                    '%d categories created or updated', changes
+                ),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def action_start_product_sync(self):
+        """Sync all products now, in the background."""
+        for record in self.filtered(lambda r: not r.sync_started_at):
+            record.write({
+                'sync_started_at': fields.Datetime.now(),
+                'sync_cursor': 0,
+            })
+        self.env.ref('cjdropship.ir_cron_sync_products')._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': self.env._('Sync Started'),
+                'message': self.env._(
+                    'Products are being synced in the background'
+                ),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def _is_sync_due(self):
+        """Check whether a product sync is running or should start."""
         self.ensure_one()
-        if self.price_markup_type == 'percentage':
-            return cost_price * (1 + self.price_markup / 100)
-        return cost_price + self.price_markup
+        if self.sync_started_at or not self.last_sync_date:
+            return True
+        return (
+            self.last_sync_date + timedelta(hours=self.sync_interval)
+            <= fields.Datetime.now()
+        )
+
+    @api.model
+    def _sync_time_budget(self):
+        """Seconds a sync cron run may work before handing over."""
+        limit = tools.config.get('limit_time_real_cron', -1)
+        if limit < 0:
+            limit = tools.config.get('limit_time_real', 0)
+        # Keep a margin for the chunk in progress when the budget runs out
+        return limit * 0.5 if limit > 0 else SYNC_TIME_BUDGET
+
+    @api.model
+    def _cron_sync_products(self):
+        """Sync the products of every configuration whose sync is due."""
+        deadline = time.monotonic() + self._sync_time_budget()
+        configs = self.search([
+            '|',
+            ('auto_sync_products', '=', True),
+            ('sync_started_at', '!=', False),
+        ])
+        for config in configs:
+            if not config._is_sync_due():
+                continue
+            if not config._is_api_available():
+                _logger.info(
+                    "CJDropshipping unavailable, postponing product sync "
+                    "of %s", config.name
+                )
+                continue
+            try:
+                interrupted = config._run_product_sync(deadline)
+            except UserError as exc:
+                self.env.cr.rollback()
+                _logger.error(
+                    "Product sync of %s failed: %s", config.name, str(exc)
+                )
+                continue
+            if interrupted:
+                # Out of time, carry on in a fresh cron run
+                self.env.ref('cjdropship.ir_cron_sync_products')._trigger()
+                return
+
+    def _run_product_sync(self, deadline):
+        """Sync products chunk by chunk, committing after each chunk.
+
+        Progress is kept in ``sync_cursor`` so a sync interrupted by the
+        deadline, a crash or an outage resumes where it stopped. Returns
+        True if the deadline interrupted the sync.
+        """
+        self.ensure_one()
+        if not self.sync_started_at:
+            self.write({
+                'sync_started_at': fields.Datetime.now(),
+                'sync_cursor': 0,
+            })
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+        product_model = self.env['cjdropship.product']
+        while True:
+            if time.monotonic() >= deadline:
+                return True
+            domain = [
+                ('config_id', '=', self.id),
+                ('id', '>', self.sync_cursor),
+            ]
+            if self.sync_category_ids:
+                domain.append(
+                    ('category_id', 'child_of', self.sync_category_ids.ids)
+                )
+            chunk = product_model.search(
+                domain, order='id', limit=self.sync_batch_size
+            )
+            if not chunk:
+                break
+
+            failed = chunk._sync_from_cj_batch()
+            if not self._is_api_available():
+                # Keep the cursor, the chunk is retried after the outage
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+                _logger.warning(
+                    "Product sync of %s paused, CJDropshipping unavailable",
+                    self.name
+                )
+                return False
+            if failed:
+                _logger.warning(
+                    "Product sync of %s: %d of %d products failed",
+                    self.name, len(failed), len(chunk)
+                )
+            self.sync_cursor = chunk[-1].id
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            # Keep memory flat over large catalogs
+            self.env.invalidate_all()
+
+        _logger.info("Product sync of %s finished", self.name)
+        self.write({
+            'last_sync_date': self.sync_started_at,
+            'sync_started_at': False,
+            'sync_cursor': 0,
+        })
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+        return False
+
+    def calculate_sale_price(self, cost_price, category=None, weight=0.0):
+        """Calculate sale price based on pricing rules and markup settings."""
+        self.ensure_one()
+        return self._get_pricer()(cost_price, category, weight)
+
+    @tools.ormcache(
+        'self.id', 'self.pricing_version', 'self.price_markup_type',
+        'self.price_markup'
+    )
+    def _get_pricing_table(self):
+        """Return the pricing rules of this config compiled for lookups.
+
+        The cache key holds everything the table is built from, so changes
+        need no cache clearing: the next lookup simply misses.
+        """
+        return PricingTable(
+            self.pricing_rule_ids._compile(),
+            markup_type=self.price_markup_type,
+            markup=self.price_markup,
+        )
+
+    def _get_pricer(self):
+        """Return a function computing sale prices from CJ prices.
+
+        It takes the CJ price, category and weight of a product. Rules are
+        compiled once per config and cached until they or the markup
+        settings change, so the function can be applied to a whole catalog
+        without touching the ORM.
+        """
+        self.ensure_one()
+        return self._get_pricing_table().price
+
+    def _bump_pricing_version(self):
+        """Make every worker recompile the pricing rules of these configs."""
+        if not self:
+            return
+        self.env.cr.execute("""
+            UPDATE cjdropship_config
+               SET pricing_version = COALESCE(pricing_version, 0) + 1
+             WHERE id IN %s
+        """, [tuple(self.ids)])
+        self.invalidate_recordset(['pricing_version'])
+
+    def _schedule_reprice(self):
+        """Reprice the products of these configs once, before commit.
+
+        Any number of markup or rule changes in a transaction thus costs a
+        single reprice per config.
+        """
+        config_ids = self.env.cr.precommit.data.setdefault(
+            'cjdropship.reprice_config_ids', set()
+        )
+        if not config_ids:
+            self.env.cr.precommit.add(self._reprice_scheduled)
+        config_ids.update(self.ids)
+
+    @api.model
+    def _reprice_scheduled(self):
+        """Reprice the configs scheduled by ``_schedule_reprice``."""
+        config_ids = self.env.cr.precommit.data.pop(
+            'cjdropship.reprice_config_ids', set()
+        )
+        for config in self.browse(sorted(config_ids)).exists():
+            config._reprice_products()
+
+    def _reprice_products(self):
+        """Recompute the selling price of every product of this config.
+
+        Prices are computed over all CJ prices fetched at once; only the
+        products whose price changes are updated, with one statement, and
+        the new prices are pushed to their Odoo products with another.
+        Returns the number of repriced products.
+        """
+        self.ensure_one()
+        product_model = self.env['cjdropship.product']
+        template_model = self.env['product.template']
+        product_model.flush_model([
+            'cj_price', 'category_name', 'shipping_weight', 'selling_price',
+            'config_id',
+        ])
+        template_model.flush_model(['list_price', 'cjdropship_product_id'])
+
+        self.env.cr.execute("""
+            SELECT id, cj_price, category_name, shipping_weight, selling_price
+            FROM cjdropship_product
+            WHERE config_id = %s
+        """, [self.id])
+        digits = product_model._fields['selling_price'].get_digits(self.env)[1]
+        pricer = self._get_pricer()
+        changed = []
+        for (
+            product_id, cj_price, category, weight, selling_price
+        ) in self.env.cr.fetchall():
+            price = float_round(
+                pricer(cj_price, category, weight), precision_digits=digits
+            )
+            if float_compare(
+                price, selling_price or 0.0, precision_digits=digits
+            ):
+                changed.append((product_id, price))
+        if not changed:
+            return 0
+
+        self.env.cr.execute("""
+            UPDATE cjdropship_product p
+               SET selling_price = v.price,
+                   write_uid = %s,
+                   write_date = now() at time zone 'UTC'
+              FROM (
+                  SELECT (e->>0)::integer AS id, (e->>1)::numeric AS price
+                  FROM jsonb_array_elements(%s::jsonb) e
+              ) v
+             WHERE p.id = v.id
+        """, [self.env.uid, json.dumps(changed)])
+        self.env.cr.execute("""
+            UPDATE product_template t
+               SET list_price = p.selling_price,
+                   write_uid = %s,
+                   write_date = now() at time zone 'UTC'
+              FROM cjdropship_product p
+             WHERE t.cjdropship_product_id = p.id
+               AND p.id = ANY(%s)
+               AND t.list_price IS DISTINCT FROM p.selling_price
+        """, [self.env.uid, [product_id for product_id, _price in changed]])
+        product_model.invalidate_model(
+            ['selling_price', 'write_uid', 'write_date']
+        )
+        template_model.invalidate_model(
+            ['list_price', 'write_uid', 'write_date']
+        )
+        # Variant prices are expressed relative to the new template prices
+        product_model.browse(
+            [product_id for product_id, _price in changed]
+        )._apply_variant_prices()
+        _logger.info(
+            "Repriced %d CJ products of %s", len(changed), self.name
+        )
+        return len(changed)
 
     @api.model
     def get_default_config(self):
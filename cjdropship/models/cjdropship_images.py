@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""CJDropshipping product image downloads."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from .cjdropship_api import DEFAULT_FETCH_WORKERS, get_session
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_TIMEOUT = 10
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Client errors that may go away when the download is tried again later
+TRANSIENT_CLIENT_STATUSES = (408, 425, 429)
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image exceeds the configured size limit."""
+
+
+class ImageCache:
+    """On-disk cache of downloaded product images.
+
+    Image bodies are stored once per content hash under ``blobs/``; every
+    URL gets a small JSON entry under ``urls/`` pointing at its blob and
+    remembering the validators needed for conditional requests.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _url_path(self, url):
+        """Return the path of the entry describing ``url``."""
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.path, 'urls', key[:2], key + '.json')
+
+    def blob_path(self, checksum):
+        """Return the path of the image stored under ``checksum``."""
+        return os.path.join(self.path, 'blobs', checksum[:2], checksum)
+
+    def _write(self, path, content):
+        """Write ``content`` to ``path`` atomically."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, url):
+        """Return the cache entry of ``url`` if its image is stored."""
+        try:
+            with open(self._url_path(url), encoding='utf-8') as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.blob_path(entry['checksum'])):
+            return None
+        return entry
+
+    def put(self, url, content, etag=None, last_modified=None):
+        """Store the image downloaded from ``url`` and return its entry."""
+        checksum = hashlib.sha256(content).hexdigest()
+        blob_path = self.blob_path(checksum)
+        if not os.path.exists(blob_path):
+            self._write(blob_path, content)
+        return self.touch(url, {
+            'checksum': checksum,
+            'etag': etag,
+            'last_modified': last_modified,
+        })
+
+    def touch(self, url, entry):
+        """Record that ``entry`` is still the current image of ``url``."""
+        entry = dict(entry, fetched_at=time.time())
+        self._write(self._url_path(url), json.dumps(entry).encode())
+        os.utime(self.blob_path(entry['checksum']))
+        return entry
+
+    def read(self, checksum):
+        """Return the image stored under ``checksum``."""
+        with open(self.blob_path(checksum), 'rb') as blob:
+            return blob.read()
+
+    def prune(self, max_age):
+        """Delete entries and images not used for ``max_age`` seconds."""
+        limit = time.time() - max_age
+        removed = 0
+        for root, _dirs, files in os.walk(self.path):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < limit:
+                        os.unlink(path)
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
+
+
+def download_image(url, cache, session=None, refresh=False,
+                   max_size=DEFAULT_IMAGE_MAX_SIZE):
+    """Return the cache entry of the image at ``url``, downloading it if needed.
+
+    Cached images are used as is unless ``refresh`` is set, in which case
+    the server is asked with a conditional request whether they changed.
+    Raises ``ImageTooLargeError`` for images above ``max_size`` bytes.
+    """
+    entry = cache.get(url)
+    if entry and not refresh:
+        return entry
+
+    headers = {}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+
+    session = session or get_session('images')
+    with session.get(
+        url, headers=headers, timeout=IMAGE_TIMEOUT, stream=True
+    ) as response:
+        if entry and response.status_code == 304:
+            return cache.touch(url, entry)
+        response.raise_for_status()
+        if int(response.headers.get('Content-Length') or 0) > max_size:
+            raise ImageTooLargeError(
+                f"Image {url} is larger than {max_size} bytes"
+            )
+        content = bytearray()
+        for chunk in response.iter_content(IMAGE_CHUNK_SIZE):
+            content += chunk
+            if len(content) > max_size:
+                raise ImageTooLargeError(
+                    f"Image {url} is larger than {max_size} bytes"
+                )
+        return cache.put(
+            url,
+            bytes(content),
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        )
+
+
+def download_images(urls, cache, session=None, refresh=False,
+                    max_size=DEFAULT_IMAGE_MAX_SIZE,
+                    max_workers=DEFAULT_FETCH_WORKERS):
+    """Download many images at once, each distinct URL only once.
+
+    Returns a dict keyed by URL holding either the cache ``entry`` of the
+    image or the ``error`` message explaining why it could not be fetched,
+    along with whether that error is ``permanent`` (an image that is too
+    large or a 4xx answer) rather than worth another try later.
+    """
+    results = {url: {} for url in dict.fromkeys(urls) if url}
+    if not results:
+        return results
+
+    session = session or get_session('images')
+    max_workers = max(1, min(max_workers, len(results)))
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix='cjdropship_image'
+    ) as executor:
+        futures = {
+            executor.submit(
+                download_image, url, cache, session, refresh, max_size
+            ): url
+            for url in results
+        }
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                results[url]['entry'] = future.result()
+            except (
+                requests.exceptions.RequestException,
+                OSError,
+                ValueError,
+            ) as e:
+                results[url]['error'] = str(e)
+                results[url]['permanent'] = is_permanent_error(e)
+    return results
+
+
+def is_permanent_error(exc):
+    """Tell whether downloading the image again cannot succeed."""
+    if isinstance(exc, ImageTooLargeError):
+        return True
+    response = getattr(exc, 'response', None)
+    if isinstance(exc, requests.exceptions.HTTPError) and response is not None:
+        return (
+            400 <= response.status_code < 500
+            and response.status_code not in TRANSIENT_CLIENT_STATUSES
+        )
+    return False
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""CJDropshipping Background Product Import Jobs."""
+
+import bisect
+import logging
+import time
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+# Failed attempts at the same page before the job gives up
+MAX_PAGE_ATTEMPTS = 3
+
+
+class CJDropshippingImportJob(models.Model):
+    """Catalog import walking every product list page in the background.
+
+    The job checkpoints its position after each page, so an interrupted
+    or crashed run resumes with the next page.
+    """
+
+    _name = 'cjdropship.import.job'
+    _description = 'CJDropshipping Product Import Job'
+    _order = 'id desc'
+
+    name = fields.Char(required=True)
+    config_id = fields.Many2one(
+        'cjdropship.config',
+        'Configuration',
+        required=True,
+        ondelete='cascade',
+        default=lambda self: (
+            self.env['cjdropship.config'].get_default_config()
+        )
+    )
+    category_id = fields.Many2one(
+        'cjdropship.category',
+        'Category Filter',
+        domain="[('config_id', '=', config_id)]",
+        help="Import the products of this category and its subcategories; "
+             "empty to import the whole catalog"
+    )
+    page_size = fields.Integer('Products per Page', default=50)
+    page_interval = fields.Float(
+        'Seconds Between Pages',
+        default=2.0,
+        help="Pause between two pages, leaving API quota and database "
+             "time to the live shop"
+    )
+    create_odoo_products = fields.Boolean('Create Odoo Products')
+    import_variants = fields.Boolean()
+
+    state = fields.Selection(
+        [
+            ('draft', 'Draft'),
+            ('running', 'Running'),
+            ('paused', 'Paused'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        default='draft',
+        required=True,
+        readonly=True,
+        copy=False
+    )
+
+    # Checkpoint
+    category_count = fields.Integer(readonly=True, copy=False)
+    category_done_count = fields.Integer(
+        'Categories Done',
+        readonly=True,
+        copy=False
+    )
+    cursor_category = fields.Char(
+        'CJ Category in Progress',
+        readonly=True,
+        copy=False,
+        help="CJ id of the leaf category being imported; empty before the "
+             "first one"
+    )
+    next_page = fields.Integer(default=1, readonly=True, copy=False)
+    current_total = fields.Integer(
+        'Products in Category',
+        readonly=True,
+        copy=False,
+        help="Product count CJ reported for the category being imported"
+    )
+    page_attempts = fields.Integer(readonly=True, copy=False)
+
+    # Progress
+    page_count = fields.Integer('Pages Imported', readonly=True, copy=False)
+    imported_count = fields.Integer(readonly=True, copy=False)
+    error_count = fields.Integer(readonly=True, copy=False)
+    last_error = fields.Text(readonly=True, copy=False)
+    progress = fields.Float(compute='_compute_progress')
+    started_at = fields.Datetime(readonly=True, copy=False)
+    finished_at = fields.Datetime(readonly=True, copy=False)
+
+    @api.depends(
+        'state', 'category_count', 'category_done_count', 'next_page',
+        'page_size', 'current_total'
+    )
+    def _compute_progress(self):
+        """Estimate the share of the catalog imported so far."""
+        for record in self:
+            if record.state == 'done':
+                record.progress = 100.0
+            elif not record.category_count:
+                record.progress = 0.0
+            else:
+                within = 0.0
+                if record.current_total:
+                    within = min(
+                        1.0,
+                        (record.next_page - 1) * record.page_size
+                        / record.current_total
+                    )
+                record.progress = min(
+                    100.0,
+                    (record.category_done_count + within)
+                    / record.category_count * 100
+                )
+
+    @api.constrains('page_size', 'page_interval')
+    def _check_page_size(self):
+        """Validate page size and throttling."""
+        for record in self:
+            if not 1 <= record.page_size <= 200:
+                raise ValidationError(
+                    self.env._('Products per page must be between 1 and 200')
+                )
+            if record.page_interval < 0:
+                raise ValidationError(
+                    self.env._('Seconds between pages cannot be negative')
+                )
+
+    def action_start(self):
+        """Start or resume the import in the background."""
+        for record in self.filtered(
+            lambda r: r.state in ('draft', 'paused', 'failed')
+        ):
+            vals = {'state': 'running', 'page_attempts': 0}
+            if not record.started_at:
+                vals.update({
+                    'started_at': fields.Datetime.now(),
+                    'category_count': len(record._get_category_ids()),
+                })
+            record.write(vals)
+        self.env.ref('cjdropship.ir_cron_run_import_jobs')._trigger()
+
+    def action_pause(self):
+        """Pause the import after the page in progress."""
+        self.filtered(lambda r: r.state == 'running').state = 'paused'
+
+    def action_view_products(self):
+        """View the products of the import configuration."""
+        self.ensure_one()
+        action = self.env['ir.actions.act_window']._for_xml_id(
+            'cjdropship.action_cjdropship_product'
+        )
+        domain = [('config_id', '=', self.config_id.id)]
+        if self.category_id:
+            domain.append(('category_id', 'child_of', self.category_id.id))
+        action['domain'] = domain
+        return action
+
+    def _get_category_ids(self):
+        """Return the CJ ids of the leaf categories to walk, in order."""
+        self.ensure_one()
+        if not self.category_id:
+            return [None]
+        return sorted(
+            self.category_id._get_leaf_categories().mapped('cj_category_id')
+        )
+
+    def _seek_category(self, category_ids):
+        """Return the position of the checkpointed category.
+
+        The checkpoint holds a CJ category id, not a position, so changes to
+        the category tree since the last run cannot shift the import onto
+        another category. A category that vanished meanwhile is followed by
+        the next one in order, from its first page.
+        """
+        self.ensure_one()
+        if not self.cursor_category:
+            return 0
+        position = bisect.bisect_left(category_ids, self.cursor_category)
+        if (
+            position < len(category_ids)
+            and category_ids[position] != self.cursor_category
+        ):
+            self.write({
+                'cursor_category': category_ids[position],
+                'next_page': 1,
+                'current_total': 0,
+            })
+        return position
+
+    def _import_page(self, client, category_ids, position):
+        """Import the page at the checkpoint and move the checkpoint on."""
+        self.ensure_one()
+        result = client.get_product_list(
+            page=self.next_page,
+            page_size=self.page_size,
+            category_id=category_ids[position]
+        ) or {}
+        products_data = result.get('list') or []
+        total = int(result.get('total') or 0)
+
+        cj_products = self.env['cjdropship.product']._import_from_cj_list(
+            self.config_id,
+            products_data,
+            create_odoo_products=self.create_odoo_products,
+            import_variants=self.import_variants,
+        )
+
+        vals = {
+            'page_count': self.page_count + 1,
+            'imported_count': self.imported_count + len(cj_products),
+            'current_total': total,
+            'page_attempts': 0,
+        }
+        last_page = (
+            len(products_data) < self.page_size
+            or (total and self.next_page * self.page_size >= total)
+        )
+        if not last_page:
+            vals['next_page'] = self.next_page + 1
+        elif position + 1 < len(category_ids):
+            vals.update({
+                'category_done_count': self.category_done_count + 1,
+                'cursor_category': category_ids[position + 1],
+                'next_page': 1,
+                'current_total': 0,
+            })
+        else:
+            vals.update({
+                'category_done_count': self.category_done_count + 1,
+                'state': 'done',
+                'finished_at': fields.Datetime.now(),
+            })
+        self.write(vals)
+
+    def _run(self, deadline):
+        """Import pages until done, paused or out of time.
+
+        Commits after every page. Returns True if the deadline
+        interrupted the job.
+        """
+        self.ensure_one()
+        category_ids = self._get_category_ids()
+        client = None
+        last_page_at = 0.0
+        while self.state == 'running':
+            position = self._seek_category(category_ids)
+            if position >= len(category_ids):
+                self.write({
+                    'state': 'done',
+                    'finished_at': fields.Datetime.now(),
+                })
+                break
+            wait = last_page_at + self.page_interval - time.monotonic()
+            if time.monotonic() + max(wait, 0) >= deadline:
+                return True
+            if wait > 0:
+                time.sleep(wait)
+            if not self.config_id._is_api_available():
+                _logger.info(
+                    "CJDropshipping unavailable, import job %s waits",
+                    self.name
+                )
+                return False
+
+            last_page_at = time.monotonic()
+            try:
+                client = client or self.config_id.get_api_client()
+                self._import_page(client, category_ids, position)
+            except Exception as exc:  # pylint: disable=broad-except
+                # Whatever broke the page, count it so the job cannot stay
+                # running forever on a page that always fails
+                self.env.cr.rollback()
+                self._record_failure(str(exc) or type(exc).__name__)
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+                return False
+            # Checkpoint, a crash resumes with the next page
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            # Pick up a pause requested meanwhile
+            self.invalidate_recordset(['state'])
+        return False
+
+    def _record_failure(self, error):
+        """Count a failed attempt at the current page."""
+        self.ensure_one()
+        _logger.warning(
+            "Import job %s failed on page %d: %s",
+            self.name, self.next_page, error
+        )
+        vals = {
+            'error_count': self.error_count + 1,
+            'last_error': error,
+        }
+        # Outages are waited out instead of counting against the page
+        if self.config_id._is_api_available():
+            vals['page_attempts'] = self.page_attempts + 1
+            if vals['page_attempts'] >= MAX_PAGE_ATTEMPTS:
+                vals['state'] = 'failed'
+        self.write(vals)
+
+    @api.model
+    def _cron_run_import_jobs(self):
+        """Run the running import jobs, oldest first."""
+        deadline = (
+            time.monotonic() + self.env['cjdropship.config']._sync_time_budget()
+        )
+        for job in self.search([('state', '=', 'running')], order='id'):
+            if job._run(deadline):
+                # Out of time, carry on in a fresh cron run
+                self.env.ref('cjdropship.ir_cron_run_import_jobs')._trigger()
+                return
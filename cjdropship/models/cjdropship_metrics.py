@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""CJDropshipping API Metrics."""
+
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta, timezone
+
+from odoo import SUPERUSER_ID, api, fields, models
+
+from .cjdropship_api import (
+    LATENCY_BUCKETS,
+    EndpointMetrics,
+    flush_metrics,
+    histogram_quantile,
+    timestamp_to_datetime,
+)
+
+_logger = logging.getLogger(__name__)
+
+# Days API metrics are kept at flush period resolution
+METRICS_RETENTION_DAYS = 30
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (
+            key,
+            str(value).replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('"', '\\"'),
+        )
+        for key, value in labels.items()
+    )
+
+
+def format_prometheus(families):
+    """Render metric families in the Prometheus text exposition format.
+
+    Each family is a ``(name, type, help, samples)`` tuple whose samples are
+    ``(suffix, labels, value)`` tuples, the suffix (e.g. ``_bucket``) being
+    appended to the family name.
+    """
+    lines = []
+    for name, metric_type, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(
+            f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+            for suffix, labels, value in samples
+        )
+    return '\n'.join(lines) + '\n'
+
+
+class CJDropshippingMetrics(models.Model):
+    """API call statistics of one endpoint over one flush period."""
+
+    _name = 'cjdropship.metrics'
+    _description = 'CJDropshipping API Metrics'
+    _rec_name = 'endpoint'
+    _order = 'period_start desc, endpoint'
+
+    config_id = fields.Many2one(
+        'cjdropship.config',
+        'Configuration',
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+    endpoint = fields.Char(required=True, index=True)
+    period_start = fields.Datetime(required=True, index=True)
+    period_end = fields.Datetime(required=True)
+
+    request_count = fields.Integer('Requests')
+    error_count = fields.Integer('Errors')
+    retry_count = fields.Integer('Retries')
+    bytes_sent = fields.Float(digits=(16, 0))
+    bytes_received = fields.Float(digits=(16, 0))
+    total_duration_ms = fields.Float('Total Duration (ms)')
+    avg_duration_ms = fields.Float('Average Duration (ms)', aggregator='avg')
+    max_duration_ms = fields.Float('Max Duration (ms)', aggregator='max')
+    p50_duration_ms = fields.Float('p50 Duration (ms)', aggregator='avg')
+    p95_duration_ms = fields.Float('p95 Duration (ms)', aggregator='avg')
+    p99_duration_ms = fields.Float('p99 Duration (ms)', aggregator='max')
+    rate_limit_wait_ms = fields.Float('Rate Limit Wait (ms)')
+    cache_hits = fields.Integer()
+    cache_misses = fields.Integer()
+    status_counts = fields.Char(help="Responses per HTTP status or error")
+    latency_histogram = fields.Char(
+        help="Requests per latency bucket, see LATENCY_BUCKETS"
+    )
+
+    @api.model
+    def _prepare_flush_vals(self, config_id, period_start, period_end,
+                            endpoints):
+        """Turn collected endpoint statistics into record values."""
+        vals_list = []
+        for endpoint, metrics in endpoints.items():
+            answered = sum(metrics.buckets)
+            vals_list.append({
+                'config_id': config_id,
+                'endpoint': endpoint,
+                'period_start': timestamp_to_datetime(period_start),
+                'period_end': timestamp_to_datetime(period_end),
+                'request_count': metrics.requests,
+                'error_count': metrics.errors,
+                'retry_count': metrics.retries,
+                'bytes_sent': metrics.bytes_sent,
+                'bytes_received': metrics.bytes_received,
+                'total_duration_ms': metrics.duration * 1000,
+                'avg_duration_ms': (
+                    metrics.duration * 1000 / answered if answered else 0.0
+                ),
+                'max_duration_ms': metrics.max_duration * 1000,
+                'p50_duration_ms': (
+                    histogram_quantile(metrics.buckets, 0.5) * 1000
+                ),
+                'p95_duration_ms': (
+                    histogram_quantile(metrics.buckets, 0.95) * 1000
+                ),
+                'p99_duration_ms': (
+                    histogram_quantile(metrics.buckets, 0.99) * 1000
+                ),
+                'rate_limit_wait_ms': metrics.rate_limit_wait * 1000,
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+                'status_counts': json.dumps(metrics.statuses, sort_keys=True),
+                'latency_histogram': json.dumps(metrics.buckets),
+            })
+        return vals_list
+
+    @api.model
+    def _cron_flush_metrics(self):
+        """Flush the metrics collected by this worker process.
+
+        Collectors of the other workers flush themselves on the request
+        path; this only catches up on periods left idle in the cron worker.
+        """
+        flush_metrics()
+
+    def _to_endpoint_metrics(self):
+        """Merge these rows back into a single ``EndpointMetrics``."""
+        metrics = EndpointMetrics()
+        for record in self:
+            metrics.requests += record.request_count
+            metrics.errors += record.error_count
+            metrics.retries += record.retry_count
+            metrics.duration += record.total_duration_ms / 1000
+            metrics.max_duration = max(
+                metrics.max_duration, record.max_duration_ms / 1000
+            )
+            metrics.bytes_sent += record.bytes_sent
+            metrics.bytes_received += record.bytes_received
+            metrics.rate_limit_wait += record.rate_limit_wait_ms / 1000
+            metrics.cache_hits += record.cache_hits
+            metrics.cache_misses += record.cache_misses
+            statuses = json.loads(record.status_counts or '{}')
+            for status, count in statuses.items():
+                metrics.statuses[status] = (
+                    metrics.statuses.get(status, 0) + count
+                )
+            histogram = json.loads(record.latency_histogram or '[]')
+            for index, count in enumerate(histogram):
+                metrics.buckets[index] += count
+        return metrics
+
+    @api.autovacuum
+    def _gc_old_metrics(self):
+        """Compact metrics older than the retention period.
+
+        Old periods of an endpoint are merged into a single row rather than
+        deleted, so the totals exported to Prometheus never decrease.
+        """
+        limit = fields.Datetime.now() - timedelta(days=METRICS_RETENTION_DAYS)
+        groups = defaultdict(self.browse)
+        for record in self.search([('period_start', '<', limit)]):
+            groups[record.config_id.id, record.endpoint] |= record
+
+        vals_list = []
+        compacted = self.browse()
+        for (config_id, endpoint), records in groups.items():
+            if len(records) < 2:
+                continue
+            vals_list += self._prepare_flush_vals(
+                config_id,
+                min(records.mapped('period_start')).replace(
+                    tzinfo=timezone.utc
+                ).timestamp(),
+                max(records.mapped('period_end')).replace(
+                    tzinfo=timezone.utc
+                ).timestamp(),
+                {endpoint: records._to_endpoint_metrics()},
+            )
+            compacted |= records
+        compacted.unlink()
+        self.create(vals_list)
+
+    @api.model
+    def _prometheus_metrics(self):
+        """Return the API call metric families of every configuration."""
+        cr = self.env.cr
+        cr.execute("""
+            SELECT config_id, endpoint, SUM(request_count), SUM(error_count),
+                   SUM(retry_count), SUM(total_duration_ms),
+                   SUM(bytes_received), SUM(rate_limit_wait_ms),
+                   SUM(cache_hits), SUM(cache_misses), SUM(bytes_sent)
+            FROM cjdropship_metrics
+            GROUP BY config_id, endpoint
+            ORDER BY config_id, endpoint
+        """)
+        totals = cr.fetchall()
+        cr.execute("""
+            SELECT m.config_id, m.endpoint, s.key, SUM(s.value::bigint)
+            FROM cjdropship_metrics m,
+                 jsonb_each_text(COALESCE(m.status_counts, '{}')::jsonb) s
+            GROUP BY m.config_id, m.endpoint, s.key
+            ORDER BY m.config_id, m.endpoint, s.key
+        """)
+        statuses = cr.fetchall()
+        cr.execute("""
+            SELECT m.config_id, m.endpoint, b.position, SUM(b.count::bigint)
+            FROM cjdropship_metrics m,
+                 jsonb_array_elements_text(
+                     COALESCE(m.latency_histogram, '[]')::jsonb
+                 ) WITH ORDINALITY b(count, position)
+            GROUP BY m.config_id, m.endpoint, b.position
+        """)
+        histograms = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        for config_id, endpoint, position, count in cr.fetchall():
+            if position <= len(LATENCY_BUCKETS) + 1:
+                histograms[config_id, endpoint][position - 1] = int(count)
+
+        def labels(row):
+            return {'config': row[0], 'endpoint': row[1]}
+
+        duration_samples = []
+        for row in totals:
+            cumulative = 0
+            buckets = histograms[row[0], row[1]]
+            for upper, count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                cumulative += count
+                duration_samples.append((
+                    '_bucket', dict(labels(row), le=str(upper)), cumulative
+                ))
+            duration_samples.append(('_sum', labels(row), row[5] / 1000))
+            duration_samples.append(('_count', labels(row), cumulative))
+
+        return [
+            (
+                'cjdropship_api_requests_total', 'counter',
+                "CJ API requests sent",
+                [('', labels(row), int(row[2])) for row in totals],
+            ),
+            (
+                'cjdropship_api_errors_total', 'counter',
+                "CJ API requests that failed",
+                [('', labels(row), int(row[3])) for row in totals],
+            ),
+            (
+                'cjdropship_api_retries_total', 'counter',
+                "CJ API requests retried",
+                [('', labels(row), int(row[4])) for row in totals],
+            ),
+            (
+                'cjdropship_api_responses_total', 'counter',
+                "CJ API outcomes per HTTP status, CJ error code or exception",
+                [
+                    ('', dict(labels(row), status=row[2]), int(row[3]))
+                    for row in statuses
+                ],
+            ),
+            (
+                'cjdropship_api_request_duration_seconds', 'histogram',
+                "Duration of answered CJ API requests",
+                duration_samples,
+            ),
+            (
+                'cjdropship_api_sent_bytes_total', 'counter',
+                "Request body bytes sent to the CJ API",
+                [('', labels(row), int(row[10] or 0)) for row in totals],
+            ),
+            (
+                'cjdropship_api_received_bytes_total', 'counter',
+                "Response bytes received from the CJ API",
+                [('', labels(row), int(row[6])) for row in totals],
+            ),
+            (
+                'cjdropship_api_rate_limit_wait_seconds_total', 'counter',
+                "Time spent waiting for a CJ API rate limit slot",
+                [('', labels(row), row[7] / 1000) for row in totals],
+            ),
+            (
+                'cjdropship_api_cache_hits_total', 'counter',
+                "CJ API calls answered from the response cache",
+                [('', labels(row), int(row[8])) for row in totals],
+            ),
+            (
+                'cjdropship_api_cache_misses_total', 'counter',
+                "Cacheable CJ API calls not found in the response cache",
+                [('', labels(row), int(row[9])) for row in totals],
+            ),
+        ]
+
+    @api.model
+    def _render_prometheus(self):
+        """Render all integration metrics in the Prometheus text format."""
+        families = []
+        for model in (
+            'cjdropship.metrics',
+            'cjdropship.webhook',
+            'cjdropship.order',
+            'cjdropship.product',
+        ):
+            families += self.env[model]._prometheus_metrics()
+        return format_prometheus(families)
+
+
+class DatabaseMetricsSink:
+    """Store flushed API metrics in ``cjdropship.metrics``.
+
+    Writes go through a cursor of their own, independent of whatever
+    transaction the API call that triggered the flush belongs to.
+    """
+
+    def __init__(self, registry, config_id):
+        self.registry = registry
+        self.config_id = config_id
+
+    def __call__(self, period_start, period_end, endpoints):
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            metrics_model = env['cjdropship.metrics']
+            metrics_model.create(metrics_model._prepare_flush_vals(
+                self.config_id, period_start, period_end, endpoints
+            ))
+        _logger.debug(
+            "Flushed CJ API metrics of %d endpoints", len(endpoints)
+        )
@@ -4,11 +4,60 @@
 import json
 import logging
 
-from odoo import models, fields
+import requests
+
+from odoo import models, fields, api
 from odoo.exceptions import UserError
 
+from .cjdropship_api import (
+    RETRY_STATUSES,
+    SAFE_RETRY_EXCEPTIONS,
+    SAFE_RETRY_STATUSES,
+    CJApiError,
+    CJCircuitOpenError,
+    CJRateLimitError,
+)
+
 _logger = logging.getLogger(__name__)
 
+# States of orders still waiting to be accepted by CJDropshipping
+ORDER_BACKLOG_STATES = ('draft', 'deferred', 'verify', 'error')
+# States of orders that can be (re)submitted to CJDropshipping
+ORDER_SUBMIT_STATES = ('draft', 'deferred', 'verify')
+
+
+def submission_failure_state(exc):
+    """Return the state a failed order submission leaves the order in.
+
+    ``deferred`` when CJ certainly did not process the request, so it can
+    simply be sent again later; ``verify`` when CJ may have created the
+    order before the answer got lost, so it must be looked up before being
+    sent again; ``error`` when CJ rejected it.
+
+    Only failures in ``SAFE_RETRY_EXCEPTIONS`` prove the request never
+    reached CJ; other connection errors may strike after the body was sent.
+    """
+    if isinstance(exc, (
+        CJCircuitOpenError,
+        CJRateLimitError,
+    ) + SAFE_RETRY_EXCEPTIONS):
+        return 'deferred'
+    if isinstance(exc, requests.exceptions.HTTPError):
+        response = exc.response
+        status = response.status_code if response is not None else None
+        if status in SAFE_RETRY_STATUSES:
+            return 'deferred'
+        return 'error' if status and status < 500 else 'verify'
+    if isinstance(exc, CJApiError):
+        if exc.code in SAFE_RETRY_STATUSES:
+            return 'deferred'
+        return 'verify' if exc.code in RETRY_STATUSES else 'error'
+    if isinstance(exc, requests.exceptions.RequestException):
+        # Read timeouts, dropped connections and broken responses: the
+        # order may have reached CJ
+        return 'verify'
+    return 'error'
+
 
 class CJDropshippingOrder(models.Model):
     """Model for CJDropshipping order management."""
@@ -47,6 +96,8 @@ class CJDropshippingOrder(models.Model):
     state = fields.Selection(
         [
             ('draft', 'Draft'),
+            ('deferred', 'Deferred'),
+            ('verify', 'Needs Verification'),
             ('submitted', 'Submitted to CJ'),
             ('processing', 'Processing'),
             ('shipped', 'Shipped'),
@@ -88,14 +139,18 @@ class CJDropshippingOrder(models.Model):
         """Submit order to CJDropshipping."""
         self.ensure_one()
 
-        if self.state != 'draft':
+        if self.state not in ORDER_SUBMIT_STATES:
             raise UserError(
-                self.env._('Only draft orders can be submitted')
+                self.env._(
+                    'Only draft, deferred or unverified orders can be '
+                    'submitted'
+                )
             )
 
         if not self.sale_order_id:
             raise UserError(self.env._('Sale order is required'))
 
+        verifying = False
         try:
             client = self.config_id.get_api_client()
 
@@ -105,8 +160,16 @@ class CJDropshippingOrder(models.Model):
             # Store request data
             self.request_data = json.dumps(order_data, indent=2)
 
+            # The last attempt may have created the order at CJ already
+            result = None
+            if self.state == 'verify':
+                verifying = True
+                result = self._find_at_cj(client, order_data['orderNumber'])
+                verifying = False
+
             # Submit to CJDropshipping
-            result = client.create_order(order_data)
+            if not result:
+                result = client.create_order(order_data)
 
             # Store response data
             self.response_data = json.dumps(result, indent=2)
@@ -143,20 +206,132 @@ class CJDropshippingOrder(models.Model):
                 self.env._('Failed to get order ID from CJDropshipping')
             )
 
-        except (UserError, ValueError) as exc:
-            error_msg = str(exc)
-            _logger.error(
-                "Failed to submit order to CJDropshipping: %s", error_msg
-            )
+        except (
+            UserError,
+            ValueError,
+            requests.exceptions.RequestException
+        ) as exc:
+            state = submission_failure_state(exc)
+            if verifying:
+                # Whether the order exists at CJ is still unknown
+                state = 'verify'
+            if state == 'error':
+                error_msg = str(exc)
+                _logger.error(
+                    "Failed to submit order to CJDropshipping: %s", error_msg
+                )
 
-            self.write({
-                'state': 'error',
-                'error_message': error_msg,
-            })
+                self.write({
+                    'state': 'error',
+                    'error_message': error_msg,
+                })
 
-            raise UserError(
-                self.env._('Failed to submit order: %s', error_msg)
-            ) from exc
+                raise UserError(
+                    self.env._('Failed to submit order: %s', error_msg)
+                ) from exc
+
+            # Returned rather than raised, so the new state is kept
+            self._defer_submission(str(exc), state)
+            if state == 'deferred':
+                message = self.env._(
+                    'CJDropshipping is currently unavailable, the order '
+                    'will be submitted later: %s',
+                    str(exc)
+                )
+            else:
+                message = self.env._(
+                    'CJDropshipping did not confirm the order, it will be '
+                    'looked up at CJDropshipping before being sent again: %s',
+                    str(exc)
+                )
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': self.env._('Submission Postponed'),
+                    'message': message,
+                    'type': 'warning',
+                }
+            }
+
+    def _find_at_cj(self, client, order_number):
+        """Return the CJ order created under ``order_number``, if any."""
+        result = client.get_order_list(order_number=order_number) or {}
+        for cj_order in result.get('list') or []:
+            if cj_order.get('orderNum') == order_number:
+                _logger.info(
+                    "Order %s already exists at CJDropshipping as %s",
+                    order_number, cj_order.get('orderId')
+                )
+                return cj_order
+        return None
+
+    def _defer_submission(self, reason, state='deferred'):
+        """Park orders whose submission must be retried later.
+
+        ``verify`` orders are looked up at CJ before being sent again.
+        """
+        _logger.warning(
+            "Postponing submission of CJDropshipping orders %s (%s): %s",
+            self.ids, state, reason
+        )
+        self.write({
+            'state': state,
+            'error_message': reason,
+        })
+
+    @api.model
+    def _cron_submit_deferred_orders(self, limit=100):
+        """Submit orders deferred during an outage or awaiting verification."""
+        orders = self.search(
+            [('state', 'in', ('deferred', 'verify'))],
+            order='create_date',
+            limit=limit
+        )
+        for order in orders:
+            if not order.config_id._is_api_available():
+                continue
+            try:
+                order.action_submit_to_cj()
+            except UserError as exc:
+                _logger.info(
+                    "Deferred order %s not submitted: %s",
+                    order.sale_order_id.name, str(exc)
+                )
+            # Persist each outcome, the order may now exist at CJ
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    @api.model
+    def _prometheus_metrics(self):
+        """Return the order backlog metric families."""
+        self.env.cr.execute("""
+            SELECT config_id, state, COUNT(*),
+                   MAX(EXTRACT(EPOCH FROM
+                       now() at time zone 'UTC' - create_date))
+            FROM cjdropship_order
+            GROUP BY config_id, state
+            ORDER BY config_id, state
+        """)
+        rows = self.env.cr.fetchall()
+        return [
+            (
+                'cjdropship_orders', 'gauge',
+                "CJ orders per state",
+                [
+                    ('', {'config': config_id, 'state': state}, count)
+                    for config_id, state, count, _age in rows
+                ],
+            ),
+            (
+                'cjdropship_order_backlog_oldest_age_seconds', 'gauge',
+                "Age of the oldest CJ order not yet accepted by CJ",
+                [
+                    ('', {'config': config_id, 'state': state}, float(age))
+                    for config_id, state, _count, age in rows
+                    if state in ORDER_BACKLOG_STATES
+                ],
+            ),
+        ]
 
     def _prepare_cj_order_data(self):
         """Prepare order data for CJDropshipping API."""
@@ -168,13 +343,14 @@ class CJDropshippingOrder(models.Model):
         # Prepare order lines
         products = []
         for line in order.order_line:
-            if (
-                line.product_id.is_cjdropship
-                and line.product_id.product_tmpl_id.cjdropship_product_id
-            ):
-                cj_product = (
-                    line.product_id.product_tmpl_id.cjdropship_product_id
-                )
+            if not line.product_id.is_cjdropship:
+                continue
+            # Prefer the CJ variant of the ordered Odoo variant
+            cj_product = (
+                line.product_id.cjdropship_variant_ids[:1]
+                or line.product_id.product_tmpl_id.cjdropship_product_id
+            )
+            if cj_product:
                 products.append({
                     'productId': cj_product.cj_product_id,
                     'variantId': cj_product.cj_variant_id or '',
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""CJDropshipping Pricing Rules."""
+
+import bisect
+import math
+from collections import namedtuple
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+CompiledRule = namedtuple('CompiledRule', [
+    'price_min', 'price_max', 'weight_min', 'weight_max', 'markup_type',
+    'markup', 'shipping_cost', 'shipping_cost_per_weight', 'price_ending',
+])
+
+
+def apply_price_ending(price, ending):
+    """Round ``price`` up to the next price ending in ``ending``, e.g. .99."""
+    if not ending:
+        return price
+    rounded = math.floor(price) + ending
+    if rounded < price:
+        rounded += 1
+    return round(rounded, 6)
+
+
+def _category_key(category):
+    """Return the key a CJ category name is matched on."""
+    return (category or '').strip().lower()
+
+
+class PricingTable:
+    """Pricing rules compiled into sorted interval tables.
+
+    Rules are split by CJ category; within a category the price bands of
+    all rules cut the price axis into intervals, each holding the rules
+    covering it in sequence order. Pricing a product is then a dict lookup
+    and a bisect, followed by a scan of the few rules of one interval.
+    """
+
+    def __init__(self, rules, markup_type='percentage', markup=0.0):
+        self.default = CompiledRule(
+            0.0, None, 0.0, None, markup_type, markup, 0.0, 0.0, 0.0
+        )
+        generic = [rule for category, rule in rules if not category]
+        self.generic = self._build(generic)
+        self.tables = {}
+        for category in {category for category, _rule in rules if category}:
+            self.tables[category] = self._build([
+                rule for rule_category, rule in rules
+                if rule_category in (category, '')
+            ])
+
+    @staticmethod
+    def _build(rules):
+        """Return the bounds and per-interval candidates of ``rules``."""
+        bounds = sorted({
+            bound
+            for rule in rules
+            for bound in (rule.price_min, rule.price_max)
+            if bound is not None
+        })
+        lows = [-math.inf] + bounds
+        highs = bounds + [math.inf]
+        intervals = [
+            tuple(
+                rule for rule in rules
+                if rule.price_min <= low
+                and (rule.price_max is None or high <= rule.price_max)
+            )
+            for low, high in zip(lows, highs)
+        ]
+        return bounds, intervals
+
+    def find_rule(self, cost_price, category=None, weight=0.0):
+        """Return the rule pricing a product, or the default markup."""
+        bounds, intervals = self.tables.get(
+            _category_key(category), self.generic
+        )
+        weight = weight or 0.0
+        for rule in intervals[bisect.bisect_right(bounds, cost_price)]:
+            if rule.weight_min <= weight and (
+                rule.weight_max is None or weight < rule.weight_max
+            ):
+                return rule
+        return self.default
+
+    def price(self, cost_price, category=None, weight=0.0):
+        """Return the sale price of a product."""
+        cost_price = cost_price or 0.0
+        rule = self.find_rule(cost_price, category, weight)
+        base = (
+            cost_price
+            + rule.shipping_cost
+            + rule.shipping_cost_per_weight * (weight or 0.0)
+        )
+        if rule.markup_type == 'percentage':
+            price = base * (1 + rule.markup / 100)
+        else:
+            price = base + rule.markup
+        return apply_price_ending(price, rule.price_ending)
+
+
+class CJDropshippingPricingRule(models.Model):
+    """Markup applied to the CJ products matching its conditions."""
+
+    _name = 'cjdropship.pricing.rule'
+    _description = 'CJDropshipping Pricing Rule'
+    _order = 'sequence, id'
+
+    config_id = fields.Many2one(
+        'cjdropship.config',
+        'Configuration',
+        required=True,
+        ondelete='cascade'
+    )
+    sequence = fields.Integer(default=10)
+    active = fields.Boolean(default=True)
+
+    # Conditions
+    category_name = fields.Char(
+        'CJ Category',
+        help="Only products of this CJ category; empty for all categories. "
+             "Rules of a category take part before the others of the same "
+             "sequence"
+    )
+    price_min = fields.Float(
+        'Min CJ Price',
+        digits='Product Price',
+        help="Products costing at least this amount"
+    )
+    price_max = fields.Float(
+        'Max CJ Price',
+        digits='Product Price',
+        help="Products costing less than this amount; 0 for no limit"
+    )
+    weight_min = fields.Float(
+        'Min Weight',
+        help="Products weighing at least this, in the unit of the "
+             "shipping weight"
+    )
+    weight_max = fields.Float(
+        'Max Weight',
+        help="Products weighing less than this; 0 for no limit"
+    )
+
+    # Price
+    markup_type = fields.Selection(
+        [
+            ('fixed', 'Fixed Amount'),
+            ('percentage', 'Percentage')
+        ],
+        default='percentage',
+        required=True
+    )
+    markup = fields.Float(default=30.0)
+    shipping_cost = fields.Float(
+        digits='Product Price',
+        help="Shipping cost added to the CJ price before the markup"
+    )
+    shipping_cost_per_weight = fields.Float(
+        'Shipping Cost per Weight Unit',
+        digits='Product Price',
+        help="Shipping cost per unit of weight added to the CJ price "
+             "before the markup"
+    )
+    price_ending = fields.Float(
+        digits=(16, 2),
+        help="Round prices up to end in this, e.g. 0.99; 0 keeps the "
+             "computed price"
+    )
+
+    @api.constrains('price_min', 'price_max', 'weight_min', 'weight_max')
+    def _check_bands(self):
+        """Validate price and weight bands."""
+        for record in self:
+            if record.price_max and record.price_max <= record.price_min:
+                raise ValidationError(
+                    self.env._('Max CJ price must be above min CJ price')
+                )
+            if record.weight_max and record.weight_max <= record.weight_min:
+                raise ValidationError(
+                    self.env._('Max weight must be above min weight')
+                )
+
+    @api.constrains('markup', 'price_ending')
+    def _check_markup(self):
+        """Validate markup and price ending."""
+        for record in self:
+            if record.markup < 0:
+                raise ValidationError(
+                    self.env._('Price markup cannot be negative')
+                )
+            if not 0 <= record.price_ending < 1:
+                raise ValidationError(
+                    self.env._('Price ending must be between 0 and 1')
+                )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Reprice the products of the configs getting new rules."""
+        records = super().create(vals_list)
+        self._rules_changed(records.config_id)
+        return records
+
+    def write(self, vals):
+        """Reprice the products of the configs whose rules change."""
+        configs = self.config_id
+        res = super().write(vals)
+        self._rules_changed(configs | self.config_id)
+        return res
+
+    def unlink(self):
+        """Reprice the products of the configs losing rules."""
+        configs = self.config_id
+        res = super().unlink()
+        self._rules_changed(configs)
+        return res
+
+    @api.model
+    def _rules_changed(self, configs):
+        """Renew the compiled rules and reprice the products of ``configs``."""
+        configs._bump_pricing_version()
+        configs._schedule_reprice()
+
+    def _compile(self):
+        """Return the ``(category key, CompiledRule)`` pairs of the rules."""
+        return [
+            (
+                _category_key(rule.category_name),
+                CompiledRule(
+                    rule.price_min,
+                    rule.price_max or None,
+                    rule.weight_min,
+                    rule.weight_max or None,
+                    rule.markup_type,
+                    rule.markup,
+                    rule.shipping_cost,
+                    rule.shipping_cost_per_weight,
+                    rule.price_ending,
+                ),
+            )
+            for rule in self.sorted(
+                lambda r: (r.sequence, not r.category_name, r.id)
+            )
+        ]
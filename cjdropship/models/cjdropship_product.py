@@ -2,15 +2,24 @@
 """CJDropshipping Product Model."""
 
 import base64
+import hashlib
+import json
 import logging
+import os
 
 import requests
 
-from odoo import models, fields
+from odoo import Command, models, fields, api
 from odoo.exceptions import UserError
+from odoo.tools import SQL, config, float_compare
+
+from .cjdropship_images import ImageCache, download_images
 
 _logger = logging.getLogger(__name__)
 
+# Failed downloads of a pending image before the image cron gives up on it
+MAX_IMAGE_ATTEMPTS = 5
+
 
 class CJDropshippingProduct(models.Model):
     """Model for storing CJDropshipping product information."""
@@ -32,6 +41,12 @@ class CJDropshippingProduct(models.Model):
     # Product Information
     description = fields.Text()
     category_name = fields.Char('CJ Category')
+    category_id = fields.Many2one(
+        'cjdropship.category',
+        'Category',
+        ondelete='set null',
+        index=True
+    )
 
     # Pricing
     cj_price = fields.Float('CJ Price', digits='Product Price')
@@ -57,6 +72,13 @@ class CJDropshippingProduct(models.Model):
         ondelete='set null',
         index=True
     )
+    product_id = fields.Many2one(
+        'product.product',
+        'Odoo Variant',
+        ondelete='set null',
+        index=True,
+        help="Odoo product variant of this CJ variant"
+    )
     config_id = fields.Many2one(
         'cjdropship.config',
         'Configuration',
@@ -69,59 +91,86 @@ class CJDropshippingProduct(models.Model):
     # Status
     active = fields.Boolean(default=True)
     sync_date = fields.Datetime('Last Sync Date')
+    image_pending = fields.Boolean(
+        'Image Pending',
+        copy=False,
+        index=True,
+        help="The image of the linked Odoo product is still to be "
+             "downloaded in the background."
+    )
+    price_mismatch = fields.Boolean(
+        'Variant Price Not Applied',
+        readonly=True,
+        copy=False,
+        help="The selling price of this variant could not be expressed as "
+             "attribute value extra prices; the Odoo variant sells at the "
+             "price of its base product."
+    )
+    image_attempts = fields.Integer(
+        'Image Download Attempts',
+        readonly=True,
+        copy=False,
+        help="Failed downloads of the pending image; the image cron gives "
+             "up on it after a few."
+    )
+    image_checksum = fields.Char(
+        'Image Checksum',
+        readonly=True,
+        copy=False,
+        help="Hash of the image last assigned to the linked Odoo product"
+    )
+    cj_fingerprint = fields.Char(
+        'CJ Fingerprint',
+        readonly=True,
+        copy=False,
+        help="Hash of the CJ data the last sync was based on; products "
+             "whose data still matches it are not rewritten."
+    )
 
     _sql_constraints = [
         (
             'cj_product_variant_unique',
-            'unique(cj_product_id, cj_variant_id)',
-            'CJ Product and Variant combination must be unique!'
+            'unique(config_id, cj_product_id, cj_variant_id)',
+            'CJ Product and Variant combination must be unique per '
+            'configuration!'
         )
     ]
 
     def action_create_odoo_product(self):
-        """Create or update Odoo product from CJ product."""
-        self.ensure_one()
+        """Create or update Odoo product from CJ product.
 
-        product_template_model = self.env['product.template']
-
-        # Prepare product values
-        categ_id = False
-        if self.config_id.default_categ_id:
-            categ_id = self.config_id.default_categ_id.id
-        vals = {
-            'name': self.cj_product_name,
-            'type': self.config_id.default_product_type,
-            'categ_id': categ_id,
-            'list_price': self.selling_price,
-            'standard_price': self.cj_price,
-            'description_sale': self.description,
-            'weight': self.shipping_weight,
-            'cjdropship_product_id': self.id,
-            'is_cjdropship': True,
-        }
+        Variant rows share the template of their base product, which is
+        created or updated instead.
+        """
+        self.ensure_one()
 
-        if self.cj_product_sku:
-            vals['default_code'] = self.cj_product_sku
+        if self.cj_variant_id:
+            base = self.with_context(active_test=False).search([
+                ('config_id', '=', self.config_id.id),
+                ('cj_product_id', '=', self.cj_product_id),
+                ('cj_variant_id', '=', False),
+            ], limit=1)
+            if not base:
+                raise UserError(
+                    self.env._(
+                        'The base product of this CJ variant has not been '
+                        'imported'
+                    )
+                )
+            return base.action_create_odoo_product()
 
         if self.product_tmpl_id:
             # Update existing product
-            self.product_tmpl_id.write(vals)
+            self.product_tmpl_id.write(self._prepare_template_vals())
             product = self.product_tmpl_id
+            refresh = True
         else:
             # Create new product
-            product = product_template_model.create(vals)
-            self.product_tmpl_id = product.id
+            product = self._create_odoo_products()
+            refresh = False
 
         # Download and set image if URL is available
-        if self.image_url:
-            try:
-                response = requests.get(self.image_url, timeout=10)
-                if response.status_code == 200:
-                    product.image_1920 = base64.b64encode(response.content)
-            except requests.exceptions.RequestException as exc:
-                _logger.warning(
-                    "Failed to download product image: %s", str(exc)
-                )
+        self._fetch_images(refresh=refresh)
 
         return {
             'type': 'ir.actions.act_window',
@@ -146,32 +195,13 @@ class CJDropshippingProduct(models.Model):
                     self.env._('Product not found in CJDropshipping')
                 )
 
-            # Update fields
-            update_vals = {
-                'cj_product_name': product_data.get(
-                    'productNameEn',
-                    self.cj_product_name
-                ),
-                'description': product_data.get('description', ''),
-                'cj_price': float(product_data.get('sellPrice', 0)),
-                'sync_date': fields.Datetime.now(),
-            }
-
-            # Recalculate selling price
-            update_vals['selling_price'] = (
-                self.config_id.calculate_sale_price(update_vals['cj_price'])
-            )
-
             # Get inventory
+            inventory_data = None
             try:
                 inventory_data = client.get_product_inventory(
                     self.cj_product_id,
                     self.cj_variant_id
                 )
-                if inventory_data:
-                    update_vals['cj_stock_qty'] = int(
-                        inventory_data.get('quantity', 0)
-                    )
             except (ValueError, requests.exceptions.RequestException) as exc:
                 _logger.warning(
                     "Failed to get inventory for %s: %s",
@@ -179,14 +209,12 @@ class CJDropshippingProduct(models.Model):
                     str(exc)
                 )
 
-            self.write(update_vals)
-
-            # Update linked Odoo product if exists
-            if self.product_tmpl_id:
-                self.product_tmpl_id.write({
-                    'list_price': update_vals['selling_price'],
-                    'standard_price': update_vals['cj_price'],
-                })
+            if self._apply_sync_vals(
+                self._prepare_sync_vals(product_data, inventory_data)
+            ):
+                self._apply_variant_prices()
+            else:
+                self._touch_sync_date()
 
             return {
                 'type': 'ir.actions.client',
@@ -211,11 +239,811 @@ class CJDropshippingProduct(models.Model):
                 self.env._('Failed to sync product: %s', str(exc))
             ) from exc
 
+    def _prepare_sync_vals(self, product_data, inventory_data=None):
+        """Prepare values updating this product from CJ data."""
+        self.ensure_one()
+
+        if self.cj_variant_id:
+            # Variant rows take name and price from their own variant
+            variant = next((
+                variant for variant in product_data.get('variants') or []
+                if variant.get('vid') == self.cj_variant_id
+            ), {})
+            name = variant.get('variantNameEn', self.cj_product_name)
+            price = variant.get('variantSellPrice', self.cj_price)
+        else:
+            name = product_data.get('productNameEn', self.cj_product_name)
+            price = product_data.get('sellPrice', 0)
+
+        update_vals = {
+            'cj_product_name': name,
+            'description': product_data.get('description', ''),
+            'cj_price': float(price),
+            'sync_date': fields.Datetime.now(),
+            'cj_fingerprint': self._sync_fingerprint(
+                product_data, inventory_data
+            ),
+        }
+
+        # Recalculate selling price
+        update_vals['selling_price'] = (
+            self.config_id.calculate_sale_price(
+                update_vals['cj_price'],
+                self.category_name,
+                self.shipping_weight
+            )
+        )
+
+        if inventory_data:
+            update_vals['cj_stock_qty'] = int(
+                inventory_data.get('quantity', 0)
+            )
+
+        return update_vals
+
+    def _prepare_template_vals(self):
+        """Prepare ``product.template`` values from this CJ product."""
+        self.ensure_one()
+        categ_id = False
+        if self.config_id.default_categ_id:
+            categ_id = self.config_id.default_categ_id.id
+        vals = {
+            'name': self.cj_product_name,
+            'type': self.config_id.default_product_type,
+            'categ_id': categ_id,
+            'list_price': self.selling_price,
+            'standard_price': self.cj_price,
+            'description_sale': self.description,
+            'weight': self.shipping_weight,
+            'cjdropship_product_id': self.id,
+            'is_cjdropship': True,
+        }
+
+        if self.cj_product_sku:
+            vals['default_code'] = self.cj_product_sku
+        return vals
+
+    def _create_odoo_products(self):
+        """Create the Odoo products of products not linked to one yet.
+
+        Templates are created in one batch and linked back with a single
+        statement; their images are left to the background image cron.
+        Returns the created templates.
+        """
+        records = self.filtered(lambda r: not r.product_tmpl_id)
+        if not records:
+            return self.env['product.template']
+
+        templates = self.env['product.template'].create([
+            record._prepare_template_vals() for record in records
+        ])
+        templates.flush_recordset(['cjdropship_product_id'])
+        self.flush_model([
+            'product_tmpl_id', 'image_pending', 'image_attempts',
+            'image_checksum',
+        ])
+        self.env.cr.execute("""
+            UPDATE cjdropship_product p
+               SET product_tmpl_id = t.id,
+                   image_pending = p.image_url IS NOT NULL
+                                   AND p.image_url != '',
+                   image_attempts = 0,
+                   image_checksum = NULL,
+                   write_uid = %s,
+                   write_date = now() at time zone 'UTC'
+              FROM product_template t
+             WHERE t.cjdropship_product_id = p.id
+               AND t.id IN %s
+        """, [self.env.uid, tuple(templates.ids)])
+        records.invalidate_recordset(
+            ['product_tmpl_id', 'image_pending', 'image_attempts',
+             'image_checksum', 'write_uid', 'write_date']
+        )
+        if records.filtered('image_pending'):
+            self.env.ref('cjdropship.ir_cron_fetch_product_images')._trigger()
+        return templates
+
+    @api.model
+    def _get_image_cache(self):
+        """Return the on-disk image cache of this database."""
+        return ImageCache(os.path.join(
+            config['data_dir'], 'cjdropship_images', self.env.cr.dbname
+        ))
+
+    def _fetch_images(self, refresh=False):
+        """Download the images of the linked Odoo products.
+
+        Every distinct URL is downloaded once on a thread pool through the
+        on-disk cache; ``refresh`` revalidates cached images with the server.
+        Templates sharing an image are written together and products whose
+        image did not change are left alone. Pending images stay pending
+        after a transient failure, until ``MAX_IMAGE_ATTEMPTS`` failed tries.
+        """
+        cache = self._get_image_cache()
+        # Variant rows share their base product's template and image, and
+        # rows whose template was deleted have nothing to download it for
+        done = self.filtered(
+            lambda r: not r.image_url or r.cj_variant_id
+            or not r.product_tmpl_id
+        )
+        retry = {}
+        for config_rec in self.config_id:
+            records = self.filtered(
+                lambda r, c=config_rec: (
+                    r.config_id == c and r.product_tmpl_id and r.image_url
+                    and not r.cj_variant_id
+                )
+            )
+            results = download_images(
+                records.mapped('image_url'),
+                cache,
+                refresh=refresh,
+                max_size=config_rec.image_max_size * 1024 * 1024,
+                max_workers=config_rec.api_fetch_workers,
+            )
+
+            by_checksum = {}
+            for record in records:
+                result = results[record.image_url]
+                if 'error' in result:
+                    _logger.warning(
+                        "Failed to download product image %s: %s",
+                        record.image_url, result['error']
+                    )
+                    attempts = record.image_attempts + 1
+                    if result['permanent'] or attempts >= MAX_IMAGE_ATTEMPTS:
+                        done |= record
+                    else:
+                        retry.setdefault(attempts, self.browse())
+                        retry[attempts] |= record
+                    continue
+                done |= record
+                checksum = result['entry']['checksum']
+                if checksum != record.image_checksum:
+                    by_checksum.setdefault(checksum, self.browse())
+                    by_checksum[checksum] |= record
+
+            for checksum, changed in by_checksum.items():
+                changed.product_tmpl_id.write({
+                    'image_1920': base64.b64encode(cache.read(checksum)),
+                })
+                changed.image_checksum = checksum
+
+        done.filtered(
+            lambda r: r.image_pending or r.image_attempts
+        ).write({'image_pending': False, 'image_attempts': 0})
+        for attempts, records in retry.items():
+            records.filtered('image_pending').image_attempts = attempts
+
+    @api.model
+    def _cron_fetch_product_images(self, limit=200):
+        """Download images deferred by the bulk product creation."""
+        records = self.search(
+            [('image_pending', '=', True)],
+            order='image_attempts, id',
+            limit=limit
+        )
+        records._fetch_images()
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+        # Only go on while the batch made progress, not on failing images
+        if len(records) == limit and not all(records.mapped('image_pending')):
+            self.env.ref('cjdropship.ir_cron_fetch_product_images')._trigger()
+
+    @api.autovacuum
+    def _gc_image_cache(self):
+        """Delete cached images not used for 30 days."""
+        self._get_image_cache().prune(30 * 24 * 3600)
+
+    def _sync_fingerprint(self, product_data, inventory_data=None):
+        """Return a hash of the CJ data a sync derives this product from.
+
+        Markup changes are not part of it, they reprice products directly.
+        """
+        self.ensure_one()
+        payload = json.dumps(
+            [product_data, inventory_data], sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @api.model
+    def _changed_vals(self, record, vals):
+        """Return the subset of ``vals`` that differs from ``record``."""
+        changed = {}
+        for name, value in vals.items():
+            field = record._fields[name]
+            current = record[name]
+            if field.type == 'float':
+                digits = field.get_digits(record.env)
+                if digits:
+                    differs = float_compare(
+                        current or 0.0,
+                        value or 0.0,
+                        precision_digits=digits[1]
+                    ) != 0
+                else:
+                    differs = (current or 0.0) != (value or 0.0)
+            elif field.type == 'many2one':
+                differs = current.id != (value or False)
+            else:
+                differs = (current or False) != (value or False)
+            if differs:
+                changed[name] = value
+        return changed
+
+    def _apply_sync_vals(self, update_vals):
+        """Write synced values and push prices to the linked Odoo product.
+
+        Only fields whose value differs are written, and nothing at all when
+        the CJ data matches the fingerprint of the previous sync. Returns
+        whether anything was written.
+        """
+        self.ensure_one()
+        fingerprint = update_vals.get('cj_fingerprint')
+        if fingerprint and fingerprint == self.cj_fingerprint:
+            return False
+
+        changed = self._changed_vals(self, update_vals)
+        self.write(changed)
+
+        # Update linked Odoo product if exists
+        if self.cj_variant_id:
+            if self.product_id and self._changed_vals(self.product_id, {
+                'standard_price': update_vals['cj_price'],
+            }):
+                self.product_id.standard_price = update_vals['cj_price']
+        elif self.product_tmpl_id:
+            template_vals = self._changed_vals(self.product_tmpl_id, {
+                'list_price': update_vals['selling_price'],
+                'standard_price': update_vals['cj_price'],
+            })
+            if template_vals:
+                self.product_tmpl_id.write(template_vals)
+        return True
+
+    def _touch_sync_date(self):
+        """Mark products as synced without going through the ORM write.
+
+        Used for products whose CJ data did not change, so that sync
+        staleness stays accurate without recomputes or cache invalidation.
+        """
+        if not self:
+            return
+        self.env.cr.execute("""
+            UPDATE cjdropship_product
+               SET sync_date = now() at time zone 'UTC'
+             WHERE id IN %s
+        """, [tuple(self.ids)])
+        self.invalidate_recordset(['sync_date'])
+
+    def _sync_from_cj_batch(self):
+        """Sync many products, fetching their CJ data concurrently.
+
+        All API calls run on the client's thread pool; the ORM writes happen
+        afterwards in the calling thread; products whose CJ data is unchanged
+        only get their sync date bumped. Returns the products that could
+        not be synced.
+        """
+        failed = self.browse()
+        unchanged = self.browse()
+        for config in self.config_id:
+            records = self.filtered(lambda r, c=config: r.config_id == c)
+            client = config.get_api_client()
+            variant_rows = records.filtered('cj_variant_id')
+            cj_data = client.fetch_products(
+                records.mapped('cj_product_id'),
+                inventory=bool(records - variant_rows),
+                variant_ids={
+                    row.cj_variant_id: row.cj_product_id for row in variant_rows
+                },
+                max_workers=config.api_fetch_workers,
+            )
+
+            for record in records:
+                result = cj_data.get(record.cj_product_id, {})
+                if not result.get('detail'):
+                    _logger.warning(
+                        "Failed to sync product %s: %s",
+                        record.cj_product_id,
+                        result.get('errors', {}).get(
+                            'detail', 'Product not found in CJDropshipping'
+                        )
+                    )
+                    failed |= record
+                    continue
+                errors = result.get('errors', {})
+                if record.cj_variant_id:
+                    inventory = result.get('variant_inventory', {}).get(
+                        record.cj_variant_id
+                    )
+                    error = errors.get('variant_inventory', {}).get(
+                        record.cj_variant_id
+                    )
+                else:
+                    inventory = result.get('inventory')
+                    error = errors.get('inventory')
+                if error:
+                    _logger.warning(
+                        "Failed to get inventory for %s: %s",
+                        record.cj_variant_id or record.cj_product_id, error
+                    )
+                if not record._apply_sync_vals(record._prepare_sync_vals(
+                    result['detail'], inventory
+                )):
+                    unchanged |= record
+        unchanged._touch_sync_date()
+        (self - unchanged - failed)._apply_variant_prices()
+        return failed
+
+    @api.model
+    def _import_from_cj_list(self, config, products_data,
+                             create_odoo_products=False,
+                             import_variants=False):
+        """Import a page of CJ product list entries for ``config``.
+
+        Returns the imported products.
+        """
+        cj_ids = list({
+            product_data['categoryId'] for product_data in products_data
+            if product_data.get('categoryId')
+        })
+        categories = {
+            category.cj_category_id: category.id
+            for category in self.env['cjdropship.category'].search([
+                ('config_id', '=', config.id),
+                ('cj_category_id', 'in', cj_ids),
+            ])
+        } if cj_ids else {}
+
+        vals_list = []
+        for product_data in products_data:
+            try:
+                if product_data.get('pid'):
+                    vals_list.append(self._prepare_import_vals(
+                        config, product_data, categories
+                    ))
+            except (TypeError, ValueError) as exc:
+                _logger.warning(
+                    "Failed to import product %s: %s",
+                    product_data.get('pid'),
+                    str(exc)
+                )
+
+        cj_products = self._upsert_from_cj(vals_list)
+
+        # Create Odoo products if requested
+        if create_odoo_products:
+            cj_products._create_odoo_products()
+        if import_variants:
+            cj_products._import_variants()
+        return cj_products
+
+    @api.model
+    def _prepare_import_vals(self, config, product_data, categories=None):
+        """Prepare ``cjdropship.product`` values from a CJ list entry."""
+        vals = {
+            'cj_product_id': product_data['pid'],
+            'cj_product_name': product_data.get('productNameEn', ''),
+            'cj_product_sku': product_data.get('productSku', ''),
+            'description': product_data.get('description', ''),
+            'cj_price': float(product_data.get('sellPrice', 0)),
+            'category_name': product_data.get('categoryName', ''),
+            'category_id': (categories or {}).get(
+                product_data.get('categoryId'), False
+            ),
+            'image_url': product_data.get('productImage', ''),
+            'shipping_weight': float(product_data.get('weight', 0)),
+            'config_id': config.id,
+            'sync_date': fields.Datetime.now(),
+        }
+
+        # Calculate selling price
+        vals['selling_price'] = config.calculate_sale_price(
+            vals['cj_price'],
+            vals['category_name'],
+            vals['shipping_weight']
+        )
+        return vals
+
+    def _import_variants(self):
+        """Import the CJ variants of products as Odoo product variants.
+
+        Variants of all products are fetched concurrently, attributes,
+        values and attribute lines are created in batches and every CJ
+        variant is matched to its Odoo variant through a dict keyed by
+        attribute values. Returns the products whose variants could not
+        be fetched.
+        """
+        records = self.filtered(lambda r: not r.cj_variant_id)
+        records._create_odoo_products()
+
+        failed = self.browse()
+        parsed = {}
+        for config_rec in records.config_id:
+            config_records = records.filtered(
+                lambda r, c=config_rec: r.config_id == c
+            )
+            client = config_rec.get_api_client()
+            cj_data = client.fetch_products(
+                config_records.mapped('cj_product_id'),
+                variants=True,
+                max_workers=config_rec.api_fetch_workers,
+            )
+            for record in config_records:
+                result = cj_data.get(record.cj_product_id, {})
+                if not result.get('variants'):
+                    _logger.warning(
+                        "Failed to get variants for %s: %s",
+                        record.cj_product_id,
+                        result.get('errors', {}).get(
+                            'variants', 'No variants found in CJDropshipping'
+                        )
+                    )
+                    failed |= record
+                    continue
+                key_names = (result.get('detail') or {}).get('productKeyEn')
+                parsed[record] = [
+                    (variant, self._parse_variant_key(variant, key_names))
+                    for variant in result['variants']
+                    if variant.get('vid')
+                ]
+
+        values = self._get_attribute_values({
+            pair
+            for items in parsed.values()
+            for _variant, pairs in items
+            for pair in pairs
+        })
+        self._add_attribute_lines(parsed, values)
+
+        vals_list = []
+        for record, items in parsed.items():
+            products = {
+                frozenset(
+                    product.product_template_attribute_value_ids
+                    .product_attribute_value_id.ids
+                ): product
+                for product in record.product_tmpl_id.product_variant_ids
+            }
+            for variant, pairs in items:
+                product = products.get(
+                    frozenset(values[pair].id for pair in pairs)
+                )
+                vals_list.append(record._prepare_variant_vals(variant, product))
+        variant_records = self._upsert_from_cj(vals_list)
+
+        # Variant costs, one write per distinct price
+        by_price = {}
+        for variant_record in variant_records.filtered('product_id'):
+            by_price.setdefault(variant_record.cj_price, []).append(
+                variant_record.product_id.id
+            )
+        for price, product_ids in by_price.items():
+            self.env['product.product'].browse(product_ids).standard_price = (
+                price
+            )
+        variant_records._apply_variant_prices()
+        return failed
+
+    @api.model
+    def _parse_variant_key(self, variant, key_names=None):
+        """Return the ``(attribute, value)`` pairs of a CJ variant.
+
+        CJ joins the values of a variant in ``variantKey`` and the
+        attribute names in the product's ``productKeyEn``, both with ``-``.
+        Keys that cannot be split reliably become a single value of a
+        generic "Variant" attribute.
+        """
+        key = (variant.get('variantKey') or '').strip()
+        if not key:
+            return []
+        names = [name.strip() for name in (key_names or '').split('-')]
+        parts = [part.strip() for part in key.split('-')]
+        if len(names) != len(parts) or not all(names + parts):
+            return [('Variant', key)]
+        return list(zip(names, parts))
+
+    @api.model
+    def _get_attribute_values(self, pairs):
+        """Return ``product.attribute.value`` records keyed by their pair.
+
+        Missing attributes and values are created in one batch each.
+        """
+        attribute_model = self.env['product.attribute']
+        value_model = self.env['product.attribute.value']
+        names = list(dict.fromkeys(name for name, _value in pairs))
+        if not names:
+            return {}
+
+        attributes = {
+            attribute.name: attribute
+            for attribute in attribute_model.search([('name', 'in', names)])
+        }
+        missing = [name for name in names if name not in attributes]
+        attributes.update(zip(missing, attribute_model.create([
+            {'name': name, 'create_variant': 'always'} for name in missing
+        ])))
+
+        attribute_names = {
+            attribute.id: name for name, attribute in attributes.items()
+        }
+        values = {
+            (attribute_names[value.attribute_id.id], value.name): value
+            for value in value_model.search([
+                ('attribute_id', 'in', list(attribute_names)),
+            ])
+            if value.attribute_id.id in attribute_names
+        }
+        missing = [pair for pair in pairs if pair not in values]
+        values.update(zip(missing, value_model.create([
+            {'attribute_id': attributes[name].id, 'name': value}
+            for name, value in missing
+        ])))
+        return values
+
+    @api.model
+    def _add_attribute_lines(self, parsed, values):
+        """Give the templates of ``parsed`` products their attribute lines."""
+        to_create = []
+        for record, items in parsed.items():
+            template = record.product_tmpl_id
+            wanted = {}
+            for _variant, pairs in items:
+                for pair in pairs:
+                    value = values[pair]
+                    wanted.setdefault(value.attribute_id.id, set()).add(
+                        value.id
+                    )
+
+            lines = {
+                line.attribute_id.id: line
+                for line in template.attribute_line_ids
+            }
+            for attribute_id, value_ids in wanted.items():
+                line = lines.get(attribute_id)
+                if not line:
+                    to_create.append({
+                        'product_tmpl_id': template.id,
+                        'attribute_id': attribute_id,
+                        'value_ids': [Command.set(sorted(value_ids))],
+                    })
+                elif value_ids - set(line.value_ids.ids):
+                    line.value_ids = [
+                        Command.link(value_id)
+                        for value_id in value_ids - set(line.value_ids.ids)
+                    ]
+        if to_create:
+            self.env['product.template.attribute.line'].create(to_create)
+
+    def _prepare_variant_vals(self, variant, product=None):
+        """Prepare the values of the CJ product row of one CJ variant."""
+        self.ensure_one()
+        cj_price = float(variant.get('variantSellPrice') or self.cj_price)
+        weight = float(variant.get('variantWeight') or self.shipping_weight)
+        return {
+            'cj_product_id': self.cj_product_id,
+            'cj_variant_id': variant['vid'],
+            'cj_product_name': (
+                variant.get('variantNameEn') or self.cj_product_name
+            ),
+            'cj_product_sku': variant.get('variantSku', ''),
+            'description': self.description,
+            'cj_price': cj_price,
+            'selling_price': self.config_id.calculate_sale_price(
+                cj_price, self.category_name, weight
+            ),
+            'category_name': self.category_name,
+            'category_id': self.category_id.id,
+            'image_url': variant.get('variantImage') or self.image_url,
+            'shipping_weight': weight,
+            'config_id': self.config_id.id,
+            'product_tmpl_id': self.product_tmpl_id.id,
+            'product_id': product.id if product else False,
+            'sync_date': fields.Datetime.now(),
+        }
+
+    def _apply_variant_prices(self):
+        """Make the Odoo variants of these products sell at their CJ price.
+
+        Odoo prices a variant at its template's sale price plus the extra
+        prices of its attribute values, so the difference of every variant
+        to its base product goes to the values of the one attribute line
+        it depends on. Variants whose prices depend on several attributes
+        at once cannot be expressed that way and are flagged instead.
+        """
+        templates = self.product_tmpl_id
+        if not templates:
+            return
+        variant_rows = self.search([
+            ('product_tmpl_id', 'in', templates.ids),
+            ('cj_variant_id', '!=', False),
+            ('product_id', '!=', False),
+        ])
+        digits = self._fields['selling_price'].get_digits(self.env)[1]
+        extras = {}
+        mismatched = self.browse()
+        rows_by_template = {}
+        for row in variant_rows:
+            rows_by_template.setdefault(row.product_tmpl_id, self.browse())
+            rows_by_template[row.product_tmpl_id] |= row
+        for template, rows in rows_by_template.items():
+            deltas = {
+                row: row.selling_price - template.list_price for row in rows
+            }
+            line_extras = None
+            for line in template.attribute_line_ids:
+                candidate = {}
+                for row, delta in deltas.items():
+                    value = row.product_id.product_template_attribute_value_ids
+                    value = value.filtered(
+                        lambda v, l=line: v.attribute_line_id == l
+                    )
+                    if not value or float_compare(
+                        candidate.setdefault(value, delta), delta,
+                        precision_digits=digits
+                    ):
+                        break
+                else:
+                    line_extras = (line, candidate)
+                    break
+            if line_extras is None:
+                if any(
+                    float_compare(delta, 0.0, precision_digits=digits)
+                    for delta in deltas.values()
+                ):
+                    mismatched |= rows
+                continue
+            line, candidate = line_extras
+            for other in template.attribute_line_ids - line:
+                for value in other.product_template_value_ids:
+                    extras[value] = 0.0
+            extras.update(candidate)
+
+        by_extra = {}
+        for value, extra in extras.items():
+            if float_compare(
+                value.price_extra, extra, precision_digits=digits
+            ):
+                by_extra.setdefault(round(extra, digits), []).append(value.id)
+        for extra, value_ids in by_extra.items():
+            self.env['product.template.attribute.value'].browse(
+                value_ids
+            ).price_extra = extra
+        (variant_rows - mismatched).filtered('price_mismatch').write({
+            'price_mismatch': False,
+        })
+        mismatched.filtered(lambda r: not r.price_mismatch).write({
+            'price_mismatch': True,
+        })
+
+    @api.model
+    def _upsert_from_cj(self, vals_list):
+        """Create or update products in bulk.
+
+        Existing products are matched on ``config_id``, ``cj_product_id``
+        and ``cj_variant_id`` with a single search, new ones are created in
+        one batch, changed ones are updated with one statement and unchanged
+        ones only get their sync date bumped, so the query count does not
+        grow with the number of rows. Archived matches are restored.
+        Returns the upserted products in input order.
+        """
+        by_key = {
+            (
+                vals['config_id'],
+                vals['cj_product_id'],
+                vals.get('cj_variant_id') or False,
+            ): dict(vals, active=True)
+            for vals in vals_list
+        }
+        if not by_key:
+            return self.browse()
+
+        def record_key(record):
+            return (
+                record.config_id.id, record.cj_product_id, record.cj_variant_id
+            )
+
+        records = {
+            record_key(record): record
+            for record in self.with_context(active_test=False).search([
+                ('config_id', 'in', list({key[0] for key in by_key})),
+                ('cj_product_id', 'in', list({key[1] for key in by_key})),
+            ])
+        }
+        to_create = []
+        changed = []
+        unchanged = self.browse()
+        for key, vals in by_key.items():
+            record = records.get(key)
+            if not record:
+                to_create.append(vals)
+            elif self._changed_vals(record, {
+                name: value for name, value in vals.items()
+                if name != 'sync_date'
+            }):
+                changed.append((record, vals))
+            else:
+                unchanged |= record
+
+        created = self.create(to_create)
+        records.update((record_key(record), record) for record in created)
+        self._bulk_update_vals(changed)
+        unchanged._touch_sync_date()
+        return self.browse([records[key].id for key in by_key])
+
+    @api.model
+    def _bulk_update_vals(self, rows):
+        """Update ``(record, vals)`` pairs sharing the same keys at once.
+
+        The fingerprint is cleared so the next detail sync rewrites the
+        values coming from the list endpoint.
+        """
+        if not rows:
+            return
+        names = [name for name in rows[0][1] if name != 'sync_date']
+        self.flush_model(names + ['sync_date', 'cj_fingerprint'])
+        # False means NULL for every column but booleans
+        payload = json.dumps([
+            dict({
+                name: (
+                    None if vals[name] is False
+                    and self._fields[name].type != 'boolean'
+                    else vals[name]
+                )
+                for name in names
+            }, id=record.id)
+            for record, vals in rows
+        ])
+        self.env.cr.execute(SQL(
+            """
+            UPDATE cjdropship_product p
+               SET %s,
+                   sync_date = now() at time zone 'UTC',
+                   cj_fingerprint = NULL,
+                   write_uid = %s,
+                   write_date = now() at time zone 'UTC'
+              FROM jsonb_to_recordset(%s::jsonb) AS v(id integer, %s)
+             WHERE p.id = v.id
+            """,
+            SQL(', ').join(
+                SQL('%s = v.%s', SQL.identifier(name), SQL.identifier(name))
+                for name in names
+            ),
+            self.env.uid,
+            payload,
+            SQL(', ').join(
+                SQL(
+                    '%s %s',
+                    SQL.identifier(name),
+                    SQL(self._fields[name].column_type[1])
+                )
+                for name in names
+            ),
+        ))
+        self.browse([record.id for record, _vals in rows]).invalidate_recordset(
+            names + ['sync_date', 'cj_fingerprint', 'write_uid', 'write_date']
+        )
+
+    def action_bulk_sync_from_cj(self):
+        """Sync multiple products from CJDropshipping."""
+        failed = self._sync_from_cj_batch()
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': self.env._('Sync Finished'),
+                'message': self.env._(
+                    '%(synced)d products synced, %(failed)d failed',
+                    synced=len(self) - len(failed),
+                    failed=len(failed)
+                ),
+                'type': 'warning' if failed else 'success',
+            }
+        }
+
     def action_bulk_create_products(self):
         """Create Odoo products for multiple CJ products."""
-        for record in self:
-            if not record.product_tmpl_id:
-                record.action_create_odoo_product()
+        templates = self._create_odoo_products()
 
         return {
             'type': 'ir.actions.client',
@@ -223,9 +1051,69 @@ class CJDropshippingProduct(models.Model):
             'params': {
                 'title': self.env._('Success'),
                 'message': self.env._(
-                    '%d products created successfully',
-                    len(self)
+                    '%d products created successfully, images are '
+                    'downloaded in the background',
+                    len(templates)
                 ),
                 'type': 'success',
             }
         }
+
+    def action_bulk_import_variants(self):
+        """Import the CJ variants of multiple CJ products."""
+        failed = self._import_variants()
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': self.env._('Variants Imported'),
+                'message': self.env._(
+                    '%(imported)d products imported with their variants, '
+                    '%(failed)d failed',
+                    imported=len(self.filtered(lambda r: not r.cj_variant_id))
+                    - len(failed),
+                    failed=len(failed)
+                ),
+                'type': 'warning' if failed else 'success',
+            }
+        }
+
+    @api.model
+    def _prometheus_metrics(self):
+        """Return the product sync staleness metric families."""
+        self.env.cr.execute("""
+            SELECT config_id, COUNT(*),
+                   COUNT(*) FILTER (WHERE sync_date IS NULL),
+                   COALESCE(MAX(EXTRACT(EPOCH FROM
+                       now() at time zone 'UTC' - sync_date)), 0),
+                   COALESCE(AVG(EXTRACT(EPOCH FROM
+                       now() at time zone 'UTC' - sync_date)), 0)
+            FROM cjdropship_product
+            WHERE active
+            GROUP BY config_id
+            ORDER BY config_id
+        """)
+        rows = self.env.cr.fetchall()
+        return [
+            (
+                'cjdropship_products', 'gauge',
+                "Active CJ products",
+                [('', {'config': row[0]}, row[1]) for row in rows],
+            ),
+            (
+                'cjdropship_products_never_synced', 'gauge',
+                "Active CJ products never synced from CJ",
+                [('', {'config': row[0]}, row[2]) for row in rows],
+            ),
+            (
+                'cjdropship_product_sync_oldest_age_seconds', 'gauge',
+                "Time since the least recently synced product was synced",
+                [('', {'config': row[0]}, float(row[3])) for row in rows],
+            ),
+            (
+                'cjdropship_product_sync_average_age_seconds', 'gauge',
+                "Average time since products were last synced",
+                [('', {'config': row[0]}, float(row[4])) for row in rows],
+            ),
+        ]
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""CJDropshipping API Rate Limit Buckets."""
+
+from odoo import models, fields
+from odoo.tools import sql
+
+from .cjdropship_api import MemoryRateLimiter
+
+
+class CJDropshippingRateLimit(models.Model):
+    """Token bucket state of one endpoint group, shared by all workers."""
+
+    _name = 'cjdropship.rate.limit'
+    _description = 'CJDropshipping API Rate Limit Bucket'
+    _rec_name = 'endpoint_group'
+
+    config_id = fields.Many2one(
+        'cjdropship.config',
+        'Configuration',
+        required=True,
+        ondelete='cascade'
+    )
+    endpoint_group = fields.Char(required=True)
+    tokens = fields.Float()
+    updated_at = fields.Datetime()
+
+    def init(self):
+        """Create the unique index the bucket upsert relies on."""
+        sql.create_unique_index(
+            self.env.cr,
+            'cjdropship_rate_limit_bucket_uniq',
+            self._table,
+            ['config_id', 'endpoint_group'],
+        )
+
+
+class DatabaseRateLimiter(MemoryRateLimiter):
+    """Token bucket rate limiter stored in ``cjdropship.rate.limit``.
+
+    Each reservation is a single upsert in a short-lived cursor of its own,
+    so all threads and worker processes draw from the same buckets.
+    """
+
+    def __init__(self, registry, config_id, rates=None, **kwargs):
+        super().__init__(('db', registry.db_name, config_id), rates, **kwargs)
+        self.registry = registry
+        self.config_id = config_id
+
+    def _reserve(self, group, rate, capacity):
+        """Take one token from the shared bucket."""
+        with self.registry.cursor() as cr:
+            cr.execute(
+                """
+                INSERT INTO cjdropship_rate_limit AS bucket
+                    (config_id, endpoint_group, tokens, updated_at,
+                     create_date, write_date)
+                VALUES (%(config_id)s, %(group)s, %(capacity)s - 1,
+                        clock_timestamp() at time zone 'UTC',
+                        now() at time zone 'UTC',
+                        now() at time zone 'UTC')
+                ON CONFLICT (config_id, endpoint_group) DO UPDATE SET
+                    tokens = LEAST(
+                        %(capacity)s,
+                        bucket.tokens + %(rate)s * EXTRACT(EPOCH FROM (
+                            clock_timestamp() at time zone 'UTC'
+                            - bucket.updated_at
+                        ))
+                    ) - 1,
+                    updated_at = clock_timestamp() at time zone 'UTC',
+                    write_date = now() at time zone 'UTC'
+                RETURNING tokens
+                """,
+                {
+                    'config_id': self.config_id,
+                    'group': group,
+                    'capacity': capacity,
+                    'rate': rate,
+                }
+            )
+            tokens = cr.fetchone()[0]
+            wait = -tokens / rate if tokens < 0 else 0.0
+            # Raising here rolls the reservation back
+            self._check_wait(group, wait)
+        return wait
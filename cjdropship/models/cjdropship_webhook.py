@@ -4,7 +4,7 @@
 import json
 import logging
 
-from odoo import models, fields
+from odoo import models, fields, api
 
 _logger = logging.getLogger(__name__)
 
@@ -46,6 +46,33 @@ class CJDropshippingWebhook(models.Model):
         ondelete='set null'
     )
 
+    @api.model
+    def _ingest(self, payload, headers=None):
+        """Log a received webhook and process it immediately."""
+        # Determine webhook type
+        webhook_type = 'other'
+        event = payload.get('event', '')
+
+        if 'order' in event.lower() and 'status' in event.lower():
+            webhook_type = 'order_status'
+        elif 'tracking' in event.lower():
+            webhook_type = 'tracking'
+        elif 'inventory' in event.lower() or 'stock' in event.lower():
+            webhook_type = 'inventory'
+
+        # Create webhook record
+        webhook = self.create({
+            'webhook_type': webhook_type,
+            'cj_order_id': payload.get('orderId', ''),
+            'event': event,
+            'payload': json.dumps(payload, indent=2),
+            'headers': json.dumps(headers or {}, indent=2),
+        })
+
+        # Process webhook immediately
+        webhook.action_process_webhook()
+        return webhook
+
     def action_process_webhook(self):
         """Process webhook data."""
         self.ensure_one()
@@ -126,8 +153,65 @@ class CJDropshippingWebhook(models.Model):
             ('cj_product_id', '=', product_id)
         ], limit=1)
 
+        if cj_product:
+            # Don't serve stale product data cached before the change
+            cj_product.config_id._invalidate_product_cache(product_id)
+
         if cj_product and quantity is not None:
             cj_product.write({
                 'cj_stock_qty': int(quantity),
                 'sync_date': fields.Datetime.now(),
             })
+
+    @api.model
+    def _prometheus_metrics(self):
+        """Return the webhook ingest and processing lag metric families."""
+        self.env.cr.execute("""
+            SELECT webhook_type, COUNT(*),
+                   COUNT(*) FILTER (WHERE NOT processed),
+                   COUNT(*) FILTER (
+                       WHERE NOT processed AND error_message IS NOT NULL
+                   ),
+                   COALESCE(MAX(EXTRACT(EPOCH FROM
+                       now() at time zone 'UTC' - create_date
+                   )) FILTER (WHERE NOT processed), 0),
+                   COUNT(*) FILTER (WHERE process_date IS NOT NULL),
+                   COALESCE(SUM(EXTRACT(EPOCH FROM
+                       process_date - create_date
+                   )) FILTER (WHERE process_date IS NOT NULL), 0)
+            FROM cjdropship_webhook
+            GROUP BY webhook_type
+            ORDER BY webhook_type
+        """)
+        rows = self.env.cr.fetchall()
+        lag_samples = []
+        for row in rows:
+            lag_samples.append(('_sum', {'type': row[0]}, float(row[6])))
+            lag_samples.append(('_count', {'type': row[0]}, row[5]))
+        return [
+            (
+                'cjdropship_webhooks_received_total', 'counter',
+                "Webhooks received from CJ",
+                [('', {'type': row[0]}, row[1]) for row in rows],
+            ),
+            (
+                'cjdropship_webhooks_pending', 'gauge',
+                "Received webhooks not processed yet",
+                [('', {'type': row[0]}, row[2]) for row in rows],
+            ),
+            (
+                'cjdropship_webhooks_failed', 'gauge',
+                "Received webhooks whose processing failed",
+                [('', {'type': row[0]}, row[3]) for row in rows],
+            ),
+            (
+                'cjdropship_webhook_oldest_pending_age_seconds', 'gauge',
+                "Age of the oldest webhook not processed yet",
+                [('', {'type': row[0]}, float(row[4])) for row in rows],
+            ),
+            (
+                'cjdropship_webhook_processing_lag_seconds', 'summary',
+                "Delay between receiving and processing a webhook",
+                lag_samples,
+            ),
+        ]
@@ -41,3 +41,9 @@ class ProductProduct(models.Model):
         string='Is CJDropshipping Product',
         store=True
     )
+    cjdropship_variant_ids = fields.One2many(
+        'cjdropship.product',
+        'product_id',
+        'CJ Variants',
+        readonly=True
+    )
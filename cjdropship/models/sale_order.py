@@ -77,10 +77,32 @@ class SaleOrder(models.Model):
 
         self.cjdropship_order_id = cj_order.id
 
+        # Don't let the confirmation wait on timeouts while CJ is down
+        if config.auto_fulfill_orders and not config._is_api_available():
+            cj_order._defer_submission(
+                self.env._('CJDropshipping API is unavailable')
+            )
+            self.message_post(
+                body=self.env._(
+                    'CJDropshipping is currently unavailable, the order '
+                    'will be submitted automatically later'
+                ),
+                message_type='notification'
+            )
+
         # Auto-submit if configured
-        if config.auto_fulfill_orders:
+        elif config.auto_fulfill_orders:
             try:
                 cj_order.action_submit_to_cj()
+                if cj_order.state in ('deferred', 'verify'):
+                    self.message_post(
+                        body=self.env._(
+                            'CJDropshipping submission postponed, it will '
+                            'be retried automatically: %s',
+                            cj_order.error_message
+                        ),
+                        message_type='notification'
+                    )
             except (UserError, ValidationError, ValueError) as exc:
                 _logger.error(
                     "Failed to submit order to CJDropshipping: %s",
@@ -8,6 +8,10 @@ from odoo.exceptions import UserError, ValidationError
 
 _logger = logging.getLogger(__name__)
 
+# Leaf categories imported while the user waits; larger selections are
+# handed over to a background import job
+MAX_INLINE_CATEGORIES = 5
+
 
 class ProductImportWizard(models.TransientModel):
     """Wizard for importing products from CJDropshipping."""
@@ -25,9 +29,12 @@ class ProductImportWizard(models.TransientModel):
     )
 
     category_id = fields.Many2one(
-        'product.category',
+        'cjdropship.category',
         'Category Filter',
-        help='Filter products by CJDropshipping category'
+        domain="[('config_id', '=', config_id)]",
+        help='Filter products by CJDropshipping category; a parent '
+             'category imports the page of each of its leaf categories, '
+             'in the background when it has many'
     )
 
     page_number = fields.Integer(
@@ -45,6 +52,11 @@ class ProductImportWizard(models.TransientModel):
         default=False,
         help='Automatically create Odoo products after import'
     )
+    import_variants = fields.Boolean(
+        default=False,
+        help='Also import the CJ variants of every product as Odoo '
+             'product variants'
+    )
 
     state = fields.Selection(
         [
@@ -62,79 +74,39 @@ class ProductImportWizard(models.TransientModel):
         """Import products from CJDropshipping."""
         self.ensure_one()
 
+        # CJ only filters on leaf categories, one request each
+        category_ids = (
+            self.category_id._get_leaf_categories().mapped('cj_category_id')
+            if self.category_id else [None]
+        )
+        if len(category_ids) > MAX_INLINE_CATEGORIES:
+            return self.action_import_in_background()
+
         try:
             self.state = 'importing'
 
             client = self.config_id.get_api_client()
 
             # Get product list
-            result = client.get_product_list(
-                page=self.page_number,
-                page_size=self.page_size,
-                category_id=self.category_id.id if self.category_id else None
-            )
-
-            if not result or not result.get('list'):
+            products_data = []
+            for category_id in category_ids:
+                result = client.get_product_list(
+                    page=self.page_number,
+                    page_size=self.page_size,
+                    category_id=category_id
+                )
+                products_data.extend((result or {}).get('list') or [])
+
+            if not products_data:
                 raise UserError(self.env._('No products found'))
 
-            products_data = result.get('list', [])
-            imported_count = 0
-
-            cj_product_model = self.env['cjdropship.product']
-
-            for product_data in products_data:
-                try:
-                    product_id = product_data.get('pid')
-                    if not product_id:
-                        continue
-
-                    # Check if product already exists
-                    existing = cj_product_model.search([
-                        ('cj_product_id', '=', product_id),
-                        ('cj_variant_id', '=', False)
-                    ], limit=1)
-
-                    # Prepare product values
-                    vals = {
-                        'cj_product_id': product_id,
-                        'cj_product_name': product_data.get('productNameEn', ''),
-                        'cj_product_sku': product_data.get('productSku', ''),
-                        'description': product_data.get('description', ''),
-                        'cj_price': float(product_data.get('sellPrice', 0)),
-                        'category_name': product_data.get('categoryName', ''),
-                        'image_url': product_data.get('productImage', ''),
-                        'shipping_weight': float(product_data.get('weight', 0)),
-                        'config_id': self.config_id.id,
-                        'sync_date': fields.Datetime.now(),
-                    }
-
-                    # Calculate selling price
-                    vals['selling_price'] = (
-                        self.config_id.calculate_sale_price(vals['cj_price'])
-                    )
-
-                    if existing:
-                        existing.write(vals)
-                        cj_product = existing
-                    else:
-                        cj_product = cj_product_model.create(vals)
-
-                    # Create Odoo product if requested
-                    if (
-                        self.create_odoo_products
-                        and not cj_product.product_tmpl_id
-                    ):
-                        cj_product.action_create_odoo_product()
-
-                    imported_count += 1
-
-                except (UserError, ValidationError, ValueError) as exc:
-                    _logger.warning(
-                        "Failed to import product %s: %s",
-                        product_data.get('pid'),
-                        str(exc)
-                    )
-                    continue
+            cj_products = self.env['cjdropship.product']._import_from_cj_list(
+                self.config_id,
+                products_data,
+                create_odoo_products=self.create_odoo_products,
+                import_variants=self.import_variants,
+            )
+            imported_count = len(cj_products)
 
             self.write({
                 'state': 'done',
@@ -168,6 +140,29 @@ class ProductImportWizard(models.TransientModel):
                 self.env._('Import failed: %s', error_msg)
             ) from exc
 
+    def action_import_in_background(self):
+        """Import every page of the selection as a background job."""
+        self.ensure_one()
+        job = self.env['cjdropship.import.job'].create({
+            'name': self.env._(
+                'Import %s',
+                self.category_id.complete_name or self.env._('all products')
+            ),
+            'config_id': self.config_id.id,
+            'category_id': self.category_id.id,
+            'page_size': self.page_size,
+            'create_odoo_products': self.create_odoo_products,
+            'import_variants': self.import_variants,
+        })
+        job.action_start()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'cjdropship.import.job',
+            'res_id': job.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
     def action_view_imported_products(self):
         """View imported products."""
         self.ensure_one()
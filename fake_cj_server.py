@@ -0,0 +1,795 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the CJDropshipping API.
+
+Serves the endpoints used by the addon's API client from a generated catalog,
+so development, tests and benchmarks run offline and without touching the
+production rate limit. Latency, rate limiting (429) and server errors (5xx)
+can be injected, and order, tracking and inventory webhooks can be fired at
+an Odoo instance.
+
+Only the Python standard library is required.
+
+Usage:
+    python3 fake_cj_server.py --port 8070 --products 10000
+
+Then set the "API Base URL" of the CJDropshipping configuration to
+http://127.0.0.1:8070/api2.0/v1 (any email and password are accepted).
+
+Test endpoints:
+    GET  /_fake/stats     request and injected error counters
+    POST /_fake/reset     reset counters and forget orders
+    POST /_fake/webhook   fire a webhook, body e.g. {"type": "inventory"}
+"""
+
+import argparse
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+import urllib.request
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/api2.0/v1'
+ORDER_STATUSES = ('PENDING', 'PROCESSING', 'SHIPPED', 'DELIVERED')
+SERVER_ERRORS = (500, 502, 503, 504)
+CHINA_TZ = timezone(timedelta(hours=8))
+
+# 1x1 transparent PNG served as product image
+PIXEL_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44'
+    'ae426082'
+)
+
+
+def _success(data):
+    """Wrap data in a successful CJ API response."""
+    return {
+        'code': 200,
+        'result': True,
+        'message': 'Success',
+        'data': data,
+        'requestId': secrets.token_hex(16),
+    }
+
+
+def _failure(code, message):
+    """Build a failed CJ API response."""
+    return {
+        'code': code,
+        'result': False,
+        'message': message,
+        'data': None,
+        'requestId': secrets.token_hex(16),
+    }
+
+
+class Catalog:
+    """Deterministic product catalog generated on demand.
+
+    Products are derived from their index and the seed, so catalogs of
+    millions of products cost no memory. Only stock changes are stored.
+    """
+
+    def __init__(self, size, categories, seed, base_url):
+        self.size = size
+        self.seed = seed
+        self.base_url = base_url
+        self.categories = [
+            (f'CAT-{seed}-{index:04d}', f'Category {index + 1}')
+            for index in range(max(1, categories))
+        ]
+        self.stock = {}
+        self._lock = threading.Lock()
+
+    def pid(self, index):
+        """Return the CJ product id of a catalog index."""
+        return f'FAKE{self.seed:03d}{index:09d}'
+
+    def index(self, pid):
+        """Return the catalog index of a CJ product id, None if unknown."""
+        prefix = f'FAKE{self.seed:03d}'
+        if not pid or not pid.startswith(prefix):
+            return None
+        try:
+            index = int(pid[len(prefix):])
+        except ValueError:
+            return None
+        return index if 0 <= index < self.size else None
+
+    def _random(self, index):
+        """Return the random generator of a product."""
+        return random.Random(self.seed * 1_000_003 + index)
+
+    def product(self, index):
+        """Return the list entry of a product."""
+        rng = self._random(index)
+        pid = self.pid(index)
+        category_id, category_name = self.categories[
+            index % len(self.categories)
+        ]
+        return {
+            'pid': pid,
+            'productNameEn': f'Fake Product {index + 1}',
+            'productSku': f'CJFK{index:09d}',
+            'description': f'<p>Generated test product {index + 1}</p>',
+            'sellPrice': f'{rng.uniform(0.5, 150):.2f}',
+            'categoryId': category_id,
+            'categoryName': category_name,
+            'productImage': f'{self.base_url}/_fake/images/{pid}.png',
+            'weight': round(rng.uniform(10, 3000)),
+            'productWeight': round(rng.uniform(10, 3000)),
+        }
+
+    def variants(self, index):
+        """Return the variants of a product."""
+        rng = self._random(index)
+        pid = self.pid(index)
+        base_price = float(self.product(index)['sellPrice'])
+        return [
+            {
+                'vid': f'{pid}-V{number}',
+                'pid': pid,
+                'variantNameEn': f'Fake Product {index + 1} Variant {number}',
+                'variantSku': f'CJFK{index:09d}-{number}',
+                'variantKey': f'Variant {number}',
+                'variantSellPrice': round(
+                    base_price * rng.uniform(0.9, 1.3), 2
+                ),
+                'variantImage': f'{self.base_url}/_fake/images/{pid}.png',
+                'variantWeight': round(rng.uniform(10, 3000)),
+            }
+            for number in range(1, rng.randint(1, 4) + 1)
+        ]
+
+    def quantity(self, index):
+        """Return the stock of a product."""
+        with self._lock:
+            if index in self.stock:
+                return self.stock[index]
+        return self._random(index).randint(0, 5000)
+
+    def set_quantity(self, index, quantity):
+        """Change the stock of a product."""
+        with self._lock:
+            self.stock[index] = quantity
+
+    def page(self, page, page_size, category_id=None):
+        """Return the total and the products of a catalog page."""
+        if category_id:
+            positions = [
+                position for position, (cid, _name)
+                in enumerate(self.categories) if cid == category_id
+            ]
+            if not positions:
+                return 0, []
+            step = len(self.categories)
+            total = len(range(positions[0], self.size, step))
+            start = (page - 1) * page_size
+            indexes = range(
+                positions[0] + start * step,
+                min(self.size, positions[0] + (start + page_size) * step),
+                step
+            )
+        else:
+            total = self.size
+            start = (page - 1) * page_size
+            indexes = range(start, min(self.size, start + page_size))
+        return total, [self.product(index) for index in indexes]
+
+    def category_tree(self):
+        """Return the three level CJ category tree."""
+        return [{
+            'categoryFirstId': f'CAT-{self.seed}-ROOT',
+            'categoryFirstName': 'Fake Catalog',
+            'categoryFirstList': [{
+                'categorySecondId': f'CAT-{self.seed}-ALL',
+                'categorySecondName': 'All Products',
+                'categorySecondList': [
+                    {'categoryId': cid, 'categoryName': name}
+                    for cid, name in self.categories
+                ],
+            }],
+        }]
+
+
+class FakeCJState:
+    """Mutable server state shared by the request handler threads."""
+
+    def __init__(self, options):
+        self.options = options
+        self.base_url = f'http://{options.host}:{options.port}'
+        self.catalog = Catalog(
+            options.products, options.categories, options.seed,
+            self.base_url
+        )
+        self.rng = random.Random(options.seed)
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.orders = {}
+        self.stats = Counter()
+        self.bucket = float(
+            max(options.rate_limit, 1) if options.rate_limit else 0
+        )
+        self.bucket_updated = time.monotonic()
+
+    def reset(self):
+        """Forget orders and counters."""
+        with self.lock:
+            self.orders.clear()
+            self.stats.clear()
+
+    def count(self, key):
+        """Increment a statistics counter."""
+        with self.lock:
+            self.stats[key] += 1
+
+    def chance(self, probability):
+        """Return True with the given probability."""
+        with self.lock:
+            return probability > 0 and self.rng.random() < probability
+
+    def latency(self):
+        """Return the delay to add to a request, in seconds."""
+        options = self.options
+        with self.lock:
+            jitter = self.rng.uniform(0, options.jitter)
+        return (options.latency + jitter) / 1000
+
+    def take_rate_limit_slot(self):
+        """Token bucket mirroring CJ's per-account QPS limit."""
+        rate = self.options.rate_limit
+        if not rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            # Below one request per second the bucket must still hold one
+            self.bucket = min(
+                max(rate, 1), self.bucket + (now - self.bucket_updated) * rate
+            )
+            self.bucket_updated = now
+            if self.bucket < 1:
+                return False
+            self.bucket -= 1
+            return True
+
+    def issue_token(self):
+        """Create a new access token."""
+        token = secrets.token_hex(24)
+        expiry = time.time() + self.options.token_ttl
+        with self.lock:
+            self.tokens[token] = expiry
+        return token, expiry
+
+    def token_valid(self, token):
+        """Check an access token."""
+        with self.lock:
+            return self.tokens.get(token, 0) > time.time()
+
+    def order_status(self, order):
+        """Return the status an order has reached by now."""
+        step = self.options.order_step
+        age = time.time() - order['createdAt']
+        position = min(int(age // step), len(ORDER_STATUSES) - 1)
+        return ORDER_STATUSES[position]
+
+    def order_view(self, order):
+        """Return an order as the CJ API shows it."""
+        status = self.order_status(order)
+        shipped = ORDER_STATUSES.index(status) >= 2
+        return {
+            'orderId': order['orderId'],
+            'orderNum': order['orderNum'],
+            'orderStatus': status,
+            'status': status,
+            'trackingNumber': order['trackingNumber'] if shipped else None,
+            'shippingMethod': order['shippingMethod'],
+            'productList': order['products'],
+            'createDate': datetime.fromtimestamp(
+                order['createdAt'], CHINA_TZ
+            ).isoformat(),
+        }
+
+
+class FakeCJHandler(BaseHTTPRequestHandler):
+    """Request handler answering like the CJDropshipping API."""
+
+    server_version = 'FakeCJ/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def state(self):
+        """Return the server state."""
+        return self.server.state
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Log requests at debug level instead of stderr."""
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status, body, content_type='application/json',
+              headers=None):
+        """Send a response, JSON encoding ``body`` unless it is bytes."""
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        """Return the JSON request body, None if it is invalid."""
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handle GET requests."""
+        self._dispatch('GET')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handle POST requests."""
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        """Route a GET or POST request to its endpoint handler."""
+        url = urlparse(self.path)
+        params = {
+            key: values[-1] for key, values in parse_qs(url.query).items()
+        }
+        body = self._read_json() if method == 'POST' else {}
+        if body is None:
+            self._send(400, _failure(1600100, 'Invalid JSON body'))
+            return
+
+        if url.path.startswith('/_fake/'):
+            self._handle_control(method, url.path, body)
+            return
+        if not url.path.startswith(API_PREFIX):
+            self._send(404, _failure(404, 'Not found'))
+            return
+
+        endpoint = url.path[len(API_PREFIX):]
+        handler = ROUTES.get((method, endpoint))
+        if handler is None:
+            self._send(404, _failure(404, f'Unknown endpoint {endpoint}'))
+            return
+
+        state = self.state
+        state.count(f'requests {endpoint}')
+        time.sleep(state.latency())
+
+        options = state.options
+        if not state.take_rate_limit_slot() or state.chance(options.fail_429):
+            state.count('injected 429')
+            self._send(
+                429, _failure(1600200, 'Too Many Requests'),
+                headers={'Retry-After': '1'}
+            )
+            return
+        if state.chance(options.fail_5xx):
+            with state.lock:
+                status = state.rng.choice(SERVER_ERRORS)
+            state.count(f'injected {status}')
+            self._send(status, _failure(status, 'Injected server error'))
+            return
+
+        if endpoint != '/authentication/getAccessToken' and not (
+            state.token_valid(self.headers.get('CJ-Access-Token'))
+        ):
+            state.count('invalid token')
+            self._send(200, _failure(1600001, 'Invalid API key or token'))
+            return
+
+        self._send(200, handler(state, params, body))
+
+    def _handle_control(self, method, path, body):
+        """Handle the test control endpoints."""
+        state = self.state
+        if path == '/_fake/stats' and method == 'GET':
+            with state.lock:
+                stats = dict(state.stats)
+                orders = len(state.orders)
+            self._send(200, {'stats': stats, 'orders': orders})
+        elif path == '/_fake/reset' and method == 'POST':
+            state.reset()
+            self._send(200, {'status': 'ok'})
+        elif path == '/_fake/webhook' and method == 'POST':
+            payload = fire_webhook(state, body.get('type', 'inventory'))
+            self._send(200, {'status': 'ok', 'payload': payload})
+        elif path.startswith('/_fake/images/') and method == 'GET':
+            etag = '"%08x"' % zlib.crc32(path.encode())
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self._send(
+                200, PIXEL_PNG, content_type='image/png',
+                headers={'ETag': etag}
+            )
+        else:
+            self._send(404, {'status': 'error', 'message': 'Not found'})
+
+
+def get_access_token(state, _params, body):
+    """Issue an access token for any email and password."""
+    if not body.get('email') or not body.get('password'):
+        return _failure(1600001, 'Email and password are required')
+    token, expiry = state.issue_token()
+    return _success({
+        'openId': 1,
+        'accessToken': token,
+        'accessTokenExpiryDate': datetime.fromtimestamp(
+            expiry, CHINA_TZ
+        ).replace(microsecond=0).isoformat(),
+        'refreshToken': secrets.token_hex(24),
+        'refreshTokenExpiryDate': datetime.fromtimestamp(
+            expiry + 86400 * 180, CHINA_TZ
+        ).replace(microsecond=0).isoformat(),
+        'createDate': datetime.now(CHINA_TZ).replace(
+            microsecond=0
+        ).isoformat(),
+    })
+
+
+def _paging(params):
+    """Return the requested page number and size."""
+    try:
+        page = max(1, int(params.get('pageNum', 1)))
+        page_size = min(200, max(1, int(params.get('pageSize', 20))))
+    except ValueError:
+        return None, None
+    return page, page_size
+
+
+def product_list(state, params, _body):
+    """Return a page of the catalog."""
+    page, page_size = _paging(params)
+    if page is None:
+        return _failure(1600100, 'Invalid paging parameters')
+    total, products = state.catalog.page(
+        page, page_size, params.get('categoryId')
+    )
+    return _success({
+        'pageNum': page,
+        'pageSize': page_size,
+        'total': total,
+        'list': products,
+    })
+
+
+def _product_index(state, params):
+    """Return the catalog index of the requested product."""
+    return state.catalog.index(params.get('pid'))
+
+
+def product_query(state, params, _body):
+    """Return the detail of a product with its variants."""
+    index = _product_index(state, params)
+    if index is None:
+        return _failure(1600400, 'Product not found')
+    product = state.catalog.product(index)
+    product['variants'] = state.catalog.variants(index)
+    return _success(product)
+
+
+def product_variants(state, params, _body):
+    """Return the variants of a product."""
+    index = _product_index(state, params)
+    if index is None:
+        return _failure(1600400, 'Product not found')
+    return _success(state.catalog.variants(index))
+
+
+def product_inventory(state, params, _body):
+    """Return the stock of a product."""
+    index = _product_index(state, params)
+    if index is None:
+        return _failure(1600400, 'Product not found')
+    quantity = state.catalog.quantity(index)
+    return _success({
+        'pid': params['pid'],
+        'vid': params.get('vid'),
+        'quantity': quantity,
+        'inventories': [
+            {'areaEn': 'China Warehouse', 'countryCode': 'CN',
+             'totalInventoryNum': quantity},
+        ],
+    })
+
+
+def category_list(state, _params, _body):
+    """Return the category tree."""
+    return _success(state.catalog.category_tree())
+
+
+def create_order(state, _params, body):
+    """Create an order after checking its products exist."""
+    products = body.get('products') or []
+    if not products:
+        return _failure(1600100, 'products is required')
+    for line in products:
+        if state.catalog.index(line.get('productId')) is None:
+            return _failure(
+                1600400, f"Product {line.get('productId')} not found"
+            )
+    with state.lock:
+        number = len(state.orders) + 1
+        order_id = f'FAKEORDER{number:010d}'
+        state.orders[order_id] = {
+            'orderId': order_id,
+            'orderNum': body.get('orderNumber') or f'FK{number:08d}',
+            'products': products,
+            'shippingMethod': body.get('logisticName') or 'CJPacket',
+            'trackingNumber': f'CJFAKE{number:010d}CN',
+            'createdAt': time.time(),
+            'notified': 'PENDING',
+        }
+    return _success({
+        'orderId': order_id,
+        'orderNum': state.orders[order_id]['orderNum'],
+    })
+
+
+def _find_order(state, params):
+    """Return the requested order."""
+    with state.lock:
+        return state.orders.get(params.get('orderId'))
+
+
+def order_query(state, params, _body):
+    """Return the detail of an order."""
+    order = _find_order(state, params)
+    if order is None:
+        return _failure(1600400, 'Order not found')
+    return _success(state.order_view(order))
+
+
+def order_list(state, params, _body):
+    """Return a page of the orders created so far."""
+    page, page_size = _paging(params)
+    if page is None:
+        return _failure(1600100, 'Invalid paging parameters')
+    with state.lock:
+        orders = list(state.orders.values())
+    if params.get('orderNumber'):
+        orders = [
+            order for order in orders
+            if order['orderNum'] == params['orderNumber']
+        ]
+    start = (page - 1) * page_size
+    return _success({
+        'pageNum': page,
+        'pageSize': page_size,
+        'total': len(orders),
+        'list': [
+            state.order_view(order)
+            for order in orders[start:start + page_size]
+        ],
+    })
+
+
+def freight_calculate(state, _params, body):
+    """Return shipping methods with made-up prices."""
+    products = body.get('products') or []
+    quantity = sum(int(line.get('quantity') or 1) for line in products) or 1
+    with state.lock:
+        base = state.rng.uniform(2, 6)
+    return _success([
+        {
+            'logisticName': name,
+            'logisticPrice': round(base * factor + quantity * 0.5, 2),
+            'logisticAging': aging,
+        }
+        for name, factor, aging in (
+            ('CJPacket Ordinary', 1.0, '10-20'),
+            ('CJPacket Sensitive', 1.3, '12-25'),
+            ('DHL', 4.5, '3-7'),
+        )
+    ])
+
+
+def track_query(state, params, _body):
+    """Return the tracking information of an order."""
+    order = _find_order(state, params)
+    if order is None:
+        return _failure(1600400, 'Order not found')
+    view = state.order_view(order)
+    return _success({
+        'orderId': view['orderId'],
+        'trackingNumber': view['trackingNumber'],
+        'logisticName': view['shippingMethod'],
+        'trackingStatus': view['status'],
+        'trackInfo': [
+            {'date': view['createDate'], 'message': status}
+            for status in ORDER_STATUSES[
+                :ORDER_STATUSES.index(view['status']) + 1
+            ]
+        ],
+    })
+
+
+ROUTES = {
+    ('POST', '/authentication/getAccessToken'): get_access_token,
+    ('GET', '/product/list'): product_list,
+    ('GET', '/product/query'): product_query,
+    ('GET', '/product/variant/query'): product_variants,
+    ('GET', '/product/inventory/query'): product_inventory,
+    ('GET', '/product/categoryList'): category_list,
+    ('POST', '/shopping/order/createOrder'): create_order,
+    ('GET', '/shopping/order/query'): order_query,
+    ('GET', '/shopping/order/list'): order_list,
+    ('POST', '/logistic/freightCalculate'): freight_calculate,
+    ('GET', '/logistic/trackQuery'): track_query,
+}
+
+
+def send_webhook(state, payload):
+    """POST a webhook payload to the configured Odoo webhook URL."""
+    url = state.options.webhook_url
+    if not url:
+        logger.info("No --webhook-url set, not sending %s", payload)
+        return
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+        state.count(f"webhooks sent {payload['event']}")
+    except OSError as exc:
+        state.count('webhooks failed')
+        logger.warning("Webhook %s failed: %s", payload['event'], exc)
+
+
+def fire_webhook(state, webhook_type):
+    """Build and send a webhook of the given type."""
+    if webhook_type in ('order', 'tracking'):
+        with state.lock:
+            orders = list(state.orders.values())
+        if not orders:
+            return None
+        order = state.order_view(state.rng.choice(orders))
+        if webhook_type == 'tracking':
+            payload = {
+                'event': 'TRACKING_UPDATE',
+                'orderId': order['orderId'],
+                'trackingNumber': order['trackingNumber']
+                or f"CJFAKE{order['orderId'][-10:]}CN",
+            }
+        else:
+            payload = {
+                'event': 'ORDER_STATUS_CHANGED',
+                'orderId': order['orderId'],
+                'status': order['status'],
+                'trackingNumber': order['trackingNumber'],
+                'shippingMethod': order['shippingMethod'],
+            }
+    else:
+        catalog = state.catalog
+        with state.lock:
+            index = state.rng.randrange(catalog.size)
+            quantity = state.rng.randint(0, 5000)
+        catalog.set_quantity(index, quantity)
+        payload = {
+            'event': 'INVENTORY_UPDATE',
+            'productId': catalog.pid(index),
+            'quantity': quantity,
+        }
+    send_webhook(state, payload)
+    return payload
+
+
+def webhook_loop(state, stop):
+    """Fire order status webhooks on transitions, inventory ones at random."""
+    options = state.options
+    next_inventory = time.monotonic() + options.webhook_interval
+    while not stop.wait(1):
+        with state.lock:
+            orders = list(state.orders.values())
+        for order in orders:
+            status = state.order_status(order)
+            if status != order['notified']:
+                order['notified'] = status
+                view = state.order_view(order)
+                send_webhook(state, {
+                    'event': 'ORDER_STATUS_CHANGED',
+                    'orderId': view['orderId'],
+                    'status': status,
+                    'trackingNumber': view['trackingNumber'],
+                    'shippingMethod': view['shippingMethod'],
+                })
+        if options.webhook_interval and time.monotonic() >= next_inventory:
+            next_inventory += options.webhook_interval
+            fire_webhook(state, 'inventory')
+
+
+def parse_args(argv=None):
+    """Parse the command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8070)
+    parser.add_argument('--products', type=int, default=1000,
+                        help="Catalog size (default: %(default)s)")
+    parser.add_argument('--categories', type=int, default=20,
+                        help="Number of leaf categories")
+    parser.add_argument('--seed', type=int, default=1,
+                        help="Seed of the generated catalog")
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Added latency per request in ms")
+    parser.add_argument('--jitter', type=float, default=0,
+                        help="Random extra latency per request in ms")
+    parser.add_argument('--fail-429', type=float, default=0,
+                        help="Fraction of requests answered with 429")
+    parser.add_argument('--fail-5xx', type=float, default=0,
+                        help="Fraction of requests answered with 5xx")
+    parser.add_argument('--rate-limit', type=float, default=0,
+                        help="Requests per second before answering 429 "
+                             "(0: unlimited)")
+    parser.add_argument('--token-ttl', type=int, default=15 * 86400,
+                        help="Access token lifetime in seconds")
+    parser.add_argument('--order-step', type=float, default=60,
+                        help="Seconds between order status changes")
+    parser.add_argument('--webhook-url',
+                        help="Odoo webhook URL, e.g. "
+                             "http://localhost:8069/cjdropship/webhook/1")
+    parser.add_argument('--webhook-interval', type=float, default=0,
+                        help="Seconds between random inventory webhooks "
+                             "(0: never)")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run the fake CJ API server until interrupted."""
+    options = parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if options.verbose else logging.INFO,
+        format='%(asctime)s %(levelname)s %(message)s'
+    )
+    state = FakeCJState(options)
+    server = ThreadingHTTPServer((options.host, options.port), FakeCJHandler)
+    server.daemon_threads = True
+    server.state = state
+
+    stop = threading.Event()
+    threading.Thread(
+        target=webhook_loop, args=(state, stop), daemon=True
+    ).start()
+
+    logger.info(
+        "Fake CJ API with %d products listening on %s%s",
+        options.products, state.base_url, API_PREFIX
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())